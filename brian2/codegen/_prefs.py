@@ -51,5 +51,45 @@ prefs.register_preferences(
         optimisation is already performed by the compiler) or because the
         code generation target does not deal well with it. Defaults to ``True``.
         '''
+    ),
+    fuse_neuron_kernels=BrianPreference(
+        default=False,
+        docs='''
+        Whether to perform the state update, the threshold and the reset of a
+        `NeuronGroup` in a single loop over all neurons instead of three
+        separate loops. This avoids reading and writing the state variables
+        several times per time step but is only done if it does not change
+        the order of operations with respect to other objects, e.g. the reset
+        will not be merged if `Synapses` access the state variables in between
+        the threshold and the reset. Note that if random numbers are used in
+        the threshold or reset, they will be drawn in a different order.
+        Only supported for the ``weave`` and ``cython`` targets and for
+        standalone C++ code (where the merged loop will not use OpenMP).
+        Defaults to ``False``.
+        '''
+    ),
+    cache_directory=BrianPreference(
+        default='~/.brian/codegen_cache',
+        docs='''
+        The directory where the results of code generation are stored, so
+        that later runs of the same model (also in a new Python process) can
+        reuse them. This includes the abstract code derived from the model
+        equations by state updaters and the code generated for code objects,
+        i.e. a warm start does not have to repeat the symbolic calculations
+        and the code generation from templates. Results are looked up by a
+        description of everything they depend on (e.g. the equations, the
+        numerical integration method, the names and types of the variables,
+        the preferences and the installed version of Brian). Set to an empty
+        string to not use a cache.
+        '''
+    ),
+    cache_max_size=BrianPreference(
+        default=100,
+        docs='''
+        The maximum size (in megabytes) of the stored results of each kind
+        (state update code and code for code objects) in the directory given
+        by the `codegen.cache_directory` preference. If the cache grows beyond
+        this size, the least recently used results are deleted.
+        '''
     )
 )
\ No newline at end of file
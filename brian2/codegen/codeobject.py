@@ -3,6 +3,8 @@ Module providing the base `CodeObject` and related functions.
 '''
 import copy
 import weakref
+from collections import defaultdict
+from contextlib import contextmanager
 
 from brian2.core.names import Nameable
 from brian2.equations.unitcheck import check_units_statements
@@ -13,6 +15,7 @@ from .translation import analyse_identifiers
 
 __all__ = ['CodeObject',
            'CodeObjectUpdater',
+           'deferred_compilation',
            ]
 
 logger = get_logger(__name__)
@@ -36,6 +39,10 @@ class CodeObject(Nameable):
     generator_class = None
     #: A short name for this type of `CodeObject`
     class_name = None
+    #: Whether the compilation of code objects of this class can be deferred
+    #: (see `deferred_compilation`). Such code objects have to compile
+    #: themselves if they are run before they have been compiled.
+    supports_deferred_compilation = False
 
     def __init__(self, owner, code, variables, variable_indices,
                  template_name, template_source, name='codeobject*'):
@@ -71,6 +78,20 @@ class CodeObject(Nameable):
     def compile(self):
         pass
 
+    @classmethod
+    def compile_all(cls, code_objects):
+        '''
+        Compile several code objects of this class. Subclasses can overwrite
+        this method to compile the code objects in parallel.
+
+        Parameters
+        ----------
+        code_objects : list of `CodeObject`
+            The code objects to compile.
+        '''
+        for codeobj in code_objects:
+            codeobj.compile()
+
     def __call__(self, **kwds):
         self.update_namespace()
         self.namespace.update(**kwds)
@@ -90,6 +111,43 @@ class CodeObject(Nameable):
         raise NotImplementedError()
 
 
+#: Stack of lists of code objects whose compilation has been deferred
+_deferred_code_objects = []
+
+
+@contextmanager
+def deferred_compilation():
+    '''
+    Context manager that collects all code objects created in its context
+    (and supporting deferred compilation, see
+    `CodeObject.supports_deferred_compilation`) and compiles them together at
+    the end, using `CodeObject.compile_all`. This is used by
+    `Network.before_run` to compile all code objects of a network at once.
+    '''
+    deferred = []
+    _deferred_code_objects.append(deferred)
+    try:
+        yield
+    finally:
+        _deferred_code_objects.pop()
+    by_class = defaultdict(list)
+    for codeobj in deferred:
+        by_class[type(codeobj)].append(codeobj)
+    for codeobj_class, code_objects in by_class.iteritems():
+        codeobj_class.compile_all(code_objects)
+
+
+def compile_code_object(codeobj):
+    '''
+    Compile a code object, or defer its compilation if it has been created in
+    a `deferred_compilation` context.
+    '''
+    if _deferred_code_objects and codeobj.supports_deferred_compilation:
+        _deferred_code_objects[-1].append(codeobj)
+    else:
+        codeobj.compile()
+
+
 def check_code_units(code, group, user_code=None, additional_variables=None,
                      level=0, run_namespace=None,):
     '''
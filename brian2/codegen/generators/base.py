@@ -189,7 +189,13 @@ class CodeGenerator(object):
         scalar_statements = {}
         vector_statements = {}
         for ac_name, ac_code in code.iteritems():
+            # The scalar code of several blocks can end up in the same scope
+            if ac_name is None:
+                lio_prefix = '_lio_const_'
+            else:
+                lio_prefix = '_lio_const_%s_' % ac_name
             scalar_statements[ac_name], vector_statements[ac_name] = make_statements(ac_code,
                                                                                      self.variables,
-                                                                                     dtype)
+                                                                                     dtype,
+                                                                                     lio_prefix=lio_prefix)
         return self.translate_statement_sequence(scalar_statements, vector_statements)
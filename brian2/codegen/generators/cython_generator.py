@@ -181,11 +181,25 @@ class CythonCodeGenerator(CodeGenerator):
     def determine_keywords(self):
         from brian2.devices.device import get_device
         device = get_device()
-        # load variables from namespace
+        # Values that are stored once in a CodeObjectState object (see
+        # common.pyx) and copied to local variables in each call
+        state_declarations = []
+        bind_namespace = []
+        # Values that have to be taken from the namespace for every call
         load_namespace = []
         support_code = []
         handled_pointers = set()
         user_functions = []
+
+        def add_state(name, state_type, local_type, bind_lines):
+            state_declarations.append('cdef {0} {1}'.format(state_type, name))
+            bind_namespace.extend(bind_lines)
+            if local_type is None:
+                load_namespace.append('{0} = _state.{0}'.format(name))
+            else:
+                load_namespace.append('cdef {0} {1} = _state.{1}'.format(local_type,
+                                                                         name))
+
         for varname, var in self.variables.items():
             if isinstance(var, AuxiliaryVariable):
                 line = "cdef {dtype} {varname}".format(
@@ -194,17 +208,28 @@ class CythonCodeGenerator(CodeGenerator):
                 load_namespace.append(line)
             elif isinstance(var, AttributeVariable):
                 val = getattr(var.obj, var.attribute)
-                if isinstance(val, np.ndarray) and val.ndim:
-                    line = "cdef _numpy.ndarray[{cpp_dtype}, ndim=1, mode='c'] {varname} = _namespace['{varname}']".format(
-                        numpy_dtype=get_numpy_dtype(val), varname=varname,
-                        cpp_dtype=get_cpp_dtype(val))
-                else:
-                    line = "cdef {cpp_dtype} {varname} = _namespace['{varname}']".format(
-                        cpp_dtype=get_cpp_dtype(val), varname=varname)
-                load_namespace.append(line)
-                if isinstance(val, np.ndarray) and val.ndim:
-                    line = "cdef int _num{varname} = len(_namespace['{varname}'])".format(varname=varname)
+                if not var.constant:
+                    # The value changes between calls (e.g. t)
+                    if isinstance(val, np.ndarray) and val.ndim:
+                        line = "cdef _numpy.ndarray[{cpp_dtype}, ndim=1, mode='c'] {varname} = _namespace['{varname}']".format(
+                            numpy_dtype=get_numpy_dtype(val), varname=varname,
+                            cpp_dtype=get_cpp_dtype(val))
+                    else:
+                        line = "cdef {cpp_dtype} {varname} = _namespace['{varname}']".format(
+                            cpp_dtype=get_cpp_dtype(val), varname=varname)
                     load_namespace.append(line)
+                    if isinstance(val, np.ndarray) and val.ndim:
+                        line = "cdef int _num{varname} = len(_namespace['{varname}'])".format(varname=varname)
+                        load_namespace.append(line)
+                elif isinstance(val, np.ndarray) and val.ndim:
+                    array_type = "_numpy.ndarray[{cpp_dtype}, ndim=1, mode='c']".format(cpp_dtype=get_cpp_dtype(val))
+                    add_state(varname, '_numpy.ndarray', array_type,
+                              ["self.{0} = _namespace['{0}']".format(varname)])
+                    add_state('_num' + varname, 'int', 'int',
+                              ["self._num{0} = len(self.{0})".format(varname)])
+                else:
+                    add_state(varname, get_cpp_dtype(val), get_cpp_dtype(val),
+                              ["self.{0} = _namespace['{0}']".format(varname)])
             elif isinstance(var, Subexpression):
                 dtype = get_cpp_dtype(var.dtype)
                 line = "cdef {dtype} {varname}".format(dtype=dtype,
@@ -212,12 +237,15 @@ class CythonCodeGenerator(CodeGenerator):
                 load_namespace.append(line)
             elif isinstance(var, Constant):
                 dtype_name = get_cpp_dtype(var.value)
-                line = 'cdef {dtype} {varname} = _namespace["{varname}"]'.format(dtype=dtype_name, varname=varname)
-                load_namespace.append(line)
+                add_state(varname, dtype_name, dtype_name,
+                          ["self.{0} = _namespace['{0}']".format(varname)])
             elif isinstance(var, Variable):
                 if var.dynamic:
-                    load_namespace.append('{0} = _namespace["{1}"]'.format(self.get_array_name(var, False),
-                                                                           self.get_array_name(var, False)))
+                    dyn_array_name = self.get_array_name(var, False)
+                    if dyn_array_name not in handled_pointers:
+                        add_state(dyn_array_name, 'object', None,
+                                  ["self.{0} = _namespace['{0}']".format(dyn_array_name)])
+                        handled_pointers.add(dyn_array_name)
 
                 # This is the "true" array name, not the restricted pointer.
                 array_name = device.get_array_name(var)
@@ -226,23 +254,35 @@ class CythonCodeGenerator(CodeGenerator):
                     continue
                 if getattr(var, 'dimensions', 1) > 1:
                     continue  # multidimensional (dynamic) arrays have to be treated differently
-                newlines = [
-                    "cdef _numpy.ndarray[{cpp_dtype}, ndim=1, mode='c'] _buf_{array_name} = _namespace['{array_name}'].view(dtype=_numpy.{numpy_dtype})",
-                    "cdef {cpp_dtype} * {array_name} = <{cpp_dtype} *> _buf_{array_name}.data",]
-
-                if not var.scalar:
-                    newlines += ["cdef int _num{array_name} = len(_namespace['{array_name}'])"]
-
-                newlines += ["cdef {cpp_dtype} {varname}"]
-
-                for line in newlines:
-                    line = line.format(cpp_dtype=get_cpp_dtype(var.dtype),
-                                       numpy_dtype=get_numpy_dtype(var.dtype),
-                                       pointer_name=pointer_name,
-                                       array_name=array_name,
-                                       varname=varname,
-                                       )
-                    load_namespace.append(line)
+                cpp_dtype = get_cpp_dtype(var.dtype)
+                buffer_line = "cdef _numpy.ndarray[{cpp_dtype}, ndim=1, mode='c'] _buf_{array_name} = _namespace['{array_name}'].view(dtype=_numpy.{numpy_dtype})".format(
+                    cpp_dtype=cpp_dtype, numpy_dtype=get_numpy_dtype(var.dtype),
+                    array_name=array_name)
+                if (isinstance(var, DynamicArrayVariable) and
+                        not var.constant_size):
+                    # The underlying data changes when the array is resized
+                    # during a run (e.g. for monitors)
+                    newlines = [buffer_line,
+                                "cdef {cpp_dtype} * {array_name} = <{cpp_dtype} *> _buf_{array_name}.data"]
+                    if not var.scalar:
+                        newlines += ["cdef int _num{array_name} = len(_namespace['{array_name}'])"]
+                    for line in newlines:
+                        load_namespace.append(line.format(cpp_dtype=cpp_dtype,
+                                                          array_name=array_name))
+                else:
+                    # Keep a reference to the buffer, the pointer refers to
+                    # its data
+                    state_declarations.append('cdef _numpy.ndarray _buf_' + array_name)
+                    add_state(array_name, cpp_dtype + ' *', cpp_dtype + ' *',
+                              [buffer_line,
+                               "self._buf_{0} = _buf_{0}".format(array_name),
+                               "self.{array_name} = <{cpp_dtype} *> _buf_{array_name}.data".format(
+                                   cpp_dtype=cpp_dtype, array_name=array_name)])
+                    if not var.scalar:
+                        add_state('_num' + array_name, 'int', 'int',
+                                  ["self._num{0} = len(_buf_{0})".format(array_name)])
+                load_namespace.append("cdef {cpp_dtype} {varname}".format(cpp_dtype=cpp_dtype,
+                                                                          varname=varname))
                 handled_pointers.add(pointer_name)
 
             elif isinstance(var, Function):
@@ -265,7 +305,9 @@ class CythonCodeGenerator(CodeGenerator):
             if func_namespace is not None:
                 self.variables.update(func_namespace)
 
-        return {'load_namespace': '\n'.join(load_namespace),
+        return {'state_declarations': '\n'.join(state_declarations),
+                'bind_namespace': '\n'.join(bind_namespace),
+                'load_namespace': '\n'.join(load_namespace),
                 'support_code': '\n'.join(support_code)}
 
 ###############################################################################
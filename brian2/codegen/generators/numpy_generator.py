@@ -2,7 +2,7 @@ import itertools
 
 import numpy as np
 
-from brian2.utils.stringtools import word_substitute
+from brian2.utils.stringtools import word_substitute, get_identifiers
 from brian2.parsing.rendering import NumpyNodeRenderer
 from brian2.core.functions import DEFAULT_FUNCTIONS, Function
 from brian2.core.variables import ArrayVariable
@@ -21,6 +21,12 @@ class NumpyCodeGenerator(CodeGenerator):
 
     class_name = 'numpy'
 
+    def __init__(self, *args, **kwds):
+        super(NumpyCodeGenerator, self).__init__(*args, **kwds)
+        #: Whether the code writes to variables with non-unique indices in a
+        #: way that cannot be expressed as a "scatter-add"
+        self.repeated_index_writes = False
+
     def translate_expression(self, expr):
         for varname, var in self.variables.iteritems():
             if isinstance(var, Function):
@@ -41,10 +47,57 @@ class NumpyCodeGenerator(CodeGenerator):
             code += ' # ' + comment
         return code
         
+    def scatter_add_variables(self, statements, write):
+        '''
+        Determine whether the variables written with non-unique indices (e.g.
+        postsynaptic variables in synaptic code) can be updated with a single
+        "scatter-add" operation, i.e. without caring about the order in which
+        repeated indices are processed. This is the case if all of them are
+        only changed with ``+=`` or ``-=`` and if none of them (nor any other
+        variable referring to the same values) is used in an expression.
+
+        Parameters
+        ----------
+        statements : list of `Statement`
+            The statements of the code block.
+        write : set of str
+            The names of the variables written to in `statements`.
+
+        Returns
+        -------
+        scatter_add : set of str
+            The names of the variables that are updated with scatter-add
+            operations (empty if not all writes to variables with non-unique
+            indices can be expressed this way).
+        '''
+        variables = self.variables
+        repeated = set(varname for varname in write
+                       if self.variable_indices[varname] not in ('_idx', '0'))
+        if not repeated:
+            return set()
+        used = set()
+        for stmt in statements:
+            used |= get_identifiers(stmt.expr)
+        used_variables = [variables[name] for name in used
+                          if isinstance(variables.get(name, None),
+                                        ArrayVariable)]
+        for varname in repeated:
+            var = variables[varname]
+            if (any(used_var is var for used_var in used_variables) or
+                    any(stmt.var == varname and stmt.op not in ('+=', '-=')
+                        for stmt in statements)):
+                self.repeated_index_writes = True
+                return set()
+        return repeated
+
     def translate_one_statement_sequence(self, statements):
         variables = self.variables
         variable_indices = self.variable_indices
         read, write, indices, conditional_write_vars = self.arrays_helper(statements)
+        scatter_add = self.scatter_add_variables(statements, write)
+        # Variables updated via scatter-add do not have to be read or written
+        read -= scatter_add
+        write -= scatter_add
         lines = []
         # index and read arrays (index arrays first)
         for varname in itertools.chain(indices, read):
@@ -67,6 +120,19 @@ class NumpyCodeGenerator(CodeGenerator):
         for stmt in statements:
             if stmt.op==':=':
                 created_vars.add(stmt.var)
+            if stmt.var in scatter_add:
+                # Add the values for all indices, taking care of repeated
+                # indices
+                expr = self.translate_expression(stmt.expr)
+                if stmt.op == '-=':
+                    expr = '-(' + expr + ')'
+                line = '_scatter_add({array_name}, {index}, {expr}'.format(array_name=self.get_array_name(variables[stmt.var]),
+                                                                          index=variable_indices[stmt.var],
+                                                                          expr=expr)
+                if stmt.var in conditional_write_vars:
+                    line += ', ' + conditional_write_vars[stmt.var]
+                lines.append(line + ')')
+                continue
             line = self.translate_statement(stmt)
             if stmt.var in conditional_write_vars:
                 subs = {}
@@ -127,7 +193,8 @@ class NumpyCodeGenerator(CodeGenerator):
         except ImportError:
             scipy_available = False
 
-        return {'_scipy_available': scipy_available}
+        return {'_scipy_available': scipy_available,
+                '_repeated_index_writes': self.repeated_index_writes}
 
 ################################################################################
 # Implement functions
@@ -38,6 +38,14 @@ prefs.register_preferences(
         appended to the end automatically, where ``$prefix`` is Python's
         site-specific directory prefix as returned by `sys.prefix`.
         '''
+        ),
+    compile_processes = BrianPreference(
+        default=0,
+        docs='''
+        The number of processes used to compile the code objects of a network
+        in parallel. Defaults to 0, meaning that the number of CPUs is used.
+        Set to 1 to compile all code objects one after the other.
+        '''
         )
     )
 
@@ -52,6 +60,7 @@ class CythonCodeObject(NumpyCodeObject):
                                        'dtype': numpy.dtype})
     generator_class = CythonCodeGenerator
     class_name = 'cython'
+    supports_deferred_compilation = True
 
     def __init__(self, owner, code, variables, variable_indices,
                  template_name, template_source, name='cython_code_object*'):
@@ -62,6 +71,8 @@ class CythonCodeObject(NumpyCodeObject):
         self.extra_compile_args = prefs['codegen.runtime.cython.extra_compile_args']
         self.include_dirs = list(prefs['codegen.runtime.cython.include_dirs'])
         self.include_dirs += [os.path.join(sys.prefix, 'include')]
+        self._compiled = False
+        self._state = None
 
     @staticmethod
     def is_available():
@@ -87,9 +98,43 @@ class CythonCodeObject(NumpyCodeObject):
         self.compiled_code = cython_extension_manager.create_extension(self.code,
                                                                        compile_args=self.extra_compile_args,
                                                                        include=self.include_dirs)
-        
+        self._compiled = True
+        self.bind_namespace()
+
+    @classmethod
+    def compile_all(cls, code_objects):
+        # Code objects might already have been compiled because they were
+        # needed before the end of the deferred compilation
+        code_objects = [codeobj for codeobj in code_objects
+                        if not codeobj._compiled]
+        processes = prefs['codegen.runtime.cython.compile_processes']
+        if processes <= 0:
+            processes = None  # use the number of CPUs
+        extensions = [(codeobj.code,
+                       dict(compile_args=codeobj.extra_compile_args,
+                            include=codeobj.include_dirs))
+                      for codeobj in code_objects]
+        modules = cython_extension_manager.create_extensions(extensions,
+                                                             processes=processes)
+        for codeobj, module in zip(code_objects, modules):
+            codeobj.compiled_code = module
+            codeobj._compiled = True
+            codeobj.bind_namespace()
+
+    def bind_namespace(self):
+        '''
+        Extract the arrays and constant values from the namespace and store
+        them in the compiled module's ``CodeObjectState``, so that they do not
+        have to be extracted again for every call. Values that change between
+        calls (the ``nonconstant_values``) are still taken from the namespace.
+        '''
+        self._state = self.compiled_code.CodeObjectState(self.namespace)
+
     def run(self):
-        return self.compiled_code.main(self.namespace)
+        if not self._compiled:
+            # The compilation has been deferred, but the code is needed now
+            self.compile()
+        return self.compiled_code.main(self._state, self.namespace)
 
     # the following are copied from WeaveCodeObject
 
@@ -8,6 +8,7 @@ import imp
 import os
 import sys
 import time
+import multiprocessing
 
 try:
     import hashlib
@@ -30,92 +31,74 @@ from brian2.utils.stringtools import deindent
 __all__ = ['cython_extension_manager']
 
 
+def _build_module(args):
+    '''
+    Build a single extension module (used as the target function for a
+    process pool in `CythonExtensionManager.create_extensions`).
+    '''
+    try:
+        return cython_extension_manager._build_module(*args)
+    except Exception:
+        # The module will be built again (and the error reported) when it is
+        # loaded
+        return False
+
+
 class CythonExtensionManager(object):
     def __init__(self):
         self._code_cache = {}
-        
-    def create_extension(self, code, force=False, name=None,
-                         include=None, library_dirs=None, compile_args=None, link_args=None, lib=None,
-                         ):
-
-        if Cython is None:
-            raise ImportError('Cython is not available')
-
-        code = deindent(code)
 
+    @property
+    def lib_dir(self):
         lib_dir = os.path.expanduser('~/.brian/cython_extensions')
         if not os.path.exists(lib_dir):
             os.makedirs(lib_dir)
+        return lib_dir
 
+    def _module_name(self, code, force=False, name=None):
+        '''
+        Return the key in the code cache and the name of the module for the
+        given code.
+        '''
         key = code, sys.version_info, sys.executable, Cython.__version__
-            
+
         if force:
             # Force a new module name by adding the current time to the
             # key which is hashed to determine the module name.
-            key += time.time(),            
-
-        if key in self._code_cache:
-            return self._code_cache[key]
+            key += time.time(),
 
         if name is not None:
             module_name = name#py3compat.unicode_to_str(args.name)
         else:
             module_name = "_cython_magic_" + hashlib.md5(str(key).encode('utf-8')).hexdigest()
+        return key, module_name
 
+    def create_extension(self, code, force=False, name=None,
+                         include=None, library_dirs=None, compile_args=None, link_args=None, lib=None,
+                         ):
 
+        if Cython is None:
+            raise ImportError('Cython is not available')
+
+        code = deindent(code)
+
+        lib_dir = self.lib_dir
+
+        key, module_name = self._module_name(code, force=force, name=name)
+
+        if key in self._code_cache:
+            return self._code_cache[key]
 
         module_path = os.path.join(lib_dir, module_name + self.so_ext)
         
         have_module = os.path.isfile(module_path)
         
         if not have_module:
-            if include is None:
-                include = []
-            if library_dirs is None:
-                library_dirs = []
-            if compile_args is None:
-                compile_args = []
-            if link_args is None:
-                link_args = []
-            if lib is None:
-                lib = []
-                
-            c_include_dirs = include
-            if 'numpy' in code:
-                import numpy
-                c_include_dirs.append(numpy.get_include())
-            pyx_file = os.path.join(lib_dir, module_name + '.pyx')
-            # ignore Python 3 unicode stuff for the moment
-            #pyx_file = py3compat.cast_bytes_py2(pyx_file, encoding=sys.getfilesystemencoding())
-            #with io.open(pyx_file, 'w') as f:#, encoding='utf-8') as f:
-            #    f.write(code)
-            open(pyx_file, 'w').write(code)
-
-            extension = Extension(
-                name=module_name,
-                sources=[pyx_file],
-                include_dirs=c_include_dirs,
-                library_dirs=library_dirs,
-                extra_compile_args=compile_args,
-                extra_link_args=link_args,
-                libraries=lib,
-                language='c++',
-                )
-            build_extension = self._get_build_extension()
-            try:
-                opts = dict(
-                    quiet=True,
-                    annotate=False,
-                    force=True,
-                    )
-                # suppresses the output on stdout
-                with std_silent():
-                    build_extension.extensions = Cython_Build.cythonize([extension], **opts)
-
-                    build_extension.build_temp = os.path.dirname(pyx_file)
-                    build_extension.build_lib = lib_dir
-                    build_extension.run()
-            except Cython_Compiler.Errors.CompileError:
+            if not self._build_module(lib_dir, module_name, code,
+                                      include=include,
+                                      library_dirs=library_dirs,
+                                      compile_args=compile_args,
+                                      link_args=link_args, lib=lib):
                 return
 
         module = imp.load_dynamic(module_name, module_path)
@@ -123,6 +106,116 @@ class CythonExtensionManager(object):
         return module
         #self._import_all(module)
 
+    def create_extensions(self, extensions, processes=None):
+        '''
+        Create several extensions. All extensions that have not been compiled
+        before are compiled in parallel, using a pool of processes.
+
+        Parameters
+        ----------
+        extensions : list of (str, dict)
+            The code for each extension and the keyword arguments for
+            `create_extension`.
+        processes : int, optional
+            The maximum number of extensions that are compiled at the same
+            time. Defaults to the number of CPUs.
+
+        Returns
+        -------
+        modules : list
+            The module for each extension (see `create_extension`).
+        '''
+        if Cython is None:
+            raise ImportError('Cython is not available')
+
+        lib_dir = self.lib_dir
+        jobs = {}
+        for code, kwds in extensions:
+            code = deindent(code)
+            key, module_name = self._module_name(code,
+                                                 force=kwds.get('force', False),
+                                                 name=kwds.get('name', None))
+            if key in self._code_cache or module_name in jobs:
+                continue
+            module_path = os.path.join(lib_dir, module_name + self.so_ext)
+            if not os.path.isfile(module_path):
+                # Don't change the include directories of the caller
+                include = list(kwds.get('include', None) or [])
+                jobs[module_name] = (lib_dir, module_name, code, include,
+                                     kwds.get('library_dirs', None),
+                                     kwds.get('compile_args', None),
+                                     kwds.get('link_args', None),
+                                     kwds.get('lib', None))
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+        if len(jobs) > 1 and processes > 1:
+            pool = multiprocessing.Pool(min(processes, len(jobs)))
+            try:
+                pool.map(_build_module, jobs.values())
+            finally:
+                pool.close()
+                pool.join()
+        # All modules that could be compiled exist now and will only be loaded
+        return [self.create_extension(code, **kwds)
+                for code, kwds in extensions]
+
+    def _build_module(self, lib_dir, module_name, code, include=None,
+                      library_dirs=None, compile_args=None, link_args=None,
+                      lib=None):
+        '''
+        Build an extension module and store it in ``lib_dir``. Returns whether
+        the compilation was successful.
+        '''
+        if include is None:
+            include = []
+        if library_dirs is None:
+            library_dirs = []
+        if compile_args is None:
+            compile_args = []
+        if link_args is None:
+            link_args = []
+        if lib is None:
+            lib = []
+
+        c_include_dirs = include
+        if 'numpy' in code:
+            import numpy
+            c_include_dirs.append(numpy.get_include())
+        pyx_file = os.path.join(lib_dir, module_name + '.pyx')
+        # ignore Python 3 unicode stuff for the moment
+        #pyx_file = py3compat.cast_bytes_py2(pyx_file, encoding=sys.getfilesystemencoding())
+        #with io.open(pyx_file, 'w') as f:#, encoding='utf-8') as f:
+        #    f.write(code)
+        open(pyx_file, 'w').write(code)
+
+        extension = Extension(
+            name=module_name,
+            sources=[pyx_file],
+            include_dirs=c_include_dirs,
+            library_dirs=library_dirs,
+            extra_compile_args=compile_args,
+            extra_link_args=link_args,
+            libraries=lib,
+            language='c++',
+            )
+        build_extension = self._get_build_extension()
+        try:
+            opts = dict(
+                quiet=True,
+                annotate=False,
+                force=True,
+                )
+            # suppresses the output on stdout
+            with std_silent():
+                build_extension.extensions = Cython_Build.cythonize([extension], **opts)
+
+                build_extension.build_temp = os.path.dirname(pyx_file)
+                build_extension.build_lib = lib_dir
+                build_extension.run()
+        except Cython_Compiler.Errors.CompileError:
+            return False
+        return True
+
     @property
     def so_ext(self):
         """The extension suffix for compiled modules."""
@@ -18,12 +18,23 @@ from libc.stdint cimport int32_t, int64_t, uint8_t
 {% block template_support_code %}
 {% endblock %}
 
-def main(_namespace):
+# The arrays and constant values of the namespace, extracted only once when
+# the code object is bound to its namespace. Values that change during a run
+# (e.g. t or the data of growing dynamic arrays) are taken from the namespace
+# in each call of main.
+cdef class CodeObjectState:
+    cdef object _owner
+    {{ state_declarations | autoindent }}
+
+    def __init__(self, _namespace):
+        self._owner = _namespace.get('_owner', None)
+        {{ bind_namespace | autoindent }}
+
+def main(CodeObjectState _state, _namespace):
     cdef int _idx
     cdef int _vectorisation_idx
+    _owner = _state._owner
     {{ load_namespace | autoindent }}
-    if '_owner' in _namespace:
-        _owner = _namespace['_owner']
     {% block maincode %}
     {{ vector_code | autoindent }}
     {% endblock %}
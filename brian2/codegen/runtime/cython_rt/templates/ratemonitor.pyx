@@ -2,13 +2,14 @@
 
 {% block maincode %}
     {# USES_VARIABLES { t, rate, _clock_t, _clock_dt, _spikespace,
-                        _num_source_neurons, _source_start, _source_stop } #}
+                        _num_source_neurons, _num_recorded,
+                        _source_start, _source_stop } #}
 
     cdef int _num_spikes = {{_spikespace}}[_num{{_spikespace}}-1]
     
     # For subgroups, we do not want to record all spikes
     # We assume that spikes are ordered
-    cdef int _start_idx = 0
+    cdef int _start_idx = _num_spikes
     cdef int _end_idx = -1
     cdef int _j
     for _j in range(_num_spikes):
@@ -25,11 +26,14 @@
         _end_idx =_num_spikes
     _num_spikes = _end_idx - _start_idx
     
-    # Calculate the new length for the arrays
-    cdef int _new_len = {{_dynamic_t}}.shape[0] + 1
+    # Calculate the new number of recorded values
+    cdef int _new_len = {{_num_recorded}}[0] + 1
+    {{_num_recorded}}[0] = _new_len
 
-    # Resize the arrays
-    _owner.resize(_new_len)
+    if _new_len > {{_dynamic_t}}.shape[0]:
+        # The arrays are preallocated in before_run, this is only needed if
+        # more values are recorded than expected
+        _owner.resize(2*_new_len)
 
     # Set the new values
     {{_dynamic_t}}.data[_new_len-1] = _clock_t
@@ -1,7 +1,7 @@
 {% extends 'common.pyx' %}
 
 {% block maincode %}
-    {# USES_VARIABLES { t, i, _clock_t, _spikespace, _count,
+    {# USES_VARIABLES { t, i, _clock_t, _spikespace, _count, _num_recorded,
                         _source_start, _source_stop} #}
     cdef int _num_spikes = {{_spikespace}}[_num{{_spikespace}}-1]
     cdef int _start_idx, _end_idx, _curlen, _newlen, _j
@@ -11,7 +11,7 @@
         # For subgroups, we do not want to record all spikes
         # We assume that spikes are ordered
         # TODO: Will this assumption ever be violated?
-        _start_idx = 0
+        _start_idx = _num_spikes
         _end_idx = - 1
         for _j in range(_num_spikes):
             _idx = {{_spikespace}}[_j]
@@ -27,11 +27,13 @@
             _end_idx =_num_spikes
         _num_spikes = _end_idx - _start_idx
         if _num_spikes > 0:
-            # Get the current length and new length of t and i arrays
-            _curlen = {{_dynamic_t}}.shape[0]
+            # Get the current and new number of recorded spikes
+            _curlen = {{_num_recorded}}[0]
             _newlen = _curlen + _num_spikes
-            # Resize the arrays
-            _owner.resize(_newlen)
+            {{_num_recorded}}[0] = _newlen
+            if _newlen > {{_dynamic_t}}.shape[0]:
+                # Grow the arrays geometrically, they are trimmed in after_run
+                _owner.resize(max(_newlen, 2*{{_dynamic_t}}.shape[0]))
             # Get the potentially newly created underlying data arrays
             _t_view = {{_dynamic_t}}.data
             _i_view = {{_dynamic_i}}.data
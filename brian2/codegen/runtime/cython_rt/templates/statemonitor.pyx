@@ -1,37 +1,104 @@
 {% extends 'common.pyx' %}
 
-{# USES_VARIABLES { t, _clock_t, _indices } #}
+{# USES_VARIABLES { t, _clock_t, _indices, _num_recorded } #}
+
+{# Update the accumulated value for a reduction (or store the value directly
+   if values are not accumulated) #}
+{% macro _update(varname, value, index) -%}
+{% set source, reduction = _recorded_sources[varname] %}
+{% if not _accumulators %}
+_record_data_{{varname}}[_new_len-1, {{index}}] = {{value}}
+{% else %}
+{% set _acc = get_array_name(_accumulators[varname]) %}
+{% if reduction == 'mean' %}
+{{_acc}}[{{index}}] = {{value}} if _step == 0 else {{_acc}}[{{index}}] + {{value}}
+{% elif reduction == 'min' %}
+{{_acc}}[{{index}}] = {{value}} if (_step == 0 or {{value}} < {{_acc}}[{{index}}]) else {{_acc}}[{{index}}]
+{% else %}
+{{_acc}}[{{index}}] = {{value}} if (_step == 0 or {{value}} > {{_acc}}[{{index}}]) else {{_acc}}[{{index}}]
+{% endif %}
+{% endif %}
+{%- endmacro %}
 
 {% block maincode %}
 
-    # Get the current length and new length of t and value arrays
-    cdef int _curlen = {{_dynamic_t}}.shape[0]
-    cdef int _new_len = _curlen + 1
+    # The number of recorded time steps after storing the current values
+    cdef int _new_len = {{_num_recorded}}[0] + 1
+    cdef int _i
+
+    {% if _block_size > 1 %}
+    cdef int _step = {{_block_step}}[0]
+    {% endif %}
+    {% if _accumulators %}
+    # Store the aggregated values at the end of each block
+    cdef bint _store = _step == {{_block_size - 1}}
+    if _step == 0:
+        {{_block_start_t}}[0] = _clock_t
+    {% elif _block_size > 1 %}
+    # Only record the first time step of each block
+    cdef bint _store = _step == 0
+    {% else %}
+    cdef bint _store = True
+    {% endif %}
 
-    # Resize the arrays
-    _owner.resize(_new_len)
-    # Get the potentially newly created underlying data arrays and copy the
-    # data (this will translate to a Python statement but it's only one off)
-    {{_dynamic_t}}[_new_len-1] = _clock_t
+    if _store:
+        {{_num_recorded}}[0] = _new_len
+        if _new_len > {{_dynamic_t}}.shape[0]:
+            # The arrays are preallocated in before_run, this is only needed
+            # if more values are recorded than expected
+            _owner.resize(2*_new_len)
+        # Copy the data (this will translate to a Python statement but it's
+        # only one off)
+        {% if _accumulators %}
+        {{_dynamic_t}}[_new_len-1] = {{_block_start_t}}[0]
+        {% else %}
+        {{_dynamic_t}}[_new_len-1] = _clock_t
+        {% endif %}
 
     # scalar code
     _vectorisation_idx = 1
     {{ scalar_code|autoindent }}
 
-    cdef int _i
-
     {% for varname, var in _recorded_variables.items() %}
-    {% set c_type = cpp_dtype(variables[varname].dtype) %}
-    {% set np_type = numpy_dtype(variables[varname].dtype) %}
-    cdef {{c_type}}[:, :] _record_data_{{varname}} = {{get_array_name(var, access_data=False)}}.data.view(_numpy.{{np_type}})
-    for _i in range(_num{{_indices}}):
-        # vector code
-        _idx = {{_indices}}[_i]
-        _vectorisation_idx = _idx
-        
-        {{ vector_code | autoindent }}
-
-        _record_data_{{varname}}[_new_len-1, _i] = _to_record_{{varname}}
+    {% set source = _recorded_sources[varname][0] %}
+    {% set c_type = cpp_dtype(var.dtype) %}
+    {% set np_type = numpy_dtype(var.dtype) %}
+    cdef {{c_type}}[:, :] _record_data_{{varname}}
+    if _store:
+        _record_data_{{varname}} = {{get_array_name(var, access_data=False)}}.data.view(_numpy.{{np_type}})
+    {% if _population %}
+    cdef double _population_{{varname}} = 0
+    {% endif %}
+    if {{ 'True' if _accumulators else '_store' }}:
+        for _i in range(_num{{_indices}}):
+            # vector code
+            _idx = {{_indices}}[_i]
+            _vectorisation_idx = _idx
+
+            {{ vector_code|autoindent }}
+
+            {% if _population %}
+            _population_{{varname}} += _to_record_{{source}}
+            {% else %}
+            {{ _update(varname, '_to_record_' + source, '_i')|autoindent }}
+            {% endif %}
+        {% if _population %}
+        _population_{{varname}} /= _num{{_indices}}
+        {{ _update(varname, '_population_' + varname, '0')|autoindent }}
+        {% endif %}
+    {% if _accumulators %}
+    if _store:
+        for _i in range({{ '1' if _population else '_num' + _indices }}):
+            {% if _recorded_sources[varname][1] == 'mean' %}
+            _record_data_{{varname}}[_new_len-1, _i] = {{get_array_name(_accumulators[varname])}}[_i] / {{_block_size}}
+            {% else %}
+            _record_data_{{varname}}[_new_len-1, _i] = {{get_array_name(_accumulators[varname])}}[_i]
+            {% endif %}
+    {% endif %}
     {% endfor %}
 
+    {% if _block_size > 1 %}
+    {{_block_step}}[0] = (_step + 1) % {{_block_size}}
+    {% endif %}
+
 {% endblock %}
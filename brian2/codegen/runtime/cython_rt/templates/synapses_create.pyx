@@ -37,8 +37,24 @@ cdef void _flush_buffer(buf, dynarr, int N):
     _vectorisation_idx = 1
     {{scalar_code|autoindent}}
 
+    {% if skip_ahead %}
+    # The connection probability is a constant: skip ahead to the next pair
+    # that passes the probability test, the distance is geometrically
+    # distributed
+    cdef double _log_skip_ahead = log(1.0 - _skip_ahead_p)
+    cdef double _skip
+    {% endif %}
     for _i in range(_num{{_all_pre}}):
+        {% if skip_ahead %}
+        _j = -1
+        while True:
+            _skip = floor(log(1.0 - _rand(_j)) / _log_skip_ahead)
+            if _skip >= _num{{_all_post}} - _j - 1:
+                break
+            _j += 1 + <int>_skip
+        {% else %}
         for _j in range(_num{{_all_post}}):
+        {% endif %}
             _vectorisation_idx = _j
 
             {# The abstract code consists of the following lines (the first two lines
@@ -55,9 +71,11 @@ cdef void _flush_buffer(buf, dynarr, int N):
             
             # add to buffer
             if _cond:
+                {% if not skip_ahead %}
                 if _p!=1.0:
                     if _rand(_vectorisation_idx)>=_p:
                         continue
+                {% endif %}
                 for _repetition in range(_n):
                     {{N_outgoing}}[_pre_idx] += 1
                     {{N_incoming}}[_post_idx] += 1
@@ -1,2 +1,6 @@
-def main(ns):
-    ns['_owner'].initialise_queue()
+class CodeObjectState(object):
+    def __init__(self, _namespace):
+        self._owner = _namespace['_owner']
+
+def main(_state, _namespace):
+    _state._owner.initialise_queue()
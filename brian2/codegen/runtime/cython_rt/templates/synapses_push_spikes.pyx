@@ -1,2 +1,6 @@
-def main(ns):
-    ns['_owner'].push_spikes()
+class CodeObjectState(object):
+    def __init__(self, _namespace):
+        self._owner = _namespace['_owner']
+
+def main(_state, _namespace):
+    _state._owner.push_spikes()
@@ -1,6 +1,9 @@
 '''
 Module providing `NumpyCodeObject`.
 '''
+import sys
+import multiprocessing
+
 import numpy as np
 
 from brian2.core.preferences import prefs, BrianPreference
@@ -13,9 +16,12 @@ from ...codeobject import CodeObject
 from ...templates import Templater
 from ...generators.numpy_generator import NumpyCodeGenerator
 from ...targets import codegen_targets
+from brian2.utils.logger import get_logger
 
 __all__ = ['NumpyCodeObject']
 
+logger = get_logger(__name__)
+
 # Preferences
 prefs.register_preferences(
     'codegen.runtime.numpy',
@@ -26,10 +32,163 @@ prefs.register_preferences(
         Whether to change the namespace of user-specifed functions to remove
         units.
         '''
+        ),
+    synapse_creation_block_size = BrianPreference(
+        default=10000,
+        docs='''
+        The number of (pre, post) pairs for which the condition is evaluated at
+        once when creating synapses with a string condition (see
+        `Synapses.connect`). Each block contains all pairs for at least one
+        presynaptic neuron. Evaluating several presynaptic neurons at once
+        reduces the Python overhead if the target group is small, but very
+        large blocks are slower because of the increased memory traffic.
+        '''
+        ),
+    synapse_creation_processes = BrianPreference(
+        default=1,
+        docs='''
+        The number of processes that are used to evaluate the blocks of
+        (pre, post) pairs (see `codegen.runtime.numpy.synapse_creation_block_size`)
+        when creating synapses with a string condition. Defaults to 1, i.e.
+        all blocks are evaluated in the main process. Note that with more than
+        one process, each block uses its own random number generator, seeded
+        from numpy's global random number generator, therefore the created
+        synapses will differ from the ones created with a single process
+        for probabilistic connections. Only supported on platforms where
+        processes can be forked (i.e. not on Windows).
+        '''
         )
     )
 
 
+#: The function evaluated by `evaluate_blocks` in the worker processes
+_block_function = None
+
+
+def _evaluate_block(args):
+    block, seed = args
+    np.random.seed(seed)
+    return _block_function(block)
+
+
+def evaluate_blocks(func, blocks, processes=1):
+    '''
+    Evaluate a function for a list of blocks, potentially in parallel.
+
+    Parameters
+    ----------
+    func : function
+        The function to evaluate, receives a block as its only argument. Since
+        the worker processes are forked from the current process, `func` does
+        not have to be picklable (only its return values).
+    blocks : list
+        The arguments for `func`.
+    processes : int, optional
+        The number of processes to use. For a value of 1 (the default), the
+        function is evaluated in the current process.
+
+    Returns
+    -------
+    results : list
+        The results of `func` for each block.
+    '''
+    global _block_function
+    if processes > 1 and sys.platform == 'win32':
+        logger.warn('Cannot evaluate code in parallel on Windows, using a '
+                    'single process instead.', 'no_fork', once=True)
+        processes = 1
+    if processes <= 1 or len(blocks) <= 1:
+        return [func(block) for block in blocks]
+
+    # Make sure that each block uses different random numbers
+    seeds = np.random.randint(np.iinfo(np.int32).max, size=len(blocks))
+    _block_function = func
+    pool = multiprocessing.Pool(processes)
+    try:
+        return pool.map(_evaluate_block, zip(blocks, seeds))
+    finally:
+        pool.close()
+        pool.join()
+        _block_function = None
+
+
+def bernoulli_indices(n, p):
+    '''
+    Randomly select from ``range(n)``, each index being selected independently
+    with probability `p`. Instead of drawing a random number for every index,
+    the distances between selected indices are drawn from a geometric
+    distribution, the cost is therefore proportional to the number of selected
+    indices.
+
+    Parameters
+    ----------
+    n : int
+        The number of indices to select from.
+    p : float
+        The probability to select an index, has to be > 0.
+
+    Returns
+    -------
+    indices : `ndarray`
+        The sorted selected indices.
+    '''
+    if n <= 0:
+        return np.array([], dtype=np.int64)
+    # Draw somewhat more than the expected number of gaps to make more than
+    # one iteration unlikely
+    expected = n * p
+    chunk_size = int(expected + 5 * np.sqrt(expected) + 10)
+    chunks = []
+    last = -1
+    while True:
+        indices = last + np.cumsum(np.random.geometric(p, size=chunk_size))
+        if indices[-1] >= n:
+            chunks.append(indices[:np.searchsorted(indices, n)])
+            break
+        chunks.append(indices)
+        last = indices[-1]
+    return np.concatenate(chunks)
+
+
+#: `scatter_add` uses `np.bincount` (which works on the full array) instead of
+#: `np.add.at` if there are at least ``len(array)/_BINCOUNT_FRACTION`` indices
+_BINCOUNT_FRACTION = 16
+
+
+def scatter_add(array, indices, values, condition=None):
+    '''
+    Add `values` to ``array[indices]``, taking into account repeated indices
+    (in contrast to ``array[indices] += values``).
+
+    Parameters
+    ----------
+    array : `ndarray`
+        The array to update (in-place).
+    indices : `ndarray` of int
+        The indices to update, can contain repeated values.
+    values : {`ndarray`, scalar}
+        The values to add.
+    condition : `ndarray` of bool, optional
+        Only update the indices where `condition` is ``True`` (see conditional
+        writes for refractoriness).
+    '''
+    if condition is not None:
+        indices = indices[condition]
+        if np.ndim(values):
+            values = values[condition]
+    if not len(indices):
+        return
+    if (array.dtype.kind == 'f' and
+            len(indices) * _BINCOUNT_FRACTION >= len(array)):
+        # For many indices, np.bincount is much faster than np.add.at
+        if np.ndim(values):
+            array += np.bincount(indices, weights=values, minlength=len(array))
+        else:
+            array += np.bincount(indices, minlength=len(array)) * values
+    else:
+        np.add.at(array, indices, values)
+
+
 class NumpyCodeObject(CodeObject):
     '''
     Execute code using Numpy
@@ -46,7 +205,8 @@ class NumpyCodeObject(CodeObject):
         self.device = get_device()
         self.namespace = {'_owner': owner,
                           # TODO: This should maybe go somewhere else
-                          'logical_not': np.logical_not}
+                          'logical_not': np.logical_not,
+                          '_scatter_add': scatter_add}
         CodeObject.__init__(self, owner, code, variables, variable_indices,
                             template_name, template_source, name=name)
         self.variables_to_namespace()
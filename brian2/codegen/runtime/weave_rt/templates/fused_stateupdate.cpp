@@ -0,0 +1,56 @@
+{% extends 'common_group.cpp' %}
+{# USES_VARIABLES { N } #}
+{# ALLOWS_SCALAR_WRITE #}
+
+{# The state update, threshold and (optionally) the reset of a NeuronGroup in
+   a single loop, see brian2.groups.neurongroup.fuse_neuron_updates #}
+{% block maincode %}
+	{# USES_VARIABLES {_spikespace } #}
+	// t, not_refractory and lastspike are added as needed_variables in the
+	// StateUpdater class, we cannot use the USES_VARIABLE mechanism
+	// conditionally
+
+	//// MAIN CODE ////////////
+	// scalar code (in nested scopes, since the blocks might declare the same
+	// constants)
+	const int _vectorisation_idx = 1;
+	{{scalar_code['stateupdate']|autoindent}}
+	{
+	{{scalar_code['threshold']|autoindent}}
+	{
+	{% if _fused_reset %}
+	{{scalar_code['reset']|autoindent}}
+	{% endif %}
+
+	long _cpp_numspikes = 0;
+	for(int _idx=0; _idx<N; _idx++)
+	{
+		const int _vectorisation_idx = _idx;
+		{
+			// vector code (state update)
+			{{vector_code['stateupdate']|autoindent}}
+		}
+		{
+			// vector code (threshold)
+			{{vector_code['threshold']|autoindent}}
+			if(_cond) {
+				{{_spikespace}}[_cpp_numspikes++] = _idx;
+				{% if _fused_reset %}
+				{
+					// vector code (reset), executed before the neuron is
+					// marked as refractory, i.e. before the conditional write
+					// on not_refractory would prevent it
+					{{vector_code['reset']|autoindent}}
+				}
+				{% endif %}
+				{% if _uses_refractory %}
+				{{not_refractory}}[_idx] = false;
+				{{lastspike}}[_idx] = t;
+				{% endif %}
+			}
+		}
+	}
+	{{_spikespace}}[N] = _cpp_numspikes;
+	}
+	}
+{% endblock %}
@@ -2,11 +2,12 @@
 {% macro main() %}
     {{ common.insert_group_preamble() }}
     {# USES_VARIABLES { t, rate, _clock_t, _clock_dt, _spikespace,
-                        _num_source_neurons, _source_start, _source_stop } #}
+                        _num_source_neurons, _num_recorded,
+                        _source_start, _source_stop } #}
 	int _num_spikes = {{_spikespace}}[_num_spikespace-1];
     // For subgroups, we do not want to record all spikes
     // We assume that spikes are ordered
-    int _start_idx = 0;
+    int _start_idx = _num_spikes;
     int _end_idx = - 1;
     for(int _j=0; _j<_num_spikes; _j++)
     {
@@ -27,11 +28,16 @@
     if (_end_idx == -1)
         _end_idx =_num_spikes;
     _num_spikes = _end_idx - _start_idx;
-    // Calculate the new length for the arrays
-    const npy_int _new_len = (npy_int)({{_dynamic_t}}.attr("shape")[0]) + 1;
+    // Calculate the new number of recorded values
+    const npy_int _new_len = {{_num_recorded}}[0] + 1;
+    {{_num_recorded}}[0] = _new_len;
 
-    // Resize the arrays
-    PyObject_CallMethod(_owner, "resize", "i", _new_len);
+    if (_new_len > (npy_int)({{_dynamic_t}}.attr("shape")[0]))
+    {
+        // The arrays are preallocated in before_run, this is only needed if
+        // more values are recorded than expected
+        PyObject_CallMethod(_owner, "resize", "i", 2*_new_len);
+    }
 
     // Get the potentially newly created underlying data arrays
     double *t_data = (double*)(((PyArrayObject*)(PyObject*){{_dynamic_t}}.attr("data"))->data);
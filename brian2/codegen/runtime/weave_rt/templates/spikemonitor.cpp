@@ -2,14 +2,14 @@
 {% macro main() %}
     {{ common.insert_pointers_lines() }}
 
-    {# USES_VARIABLES { t, i, _clock_t, _spikespace, _count,
+    {# USES_VARIABLES { t, i, _clock_t, _spikespace, _count, _num_recorded,
                         _source_start, _source_stop} #}
 	int _num_spikes = {{_spikespace}}[_num_spikespace-1];
     if (_num_spikes > 0)
     {
         // For subgroups, we do not want to record all spikes
         // We assume that spikes are ordered
-        int _start_idx = 0;
+        int _start_idx = _num_spikes;
         int _end_idx = - 1;
         for(int _j=0; _j<_num_spikes; _j++)
         {
@@ -31,13 +31,18 @@
             _end_idx =_num_spikes;
         _num_spikes = _end_idx - _start_idx;
         if (_num_spikes > 0) {
-            // Get the current length and new length of t and i arrays
-            const int _curlen = {{_dynamic_t}}.attr("shape")[0];
+            // Get the current and new number of recorded spikes
+            const int _curlen = {{_num_recorded}}[0];
             const int _newlen = _curlen + _num_spikes;
-            // Resize the arrays
-            py::tuple _newlen_tuple(1);
-            _newlen_tuple[0] = _newlen;
-            _owner.mcall("resize", _newlen_tuple);
+            {{_num_recorded}}[0] = _newlen;
+            const int _capacity = {{_dynamic_t}}.attr("shape")[0];
+            if (_newlen > _capacity)
+            {
+                // Grow the arrays geometrically, they are trimmed in after_run
+                py::tuple _newlen_tuple(1);
+                _newlen_tuple[0] = _newlen > 2*_capacity ? _newlen : 2*_capacity;
+                _owner.mcall("resize", _newlen_tuple);
+            }
             // Get the potentially newly created underlying data arrays
             double *_t_data = (double*)(((PyArrayObject*)(PyObject*){{_dynamic_t}}.attr("data"))->data);
             // TODO: How to get the correct datatype automatically here?
@@ -1,39 +1,121 @@
 {% extends 'common_group.cpp' %}
 
+{# Update the accumulated value for a reduction (or store the value directly
+   if values are not accumulated) #}
+{% macro _update(varname, value, index) -%}
+{% set source, reduction = _recorded_sources[varname] %}
+{% if not _accumulators %}
+*({{c_data_type(_recorded_variables[varname].dtype)}}*)(_record_data_{{varname}} + (_new_len - 1)*_record_stride0_{{varname}} + {{index}}*_record_stride1_{{varname}}) = {{value}};
+{% else %}
+{% set _acc = get_array_name(_accumulators[varname]) %}
+{% if reduction == 'mean' %}
+{{_acc}}[{{index}}] = _step == 0 ? {{value}} : {{_acc}}[{{index}}] + {{value}};
+{% elif reduction == 'min' %}
+{{_acc}}[{{index}}] = (_step == 0 || {{value}} < {{_acc}}[{{index}}]) ? {{value}} : {{_acc}}[{{index}}];
+{% else %}
+{{_acc}}[{{index}}] = (_step == 0 || {{value}} > {{_acc}}[{{index}}]) ? {{value}} : {{_acc}}[{{index}}];
+{% endif %}
+{% endif %}
+{%- endmacro %}
+
 {% block maincode %}
-    {# USES_VARIABLES { t, _clock_t, _indices } #}
+    {# USES_VARIABLES { t, _clock_t, _indices, _num_recorded } #}
 
-    // Get the current length and new length of t and value arrays
-    const int _curlen = {{_dynamic_t}}.attr("shape")[0];
-    const int _new_len = _curlen + 1;
-    // Resize the arrays
-    PyObject_CallMethod(_owner, "resize", "i", _new_len);
+    // The number of recorded time steps after storing the current values
+    const int _new_len = {{_num_recorded}}[0] + 1;
+    {% if _block_size > 1 %}
+    const int _step = {{_block_step}}[0];
+    {% endif %}
+    {% if _accumulators %}
+    // Store the aggregated values at the end of each block
+    const bool _store = _step == {{_block_size - 1}};
+    if (_step == 0)
+        {{_block_start_t}}[0] = _clock_t;
+    {% elif _block_size > 1 %}
+    // Only record the first time step of each block
+    const bool _store = _step == 0;
+    {% else %}
+    const bool _store = true;
+    {% endif %}
 
-    // Get the potentially newly created underlying data arrays and copy the
-    // data
-    double *_t_data = (double*)(((PyArrayObject*)(PyObject*){{_dynamic_t}}.attr("data"))->data);
-    _t_data[_new_len - 1] = _clock_t;
+    if (_store)
+    {
+        {{_num_recorded}}[0] = _new_len;
+        const int _capacity = {{_dynamic_t}}.attr("shape")[0];
+        if (_new_len > _capacity)
+        {
+            // The arrays are preallocated in before_run, this is only needed
+            // if more values are recorded than expected
+            PyObject_CallMethod(_owner, "resize", "i", 2*_new_len);
+        }
 
+        // Get the potentially newly created underlying data arrays and copy the
+        // data
+        double *_t_data = (double*)(((PyArrayObject*)(PyObject*){{_dynamic_t}}.attr("data"))->data);
+        {% if _accumulators %}
+        _t_data[_new_len - 1] = {{_block_start_t}}[0];
+        {% else %}
+        _t_data[_new_len - 1] = _clock_t;
+        {% endif %}
+    }
 
     // scalar code
 	const int _vectorisation_idx = 1;
 	{{scalar_code|autoindent}}
 
     {% for varname, var in _recorded_variables.items() %}
-    {%set c_type = c_data_type(variables[varname].dtype) %}
+    {% set source = _recorded_sources[varname][0] %}
+    {%set c_type = c_data_type(var.dtype) %}
     {
-        PyArrayObject *_record_data = (((PyArrayObject*)(PyObject*){{get_array_name(var, access_data=False)}}.attr("data")));
-        const npy_intp* _record_strides = _record_data->strides;
-        for (int _i = 0; _i < _num_indices; _i++)
+        char *_record_data_{{varname}} = NULL;
+        npy_intp _record_stride0_{{varname}} = 0, _record_stride1_{{varname}} = 0;
+        if (_store)
         {
-            // vector code
-            const int _idx = {{_indices}}[_i];
-            const int _vectorisation_idx = _idx;
-            {{ super() }}
+            PyArrayObject *_record_data = (((PyArrayObject*)(PyObject*){{get_array_name(var, access_data=False)}}.attr("data")));
+            _record_data_{{varname}} = _record_data->data;
+            _record_stride0_{{varname}} = _record_data->strides[0];
+            _record_stride1_{{varname}} = _record_data->strides[1];
+        }
+        {% if _population %}
+        double _population_{{varname}} = 0;
+        {% endif %}
+        if ({{ 'true' if _accumulators else '_store' }})
+        {
+            for (int _i = 0; _i < _num_indices; _i++)
+            {
+                // vector code
+                const int _idx = {{_indices}}[_i];
+                const int _vectorisation_idx = _idx;
+                {{ super() }}
 
-            {{c_type}} *recorded_entry = ({{c_type}}*)(_record_data->data + (_new_len - 1)*_record_strides[0] + _i*_record_strides[1]);
-            *recorded_entry = _to_record_{{varname}};
+                {% if _population %}
+                _population_{{varname}} += _to_record_{{source}};
+                {% else %}
+                {{ _update(varname, '_to_record_' + source, '_i')|autoindent }}
+                {% endif %}
+            }
+            {% if _population %}
+            _population_{{varname}} /= _num_indices;
+            {{ _update(varname, '_population_' + varname, '0')|autoindent }}
+            {% endif %}
         }
+        {% if _accumulators %}
+        if (_store)
+        {
+            for (int _i = 0; _i < {{ '1' if _population else '_num_indices' }}; _i++)
+            {
+                {% if _recorded_sources[varname][1] == 'mean' %}
+                *({{c_type}}*)(_record_data_{{varname}} + (_new_len - 1)*_record_stride0_{{varname}} + _i*_record_stride1_{{varname}}) = {{get_array_name(_accumulators[varname])}}[_i] / {{_block_size}};
+                {% else %}
+                *({{c_type}}*)(_record_data_{{varname}} + (_new_len - 1)*_record_stride0_{{varname}} + _i*_record_stride1_{{varname}}) = {{get_array_name(_accumulators[varname])}}[_i];
+                {% endif %}
+            }
+        }
+        {% endif %}
     }
     {% endfor %}
+
+    {% if _block_size > 1 %}
+    {{_block_step}}[0] = (_step + 1) % {{_block_size}};
+    {% endif %}
 {% endblock %}
@@ -17,10 +17,25 @@
 	const int _vectorisation_idx = 1;
 	{{scalar_code|autoindent}}
 
+    {% if skip_ahead %}
+    // The connection probability is a constant: skip ahead to the next pair
+    // that passes the probability test, the distance is geometrically
+    // distributed
+    const double _log_skip_ahead = log(1.0 - _skip_ahead_p);
+    {% endif %}
     for(int _i=0; _i<_num_all_pre; _i++)
     {
+        {% if skip_ahead %}
+        for(int _j=-1; ;)
+        {
+            const double _skip = floor(log(1.0 - _rand(_j)) / _log_skip_ahead);
+            if (_skip >= _num_all_post - _j - 1)
+                break;
+            _j += 1 + (int)_skip;
+        {% else %}
         for(int _j=0; _j<_num_all_post; _j++)
         {
+        {% endif %}
             const int _vectorisation_idx = _j;
             {# The abstract code consists of the following lines (the first two lines
             are there to properly support subgroups as sources/targets):
@@ -35,12 +50,14 @@
             // Add to buffer
             if(_cond)
             {
+                {% if not skip_ahead %}
                 if (_p != 1.0) {
                     // We have to use _rand instead of rand to use our rand
                     // function, not the one from the C standard library
                     if (_rand(_vectorisation_idx) >= _p)
                         continue;
                 }
+                {% endif %}
 
                 for (int _repetition=0; _repetition<_n; _repetition++) {
                     {{N_outgoing}}[_pre_idx] += 1;
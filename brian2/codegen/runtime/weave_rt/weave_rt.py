@@ -9,13 +9,16 @@ from distutils.ccompiler import get_default_compiler
 try:
     from scipy import weave
     from scipy.weave.c_spec import num_to_c_types
+    from scipy.weave import inline_tools
 except ImportError:
     try:  # weave as an independent package
         import weave
         from weave.c_spec import num_to_c_types
+        from weave import inline_tools
     except ImportError:
         # No weave for Python 3
         weave = None
+        inline_tools = None
 
 from brian2.core.variables import (DynamicArrayVariable, ArrayVariable,
                                    AttributeVariable, AuxiliaryVariable,
@@ -90,6 +93,9 @@ class WeaveCodeObject(CodeObject):
         from brian2.devices.device import get_device
         self.device = get_device()
         self._done_first_run = False
+        #: The compiled function returned by weave, called directly after the
+        #: first run (see `WeaveCodeObject.run`)
+        self.compiled_function = None
         self.namespace = {'_owner': owner}
         super(WeaveCodeObject, self).__init__(owner, code, variables,
                                               variable_indices,
@@ -124,6 +130,10 @@ include_dirs:
             
         self.python_code_namespace = {'_owner': owner}
         self.variables_to_namespace()
+        # The compiled function takes the dictionaries of local and global
+        # variables as arguments. The namespace is updated in place, so the
+        # same arguments can be used for every call.
+        self.compiled_function_args = (self.namespace, globals())
 
     @staticmethod
     def is_available():
@@ -208,13 +218,17 @@ include_dirs:
             self.compiled_python_post = compile(self.code.python_post, '(string)', 'exec')
         else:
             self.compiled_python_post = None
+        self.has_main_code = len(self.code.main.strip()) > 0
 
-    def run(self):
-        if self.compiled_python_pre is not None:
-            exec self.compiled_python_pre in self.python_code_namespace
+    def inline(self):
+        '''
+        Run the code with ``weave.inline``, compiling it if necessary. Stores
+        the compiled function for direct calls in the following runs.
+        '''
         with std_silent(self._done_first_run):
             ret_val = weave.inline(self.annotated_code, self.namespace.keys(),
                                    local_dict=self.namespace,
+                                   global_dict=self.compiled_function_args[1],
                                    support_code=self.code.support_code,
                                    compiler=self.compiler,
                                    headers=['<algorithm>', '<limits>'],
@@ -222,6 +236,33 @@ include_dirs:
                                    include_dirs=self.include_dirs,
                                    verbose=0)
         self._done_first_run = True
+        # weave caches the function that has been used for the code, calling
+        # it directly avoids hashing the code, the catalog lookup and the
+        # processing of the arguments in weave.inline. If the function cannot
+        # be found, the code will be run with weave.inline again.
+        self.compiled_function = inline_tools.function_cache.get(self.annotated_code,
+                                                                 None)
+        return ret_val
+
+    def run(self):
+        if self.compiled_python_pre is not None:
+            exec self.compiled_python_pre in self.python_code_namespace
+        if not self.has_main_code:
+            # Templates that only execute Python code (e.g. for pushing
+            # spikes) do not need a call to compiled code
+            ret_val = None
+        elif self.compiled_function is None:
+            ret_val = self.inline()
+        else:
+            try:
+                ret_val = self.compiled_function(*self.compiled_function_args)
+            except (TypeError, NameError) as ex:
+                # The types of the arguments changed, weave.inline will
+                # compile a new version of the function (this is how weave
+                # itself handles a failed call of a cached function)
+                if not str(ex).strip().startswith('Conversion Error'):
+                    raise
+                ret_val = self.inline()
         if self.compiled_python_post is not None:
             exec self.compiled_python_post in self.python_code_namespace
         return ret_val
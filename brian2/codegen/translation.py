@@ -208,8 +208,9 @@ class LIONodeRenderer(NodeRenderer):
     Renders expressions, pulling out scalar expressions and remembering them
     for later use.
     '''
-    def __init__(self, variables):
+    def __init__(self, variables, prefix='_lio_const_'):
         self.variables = variables
+        self.prefix = prefix
         self.optimisations = OrderedDict()
         self.n = 0
         NodeRenderer.__init__(self, use_vectorisation_idx=False)
@@ -227,14 +228,15 @@ class LIONodeRenderer(NodeRenderer):
                 name = self.optimisations[expr]
             else:
                 self.n += 1
-                name = '_lio_const_'+str(self.n)
+                name = self.prefix+str(self.n)
                 self.optimisations[expr] = name
             return name
         else:
             return NodeRenderer.render_node(self, node)
 
 
-def apply_loop_invariant_optimisations(statements, variables, dtype):
+def apply_loop_invariant_optimisations(statements, variables, dtype,
+                                       prefix='_lio_const_'):
     '''
     Analyzes statements to pull out expressions that need to be evaluated only
     once.
@@ -248,6 +250,9 @@ def apply_loop_invariant_optimisations(statements, variables, dtype):
         `Function` objects.
     dtype : `dtype`
         The data type to use for the newly introduced scalar constants
+    prefix : str, optional
+        The prefix for the names of the newly introduced scalar constants,
+        they will be numbered consecutively. Defaults to ``'_lio_const_'``.
 
     Returns
     -------
@@ -256,7 +261,7 @@ def apply_loop_invariant_optimisations(statements, variables, dtype):
         need to be evaluated only once and the rewritten statements using those
         constants
     '''
-    renderer = LIONodeRenderer(variables)
+    renderer = LIONodeRenderer(variables, prefix=prefix)
 
     vector_statements = []
     for stmt in statements:
@@ -276,7 +281,7 @@ def apply_loop_invariant_optimisations(statements, variables, dtype):
     return scalar_constants, vector_statements
 
 
-def make_statements(code, variables, dtype):
+def make_statements(code, variables, dtype, lio_prefix='_lio_const_'):
     '''
     Turn a series of abstract code statements into Statement objects, inferring
     whether each line is a set/declare operation, whether the variables are
@@ -291,6 +296,11 @@ def make_statements(code, variables, dtype):
         identifier used in the `code`.
     dtype : `dtype`
         The data type to use for temporary variables
+    lio_prefix : str, optional
+        The prefix for the names of scalar constants introduced by the loop
+        invariant optimisations (see `apply_loop_invariant_optimisations`).
+        Code blocks that are combined in a single template have to use
+        different prefixes.
 
     Returns
     -------
@@ -471,7 +481,8 @@ def make_statements(code, variables, dtype):
     if prefs.codegen.loop_invariant_optimisations:
         scalar_constants, vector_statements = apply_loop_invariant_optimisations(vector_statements,
                                                                                  variables,
-                                                                                 dtype)
+                                                                                 dtype,
+                                                                                 prefix=lio_prefix)
         scalar_statements.extend(scalar_constants)
 
     return scalar_statements, vector_statements
@@ -149,9 +149,25 @@ class BrianObject(Nameable):
         '''
         pass
 
+    #: A timer function (e.g. `timeit.default_timer`), set by `Network.run`
+    #: during a profiled run to measure the time spent in generated code
+    _code_timer = None
+
+    #: The time spent in generated code during the last call of `run`, only
+    #: measured if `_code_timer` is set
+    _code_elapsed = 0.0
+
     def run(self):
-        for codeobj in self._code_objects:
-            codeobj()
+        if self._code_timer is None:
+            for codeobj in self._code_objects:
+                codeobj()
+        else:
+            self._code_elapsed = 0.0
+            for codeobj in self._code_objects:
+                codeobj.update_namespace()
+                start = self._code_timer()
+                codeobj.run()
+                self._code_elapsed += self._code_timer() - start
 
     contained_objects = property(fget=lambda self:self._contained_objects,
                                  doc='''
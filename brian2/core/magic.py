@@ -221,6 +221,7 @@ class MagicNetwork(Network):
                     break
 
     def after_run(self):
+        super(MagicNetwork, self).after_run()
         self.objects[:] = []
         gc.collect()  # Make sure that all unused objects are cleared
 
@@ -320,9 +321,10 @@ def run(duration, report=None, report_period=10*second, namespace=None,
         from 0 to 1.
     report_period : `Quantity`
         How frequently (in real time) to report progress.
-    profile : bool, optional
+    profile : bool or `Profiler`, optional
         Whether to record profiling information (see `Network.profiling_info`).
-        Defaults to ``False``.
+        Defaults to ``True``. A `Profiler` object can be given to customize the
+        collected information (see `Network.run`).
     namespace : dict-like, optional
         A namespace in which objects which do not define their own
         namespace will be run. If not namespace is given, the locals and
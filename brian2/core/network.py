@@ -1,7 +1,9 @@
 import sys
 import gc
 import time
+import math
 from collections import defaultdict
+from timeit import default_timer
 
 import numpy as np
 
@@ -12,10 +14,11 @@ from brian2.core.clocks import Clock
 from brian2.units.fundamentalunits import check_units, DimensionMismatchError
 from brian2.units.allunits import second, msecond 
 from brian2.core.preferences import prefs
+from brian2.codegen.codeobject import deferred_compilation
 
 from .base import device_override
 
-__all__ = ['Network', 'profiling_summary']
+__all__ = ['Network', 'Profiler', 'profiling_summary']
 
 
 logger = get_logger(__name__)
@@ -91,6 +94,228 @@ class TextReport(object):
         # Flush the stream, this is useful if stream is a file
         self.stream.flush()
 
+
+#: The number of bins per decade in the histograms of `ProfilingStatistics`
+_HISTOGRAM_BINS_PER_DECADE = 10
+#: The lower edge of the histograms in `ProfilingStatistics` (as a power of 10)
+_HISTOGRAM_MIN_EXPONENT = -7
+#: The upper edge of the histograms in `ProfilingStatistics` (as a power of 10)
+_HISTOGRAM_MAX_EXPONENT = 3
+
+
+class ProfilingStatistics(object):
+    '''
+    Timing statistics for the executions of a single object, collected by
+    `Profiler`. All times are stored in seconds (as floats).
+
+    Parameters
+    ----------
+    name : str
+        The name of the object.
+    '''
+    def __init__(self, name):
+        #: The name of the object
+        self.name = name
+        #: The number of executions
+        self.calls = 0
+        #: The total time spent in the executions
+        self.total = 0.0
+        #: The time spent in the generated code (the remaining time is
+        #: spent in Python code, e.g. to update namespaces)
+        self.code_total = 0.0
+        #: The time taken by the fastest execution
+        self.min = np.inf
+        #: The time taken by the slowest execution
+        self.max = 0.0
+        n_bins = ((_HISTOGRAM_MAX_EXPONENT - _HISTOGRAM_MIN_EXPONENT) *
+                  _HISTOGRAM_BINS_PER_DECADE)
+        #: Histogram of the execution times, using logarithmically spaced
+        #: bins (see `bin_edges`)
+        self.histogram = np.zeros(n_bins, dtype=int)
+
+    bin_edges = property(lambda self: 10**(_HISTOGRAM_MIN_EXPONENT +
+                                           np.arange(len(self.histogram) + 1) /
+                                           float(_HISTOGRAM_BINS_PER_DECADE)),
+                         doc='The edges of the bins used for `histogram`.')
+
+    def add(self, elapsed, code_elapsed=0.0):
+        '''
+        Add the timing of a single execution.
+
+        Parameters
+        ----------
+        elapsed : float
+            The total time taken by the execution.
+        code_elapsed : float, optional
+            The part of `elapsed` that was spent in generated code.
+        '''
+        self.calls += 1
+        self.total += elapsed
+        self.code_total += code_elapsed
+        if elapsed < self.min:
+            self.min = elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+        if elapsed > 0:
+            idx = int((math.log10(elapsed) - _HISTOGRAM_MIN_EXPONENT) *
+                      _HISTOGRAM_BINS_PER_DECADE)
+            idx = min(max(idx, 0), len(self.histogram) - 1)
+        else:
+            idx = 0
+        self.histogram[idx] += 1
+
+    mean = property(lambda self: self.total / self.calls if self.calls else 0.0,
+                    doc='The mean time taken by an execution.')
+
+    python_total = property(lambda self: self.total - self.code_total,
+                            doc='The total time spent outside of generated '
+                                'code.')
+
+    def percentile(self, q):
+        '''
+        Return the (approximate) execution time below which the given
+        percentage of executions fall. The value is determined from the
+        `histogram`, its precision is therefore limited by the bin size.
+
+        Parameters
+        ----------
+        q : float
+            The percentage (between 0 and 100).
+
+        Returns
+        -------
+        t : float
+            The upper edge of the histogram bin containing the percentile
+            (limited to the range between `min` and `max`).
+        '''
+        if not self.calls:
+            return 0.0
+        cumulative = np.cumsum(self.histogram)
+        idx = np.searchsorted(cumulative, q / 100.0 * self.calls)
+        idx = min(idx, len(self.histogram) - 1)
+        return min(max(self.bin_edges[idx + 1], self.min), self.max)
+
+
+class Profiler(object):
+    '''
+    Collect detailed profiling information during `Network.run`. An object of
+    this class (or of a subclass) can be passed as the ``profile`` argument of
+    `Network.run`. In contrast to ``profile=True``, which only measures the
+    total time of each object, this measures the time spent in generated code
+    separately and collects `ProfilingStatistics` for each object, which adds
+    some overhead to every execution. The statistics are reset at the start
+    of each run.
+
+    For each execution of an object, `Network.run` calls `record` with the
+    total time of the execution and the time spent in generated code. Objects
+    that do not execute any code objects (e.g. a `NetworkOperation`) only
+    spend time in Python code. Subclasses can override `start`, `record`, and
+    `stop` to collect other information.
+
+    Parameters
+    ----------
+    callback : callable, optional
+        A function that will be called for every execution of an object, with
+        the arguments ``(name, t, elapsed, code_elapsed)``, where ``t`` is the
+        simulation time (in seconds, as a float) and the other arguments are
+        the arguments of `record`. This can be used to stream the information
+        to an external system.
+
+    Examples
+    --------
+    >>> from brian2 import *
+    >>> G = NeuronGroup(10, 'dv/dt = -v/(10*ms) : 1', name='neurons')
+    >>> net = Network(G)
+    >>> profiler = Profiler()
+    >>> net.run(1*ms, profile=profiler)
+    >>> print(profiler.statistics['neurons_stateupdater'].calls)
+    10
+    '''
+    def __init__(self, callback=None):
+        #: The function called for every execution
+        self.callback = callback
+        #: A dictionary mapping object names to `ProfilingStatistics`
+        self.statistics = {}
+
+    def start(self, net):
+        '''
+        Called at the beginning of a run, resets the statistics.
+
+        Parameters
+        ----------
+        net : `Network`
+            The network that is run.
+        '''
+        self.statistics = {}
+
+    def record(self, name, t, elapsed, code_elapsed):
+        '''
+        Record the execution of an object.
+
+        Parameters
+        ----------
+        name : str
+            The name of the object.
+        t : float
+            The current simulation time (in seconds).
+        elapsed : float
+            The time (in seconds) taken by the execution.
+        code_elapsed : float
+            The part of `elapsed` spent in generated code.
+        '''
+        stats = self.statistics.get(name, None)
+        if stats is None:
+            stats = self.statistics[name] = ProfilingStatistics(name)
+        stats.add(elapsed, code_elapsed)
+        if self.callback is not None:
+            self.callback(name, t, elapsed, code_elapsed)
+
+    def stop(self, net):
+        '''
+        Called at the end of a run.
+
+        Parameters
+        ----------
+        net : `Network`
+            The network that has been run.
+        '''
+        pass
+
+    profiling_info = property(lambda self: [(name, stats.total*second)
+                                            for name, stats in self.statistics.iteritems()],
+                              doc='The total time of each object, in the '
+                                  'format of `Network.profiling_info`.')
+
+
+def _format_time(t):
+    '''
+    Format a time (in seconds, as a float) with two decimals, using s, ms or
+    us as the unit.
+    '''
+    for unit_name, factor in [('s', 1.), ('ms', 1e-3)]:
+        if t >= factor:
+            return '%.2f %s' % (t/factor, unit_name)
+    return '%.2f us' % (t/1e-6)
+
+
+def _timed_run(obj):
+    '''
+    Execute an object and measure the time taken. The time spent in generated
+    code is measured by `BrianObject.run` if the object's ``_code_timer`` is
+    set, objects with their own ``run`` method (e.g. a `NetworkOperation`)
+    do not spend any time in generated code.
+
+    Returns
+    -------
+    elapsed, code_elapsed : float
+        The total time and the time spent in generated code (i.e. in
+        `CodeObject.run`, without the update of the namespace).
+    '''
+    start = default_timer()
+    obj.run()
+    return default_timer() - start, obj._code_elapsed
+
+
 class Network(Nameable):
     '''
     Network(*objs, name='network*')
@@ -178,6 +403,14 @@ class Network(Nameable):
 
         # Stored profiling information (if activated via the keyword option)
         self._profiling_info = None
+
+        # Cached lists of the objects to run for each combination of clocks
+        # (see `Network._scheduled_objects`)
+        self._object_schedules = {}
+
+        #: The `Profiler` used during the last run (or ``None`` if the last
+        #: run was not profiled)
+        self.profiler = None
      
     t = property(fget=lambda self: self.t_*second,
                  doc='''
@@ -261,6 +494,7 @@ class Network(Nameable):
                                        'set its active flag to False instead.'
                                        % obj.name)
                 self.objects.append(obj)
+                self._object_schedules = {}
                 self.add(obj.contained_objects)
             else:
                 try:
@@ -290,6 +524,7 @@ class Network(Nameable):
         for obj in objs:
             if isinstance(obj, BrianObject):
                 self.objects.remove(obj)
+                self._object_schedules = {}
                 self.remove(obj.contained_objects)
             else:
                 try:
@@ -419,6 +654,12 @@ class Network(Nameable):
         Network._globally_stopped = False
         
         self._sort_objects()
+        # The cached schedules refer to the previous order of objects/clocks
+        self._object_schedules = {}
+
+        # Merge neuronal operations into a single code object where possible
+        from brian2.groups.neurongroup import fuse_neuron_updates
+        fuse_neuron_updates(self.objects)
 
         logger.debug("Preparing network {self.name} with {numobj} "
                      "objects: {objnames}".format(self=self,
@@ -428,15 +669,17 @@ class Network(Nameable):
 
         self.check_dependencies()
 
-        for obj in self.objects:
-            if obj.active:
-                try:
-                    obj.before_run(run_namespace, level=level+2)
-                except DimensionMismatchError as ex:
-                    raise DimensionMismatchError(('An error occured preparing '
-                                                  'object "%s":\n%s') % (obj.name,
-                                                                          ex.desc),
-                                                 *ex.dims)
+        # Compile the code objects of all objects together (e.g. in parallel)
+        with deferred_compilation():
+            for obj in self.objects:
+                if obj.active:
+                    try:
+                        obj.before_run(run_namespace, level=level+2)
+                    except DimensionMismatchError as ex:
+                        raise DimensionMismatchError(('An error occured preparing '
+                                                      'object "%s":\n%s') % (obj.name,
+                                                                              ex.desc),
+                                                     *ex.dims)
 
         # Check that no object has been run as part of another network before
         for obj in self.objects:
@@ -464,15 +707,63 @@ class Network(Nameable):
             if obj.active:
                 obj.after_run()
         
-    def _nextclocks(self):
-        # Getting Clock.t_ is relatively expensive since it involves a
-        # multiplication therefore we extract it only once
-        clocks_times = [(clock, clock.t_) for clock in self._clocks]
-        minclock, min_time = min(clocks_times, key=lambda k: k[1])
-        curclocks = set(clock for clock, time in clocks_times if
-                        (time == min_time or
-                         abs(time - min_time)<Clock.epsilon))
-        return minclock, curclocks
+    def _nextclocks(self, clocks, clock_times):
+        '''
+        Determine the clocks that have to be updated next.
+
+        Parameters
+        ----------
+        clocks : list of `Clock`
+            All clocks of the network.
+        clock_times : list of float
+            The current times of the `clocks`. Getting `Clock.t_` is relatively
+            expensive since it involves a multiplication, therefore the times
+            are only updated for clocks that have been ticked.
+
+        Returns
+        -------
+        minclock : `Clock`
+            The clock with the smallest time.
+        min_time : float
+            The time of `minclock`.
+        curclocks : tuple of int
+            The indices of all clocks that have (up to `Clock.epsilon`) the
+            same time as `minclock`.
+        '''
+        if len(clocks) == 1:
+            return clocks[0], clock_times[0], (0, )
+        min_time = min(clock_times)
+        curclocks = tuple(idx for idx, time in enumerate(clock_times)
+                          if (time == min_time or
+                              abs(time - min_time)<Clock.epsilon))
+        minclock = clocks[clock_times.index(min_time)]
+        return minclock, min_time, curclocks
+
+    def _scheduled_objects(self, clocks, curclocks):
+        '''
+        Return the objects that have to be run for the given clocks, in the
+        order of `Network.objects`. The lists are cached for each combination
+        of clocks, the cache is invalidated when objects are added or removed.
+        The lists contain inactive objects as well, the
+        `~BrianObject.active` flag has to be checked right before running an
+        object, since it might be changed by an earlier object in the same
+        time step.
+
+        Parameters
+        ----------
+        clocks : list of `Clock`
+            All clocks of the network.
+        curclocks : tuple of int
+            The indices of the clocks that are updated (as returned by
+            `Network._nextclocks`).
+        '''
+        objects = self._object_schedules.get(curclocks, None)
+        if objects is None:
+            current_clocks = set(clocks[idx] for idx in curclocks)
+            objects = [obj for obj in self.objects
+                       if obj._clock in current_clocks]
+            self._object_schedules[curclocks] = objects
+        return objects
 
     @device_override('network_run')
     @check_units(duration=second, report_period=second)
@@ -504,9 +795,13 @@ class Network(Nameable):
             A namespace that will be used in addition to the group-specific
             namespaces (if defined). If not specified, the locals
             and globals around the run function will be used.
-        profile : bool, optional
+        profile : bool or `Profiler`, optional
             Whether to record profiling information (see
-            `Network.profiling_info`). Defaults to ``True``.
+            `Network.profiling_info`). Defaults to ``True``, which records the
+            total time spent in each object. Alternatively, a `Profiler`
+            object (e.g. with a callback or of a custom subclass) can be given
+            to collect more detailed statistics, it will be available as
+            `Network.profiler` after the run.
         level : int, optional
             How deep to go up the stack frame to look for the locals/global
             (see `namespace` argument). Only used by run functions that call
@@ -528,8 +823,10 @@ class Network(Nameable):
             clock.set_interval(self.t, t_end)
 
         self.before_run(namespace, level=level+3)
+        clocks = list(self._clocks)
+        clock_times = [c.t_ for c in clocks]
         # Find the first clock to be updated (see note below)
-        clock, curclocks = self._nextclocks()
+        clock, min_time, curclocks = self._nextclocks(clocks, clock_times)
         if report is not None:
             report_period = float(report_period)
             start = current = time.time()
@@ -550,11 +847,21 @@ class Network(Nameable):
                                  'but it is of type %s') % type(report))
             report_callback(0*second, 0.0, duration)
 
-        profiling_info = defaultdict(float)
+        # profile=True only measures the total time of each object, the
+        # detailed statistics are only collected with a Profiler
+        if isinstance(profile, Profiler):
+            profiler = profile
+            profiler.start(self)
+            profiling_info = None
+        else:
+            profiler = None
+            profiling_info = defaultdict(float) if profile else None
+        for obj in self.objects:
+            obj._code_timer = default_timer if profiler is not None else None
 
         while clock.running and not self._stopped and not Network._globally_stopped:
             # update the network time to this clocks time
-            self.t_ = clock.t_
+            self.t_ = min_time
             if report is not None:
                 current = time.time()
                 if current > next_report_time:
@@ -562,24 +869,30 @@ class Network(Nameable):
                                     (self.t_ - float(t_start))/float(t_end),
                                     duration)
                     next_report_time = current + report_period
-                # update the objects with this clock
-            for obj in self.objects:
-                if obj._clock in curclocks and obj.active:
-                    if profile:
-                        obj_time = time.time()
-                        obj.run()
-                        profiling_info[obj.name] += (time.time() - obj_time)
-                    else:
-                        obj.run()
+            # update the objects with this clock
+            for obj in self._scheduled_objects(clocks, curclocks):
+                if not obj.active:
+                    continue
+                if profiling_info is not None:
+                    obj_time = time.time()
+                    obj.run()
+                    profiling_info[obj.name] += (time.time() - obj_time)
+                elif profiler is not None:
+                    elapsed, code_elapsed = _timed_run(obj)
+                    profiler.record(obj.name, self.t_, elapsed,
+                                    code_elapsed)
+                else:
+                    obj.run()
 
             # tick the clock forward one time step
-            for c in curclocks:
-                c.tick()
-            # find the next clocks to be updated. The < operator for Clock
-            # determines that the first clock to be updated should be the one
-            # with the smallest t value, unless there are several with the 
-            # same t value in which case we update all of them
-            clock, curclocks = self._nextclocks()
+            for idx in curclocks:
+                clocks[idx].tick()
+                clock_times[idx] = clocks[idx].t_
+            # find the next clocks to be updated. The first clock to be
+            # updated should be the one with the smallest t value, unless
+            # there are several with the same t value in which case we update
+            # all of them
+            clock, min_time, curclocks = self._nextclocks(clocks, clock_times)
 
         if self._stopped or Network._globally_stopped:
             self.t_ = clock.t_
@@ -591,13 +904,18 @@ class Network(Nameable):
         self.after_run()
 
         # Store profiling info (or erase old info to avoid confusion)
-        if profile:
+        self.profiler = profiler
+        if profiler is not None:
+            profiler.stop(self)
+            self._profiling_info = profiler.profiling_info
+        elif profiling_info is not None:
             self._profiling_info = [(name, t*second)
                                     for name, t in profiling_info.iteritems()]
-            # Dump a profiling summary to the log
-            logger.debug('\n' + str(profiling_summary(self)))
         else:
             self._profiling_info = None
+        if self._profiling_info is not None:
+            # Dump a profiling summary to the log
+            logger.debug('\n' + str(profiling_summary(self)))
         
     @device_override('network_stop')
     def stop(self):
@@ -628,9 +946,17 @@ class ProfilingSummary(object):
         The number of results to show (the longest results will be shown). If
         not specified, all results will be shown.
 
+    Notes
+    -----
+    If the network has been run with a `Profiler` that collected
+    `ProfilingStatistics`, the summary additionally shows the number of
+    executions of each object, the mean, minimum, median, 95th percentile and
+    maximum time of an execution, and the percentage of the total time spent
+    in Python code (i.e. outside of generated code).
+
     See Also
     --------
-    Network.profiling_info
+    Network.profiling_info, Profiler
     '''
     def __init__(self, net, show=None):
         prof = net.profiling_info
@@ -654,19 +980,57 @@ class ProfilingSummary(object):
         self.names_maxlen = max(len(name) for name in names)
         self.names = [name+' '*(self.names_maxlen-len(name)) for name in names]
         self.times = times
+        statistics = getattr(net.profiler, 'statistics', None)
+        if statistics and all(name in statistics for name in names):
+            #: The `ProfilingStatistics` for the shown objects (or ``None`` if
+            #: no statistics were collected)
+            self.statistics = [statistics[name] for name in names]
+        else:
+            self.statistics = None
+
+    def _statistics_columns(self):
+        '''
+        Return the formatted columns with the detailed statistics (calls,
+        mean/min/median/95th percentile/max time per call, and percentage of
+        time spent in Python code), as a list of lists of strings (one list
+        per object).
+        '''
+        if self.statistics is None:
+            return [[] for _ in self.names]
+        columns = []
+        for stats in self.statistics:
+            per_call = [stats.mean, stats.min, stats.percentile(50),
+                        stats.percentile(95), stats.max]
+            if stats.total > 0:
+                python_percentage = 100.0*stats.python_total/stats.total
+            else:
+                python_percentage = 0.
+            columns.append(['%d' % stats.calls] +
+                           [_format_time(t) for t in per_call] +
+                           ['%.2f %%' % python_percentage])
+        return columns
 
     def __repr__(self):
         times = ['%.2f %s' % (time/self.time_unit, self.time_unit) for time in self.times]
-        times_maxlen = max(len(time) for time in times)
-        times = [' '*(times_maxlen-len(time))+time for time in times]
         percentages = ['%.2f %%' % percentage for percentage in self.percentages]
-        percentages_maxlen = max(len(percentage) for percentage in percentages)
-        percentages = [(' '*(percentages_maxlen-len(percentage)))+percentage for percentage in percentages]
-
+        rows = [[name, time, percentage] + extra
+                for name, time, percentage, extra in zip(self.names, times,
+                                                         percentages,
+                                                         self._statistics_columns())]
+        if self.statistics is not None:
+            header = ['', 'total', '%', 'calls', 'mean', 'min', 'median',
+                      '95%', 'max', 'python']
+            rows = [header] + rows
+        # Left-align the names, right-align all other columns
+        maxlens = [max(len(row[col]) for row in rows)
+                   for col in xrange(len(rows[0]))]
         s = 'Profiling summary'
         s += '\n'+'='*len(s)+'\n'
-        for name, time, percentage in zip(self.names, times, percentages):
-            s += '%s    %s    %s\n' % (name, time, percentage)
+        for row in rows:
+            cells = [row[0] + ' '*(maxlens[0]-len(row[0]))]
+            cells += [' '*(maxlen-len(cell)) + cell
+                      for cell, maxlen in zip(row[1:], maxlens[1:])]
+            s += '    '.join(cells) + '\n'
         return s
 
     def _repr_html_(self):
@@ -674,11 +1038,22 @@ class ProfilingSummary(object):
         percentages = ['%.2f %%' % percentage for percentage in self.percentages]
         s = '<h2 class="brian_prof_summary_header">Profiling summary</h2>\n'
         s += '<table class="brian_prof_summary_table">\n'
-        for name, time, percentage in zip(self.names, times, percentages):
+        if self.statistics is not None:
+            s += '<tr>'
+            s += ''.join('<th>%s</th>' % header
+                         for header in ['', 'total', '%', 'calls', 'mean',
+                                        'min', 'median', '95%', 'max',
+                                        'python'])
+            s += '</tr>\n'
+        for name, time, percentage, extra in zip(self.names, times,
+                                                 percentages,
+                                                 self._statistics_columns()):
             s += '<tr>'
             s += '<td>%s</td>' % name
             s += '<td style="text-align: right">%s</td>' % time
             s += '<td style="text-align: right">%s</td>' % percentage
+            for cell in extra:
+                s += '<td style="text-align: right">%s</td>' % cell
             s += '</tr>\n'
         s += '</table>'
         return s
@@ -487,6 +487,12 @@ class ArrayVariable(Variable):
         #: denoting the absence of refractoriness)
         self.conditional_write = None
 
+        #: A counter that is increased whenever the values of the variable are
+        #: set from outside of a run (e.g. via a `VariableView`) or when the
+        #: variable is resized. Allows to cache information derived from the
+        #: values (e.g. in the `SpikeQueue`).
+        self.version = 0
+
     def set_conditional_write(self, var):
         if not var.is_boolean:
             raise TypeError(('A variable can only be conditionally writeable '
@@ -499,6 +505,7 @@ class ArrayVariable(Variable):
 
     def set_value(self, value):
         self.device.fill_with_array(self, value)
+        self.version += 1
 
     def get_len(self):
         return self.size
@@ -590,6 +597,7 @@ class DynamicArrayVariable(ArrayVariable):
         '''
         self.device.resize(self, new_size)
         self.size = new_size
+        self.version += 1
 
 
 class Subexpression(Variable):
@@ -912,6 +920,9 @@ class VariableView(object):
             self.set_with_index_array(item, value,
                                       check_units=check_units)
 
+        if isinstance(variable, ArrayVariable):
+            variable.version += 1
+
     def __setitem__(self, item, value):
         self.set_item(item, value, level=1)
 
@@ -0,0 +1,130 @@
+#ifndef _BRIAN_SPIKESTREAM_H
+#define _BRIAN_SPIKESTREAM_H
+
+#include<stdint.h>
+#include<string>
+#include<vector>
+#include<fstream>
+#include<iostream>
+#include<thread>
+#include<mutex>
+#include<condition_variable>
+
+/*
+ * Writes the indices and times of recorded spikes to two binary files during
+ * the simulation. Spikes are collected in one buffer, while a background thread
+ * writes the previously filled buffer to disk. The files contain the raw values
+ * (int32 indices and double times), i.e. the same format as the files written
+ * for dynamic arrays at the end of the simulation. The files are only opened
+ * with a call to open, since their names are not known before the command
+ * line arguments have been parsed.
+ */
+class SpikeStream
+{
+public:
+	SpikeStream(size_t chunk_size) :
+		chunk_size(chunk_size), num_spikes(0), current(0), write_buffer(0),
+		writing(false), finished(false)
+	{
+		for (int b=0; b<2; b++)
+		{
+			indices[b].reserve(chunk_size);
+			times[b].reserve(chunk_size);
+		}
+	};
+
+	~SpikeStream() { close(); };
+
+	// Open the output files and start the writer thread
+	void open(const std::string &index_filename,
+	          const std::string &time_filename)
+	{
+		index_file.open(index_filename.c_str(), std::ios::binary | std::ios::out);
+		time_file.open(time_filename.c_str(), std::ios::binary | std::ios::out);
+		if (!index_file.is_open() || !time_file.is_open())
+			std::cout << "Error opening output files for spike stream." << std::endl;
+		writer = std::thread(&SpikeStream::write_loop, this);
+	};
+
+	inline bool is_open() const { return writer.joinable(); };
+
+	inline void push(int32_t index, double t)
+	{
+		indices[current].push_back(index);
+		times[current].push_back(t);
+		num_spikes++;
+		if (indices[current].size() >= chunk_size)
+			flush();
+	};
+
+	// Hand over the current buffer to the writer thread (waits until the
+	// previous buffer has been written)
+	void flush()
+	{
+		std::unique_lock<std::mutex> lock(mutex);
+		cond.wait(lock, [this]{ return !writing; });
+		write_buffer = current;
+		current = 1 - current;
+		writing = true;
+		cond.notify_all();
+	};
+
+	// Write all remaining spikes and stop the writer thread
+	void close()
+	{
+		if (!writer.joinable())
+			return;
+		flush();
+		{
+			std::unique_lock<std::mutex> lock(mutex);
+			cond.wait(lock, [this]{ return !writing; });
+			finished = true;
+		}
+		cond.notify_all();
+		writer.join();
+		index_file.close();
+		time_file.close();
+	};
+
+	inline size_t size() const { return num_spikes; };
+
+private:
+	void write_loop()
+	{
+		std::unique_lock<std::mutex> lock(mutex);
+		while (true)
+		{
+			cond.wait(lock, [this]{ return writing || finished; });
+			if (!writing)
+				return;
+			const int b = write_buffer;
+			lock.unlock();
+			if (!indices[b].empty())
+			{
+				index_file.write(reinterpret_cast<char*>(&indices[b][0]),
+				                 indices[b].size()*sizeof(int32_t));
+				time_file.write(reinterpret_cast<char*>(&times[b][0]),
+				                times[b].size()*sizeof(double));
+				index_file.flush();
+				time_file.flush();
+				indices[b].clear();
+				times[b].clear();
+			}
+			lock.lock();
+			writing = false;
+			cond.notify_all();
+		}
+	};
+
+	std::ofstream index_file, time_file;
+	std::vector<int32_t> indices[2];
+	std::vector<double> times[2];
+	size_t chunk_size, num_spikes;
+	int current, write_buffer;
+	bool writing, finished;
+	std::thread writer;
+	std::mutex mutex;
+	std::condition_variable cond;
+};
+
+#endif
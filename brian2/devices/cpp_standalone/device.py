@@ -6,9 +6,14 @@ import shutil
 import subprocess
 import inspect
 import platform
+import hashlib
+import json
 from collections import defaultdict
 import numbers
 import tempfile
+import itertools
+import multiprocessing
+from multiprocessing.pool import ThreadPool
 
 import numpy as np
 
@@ -20,10 +25,12 @@ from brian2.core.variables import *
 from brian2.parsing.rendering import CPPNodeRenderer
 from brian2.synapses.synapses import Synapses
 from brian2.core.preferences import prefs, BrianPreference
+from brian2.utils.caching import prune_directory
 from brian2.utils.filetools import copy_directory, ensure_directory, in_directory
 from brian2.utils.stringtools import word_substitute
 from brian2.codegen.generators.cpp_generator import c_data_type
-from brian2.units.fundamentalunits import Quantity, have_same_dimensions
+from brian2.units.fundamentalunits import (Quantity, have_same_dimensions,
+                                           fail_for_dimension_mismatch)
 from brian2.units import second
 from brian2.utils.logger import get_logger, std_silent
 
@@ -47,13 +54,64 @@ prefs.register_preferences(
         are used to launch the simulation.
         ''',
         ),
+    spike_stream_chunk_size = BrianPreference(
+        default=0,
+        docs='''
+        The number of spikes a `SpikeMonitor` collects before writing them to the results directory during the
+        simulation. By default, this value is set to 0 and spikes are kept in memory until the end of the simulation.
+        If greater than 0, spikes are written in chunks of this size by a background thread. This bounds the memory
+        needed to record spikes and keeps the spikes recorded so far if the simulation is interrupted. Needs a
+        compiler supporting C++11.
+        ''',
+        ),
+    object_cache_directory = BrianPreference(
+        default='~/.brian/cpp_standalone_objects',
+        docs='''
+        The directory where compiled object files are stored, so that later builds (also of other projects) can
+        reuse them instead of recompiling unchanged code. Object files are looked up by a hash of their source
+        file, all header files of the project, and the compiler flags. Set to an empty string to not use a
+        cache. The cache is currently only used with gcc.
+        ''',
+        ),
+    object_cache_max_size = BrianPreference(
+        default=500,
+        docs='''
+        The maximum size (in megabytes) of the object files stored in the directory given by the
+        `devices.cpp_standalone.object_cache_directory` preference. If the cache grows beyond this size, the least
+        recently used object files are deleted.
+        ''',
+        ),
+    make_jobs = BrianPreference(
+        default=0,
+        docs='''
+        The number of files that ``make`` compiles in parallel (its ``-j`` option). By default, this value is set
+        to 0 and the number of CPUs is used. Not used for MSVC.
+        ''',
+        ),
     )
 
 
-def freeze(code, ns):
+def cpp_constant(value):
+    '''
+    Return the C++ literal for a number.
+    '''
+    # Use a renderer to correctly transform constants such as True or inf
+    renderer = CPPNodeRenderer()
+    string_value = renderer.render_expr(repr(value))
+    if value < 0:
+        string_value = '(%s)' % string_value
+    return string_value
+
+
+def freeze(code, ns, parameters=()):
     # this is a bit of a hack, it should be passed to the template somehow
     for k, v in ns.items():
 
+        if k in parameters and isinstance(v, Constant):
+            # Run-time parameters are stored in a global variable
+            code = word_substitute(code, {k: '_parameter_' + k})
+            continue
+
         if (isinstance(v, Variable) and not isinstance(v, AttributeVariable) and
               v.scalar and v.constant and v.read_only):
             v = v.get_value()
@@ -61,23 +119,50 @@ def freeze(code, ns):
         if isinstance(v, basestring):
             code = word_substitute(code, {k: v})
         elif isinstance(v, numbers.Number):
-            # Use a renderer to correctly transform constants such as True or inf
-            renderer = CPPNodeRenderer()
-            string_value = renderer.render_expr(repr(v))
-            if v < 0:
-                string_value = '(%s)' % string_value
-            code = word_substitute(code, {k: string_value})
+            code = word_substitute(code, {k: cpp_constant(v)})
         else:
             pass  # don't deal with this object
     return code
 
 
 class CPPWriter(object):
+    '''
+    Writes the files of a project, leaving files with unchanged content
+    untouched (so that ``make`` does not recompile them). The hash, size and
+    modification time of each written file are stored in the file
+    ``file_hashes`` in the project directory, a file whose size and
+    modification time did not change since it was written is therefore not
+    read again.
+    '''
+    hashes_filename = 'file_hashes'
+
     def __init__(self, project_dir):
         self.project_dir = project_dir
         self.source_files = []
         self.header_files = []
-        
+        self.file_hashes = {}
+        hashes_file = os.path.join(project_dir, self.hashes_filename)
+        if os.path.exists(hashes_file):
+            try:
+                with open(hashes_file, 'r') as f:
+                    self.file_hashes = json.load(f)
+            except ValueError:
+                logger.debug('Ignoring corrupted file %s' % hashes_file)
+
+    def _is_unchanged(self, filename, fullfilename, contents_hash):
+        if not os.path.exists(fullfilename):
+            return False
+        stat = os.stat(fullfilename)
+        if filename in self.file_hashes:
+            stored_hash, size, mtime = self.file_hashes[filename]
+            if size == stat.st_size and mtime == stat.st_mtime:
+                return stored_hash == contents_hash
+        # The file has been changed by someone else, compare the contents
+        with open(fullfilename, 'rb') as f:
+            file_hash = hashlib.sha1(f.read()).hexdigest()
+        self.file_hashes[filename] = (file_hash, stat.st_size, stat.st_mtime)
+        return file_hash == contents_hash
+
     def write(self, filename, contents):
         logger.debug('Writing file %s:\n%s' % (filename, contents))
         if filename.lower().endswith('.cpp'):
@@ -89,10 +174,176 @@ class CPPWriter(object):
             self.write(filename[:-1]+'h', contents.h_file)
             return
         fullfilename = os.path.join(self.project_dir, filename)
-        if os.path.exists(fullfilename):
-            if open(fullfilename, 'r').read()==contents:
-                return
+        if isinstance(contents, bytes):
+            contents_hash = hashlib.sha1(contents).hexdigest()
+        else:
+            contents_hash = hashlib.sha1(contents.encode('utf-8')).hexdigest()
+        if self._is_unchanged(filename, fullfilename, contents_hash):
+            return
         open(fullfilename, 'w').write(contents)
+        stat = os.stat(fullfilename)
+        self.file_hashes[filename] = (contents_hash, stat.st_size,
+                                      stat.st_mtime)
+
+    def save_hashes(self):
+        '''
+        Store the hashes of the written files in the project directory.
+        '''
+        with open(os.path.join(self.project_dir, self.hashes_filename),
+                  'w') as f:
+            json.dump(self.file_hashes, f)
+
+
+class ObjectCache(object):
+    '''
+    A directory of compiled object files that can be shared between projects.
+    Each object file (and its dependency file written by the compiler) is
+    stored under a hash of its source file, of all header files of the
+    project, and of the compiler settings.
+
+    Parameters
+    ----------
+    directory : str
+        The directory of the cache, will be created if it does not exist.
+    project_dir : str
+        The directory of the project.
+    source_files : list of str
+        The source files of the project (relative to `project_dir`).
+    header_files : list of str
+        The header files of the project (relative to `project_dir`).
+    settings : str
+        A description of all settings that influence the compilation (compiler
+        flags, make target, etc.).
+    max_size : int, optional
+        The maximum total size of the cached files in bytes. If storing new
+        object files makes the cache exceed this size, the least recently used
+        files are deleted. By default, the size is not limited.
+    '''
+    def __init__(self, directory, project_dir, source_files, header_files,
+                 settings, max_size=None):
+        self.directory = os.path.abspath(os.path.expanduser(directory))
+        ensure_directory(self.directory)
+        self.project_dir = os.path.abspath(project_dir)
+        self.max_size = max_size
+        common_hash = hashlib.sha1(settings.encode('utf-8'))
+        for header in sorted(set(header_files)):
+            common_hash.update(header.encode('utf-8'))
+            with open(os.path.join(project_dir, header), 'rb') as f:
+                common_hash.update(f.read())
+        common_hash = common_hash.hexdigest()
+        #: Maps each source file to the name of its object file in the cache
+        self.keys = {}
+        for source in set(source_files):
+            key = hashlib.sha1(common_hash.encode('utf-8'))
+            key.update(source.encode('utf-8'))
+            with open(os.path.join(project_dir, source), 'rb') as f:
+                key.update(f.read())
+            self.keys[source] = key.hexdigest()
+
+    def _files(self, source):
+        base = os.path.splitext(source)[0]
+        key = self.keys[source]
+        return [(os.path.join(self.project_dir, base + ext),
+                 os.path.join(self.directory, key + ext))
+                for ext in ['.o', '.d']]
+
+    def restore(self):
+        '''
+        Copy the object files from the cache for all sources that do not have
+        an object file in the project directory yet.
+
+        Returns
+        -------
+        restored : int
+            The number of restored object files.
+        '''
+        restored = 0
+        for source in self.keys:
+            files = self._files(source)
+            if (os.path.exists(files[0][0]) or
+                    not all(os.path.exists(cached) for _, cached in files)):
+                continue
+            for local, cached in files:
+                # copying updates the modification time, the object file is
+                # therefore newer than its source file
+                shutil.copyfile(cached, local)
+                # mark the cached file as recently used
+                os.utime(cached, None)
+            restored += 1
+        return restored
+
+    def store(self):
+        '''
+        Copy all object files of the project that are not yet in the cache.
+        '''
+        for source in self.keys:
+            for local, cached in self._files(source):
+                if os.path.exists(cached) or not os.path.exists(local):
+                    continue
+                # Write to a temporary file first, so that other processes
+                # never see a partially written file
+                tmp_name = '%s.%d.tmp' % (cached, os.getpid())
+                shutil.copyfile(local, tmp_name)
+                os.rename(tmp_name, cached)
+        if self.max_size is not None:
+            prune_directory(self.directory, self.max_size, ['.o', '.d'])
+
+
+class StandaloneRun(object):
+    '''
+    The results of a single run of a compiled project, as returned by
+    `CPPStandaloneDevice.run_batch`. Within a ``with`` block, the values of
+    state variables and monitors are read from the results of this run.
+
+    Parameters
+    ----------
+    device : `CPPStandaloneDevice`
+        The device that executed the run.
+    directory : str
+        The directory of the results (relative to the project directory).
+    parameters : dict
+        The parameters of the run.
+    seed : int
+        The seed of the random number generator used for the run.
+    key : int
+        A unique key for the results of this run (see
+        `CPPStandaloneDevice.results_key`).
+    '''
+    def __init__(self, device, directory, parameters, seed, key):
+        self.device = device
+        self.directory = directory
+        self.parameters = parameters
+        self.seed = seed
+        self.key = key
+        self._previous = []
+
+    def __enter__(self):
+        self._previous.append((self.device.results_directory,
+                               self.device.results_key))
+        self.device.results_directory = self.directory
+        self.device.results_key = self.key
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        (self.device.results_directory,
+         self.device.results_key) = self._previous.pop()
+
+    def get_value(self, var):
+        '''
+        Return the values of a variable for this run.
+
+        Parameters
+        ----------
+        var : `ArrayVariable`
+            The variable.
+        '''
+        with self:
+            return self.device.get_value(var)
+
+    def __repr__(self):
+        return '%s(%r, parameters=%r, seed=%d)' % (self.__class__.__name__,
+                                                   self.directory,
+                                                   self.parameters, self.seed)
 
 
 def invert_dict(x):
@@ -124,9 +375,32 @@ class CPPStandaloneDevice(Device):
         #: Whether the simulation has been run
         self.has_been_run = False
 
+        #: The directory (relative to the project directory) from which
+        #: results are read (see `StandaloneRun`)
+        self.results_directory = 'results'
+        #: A unique key for the current results, changes whenever new results
+        #: are available (e.g. to invalidate values derived from the results)
+        self.results_key = None
+        self._results_counter = itertools.count()
+
         #: Dict of all static saved arrays
         self.static_arrays = {}
 
+        #: Set of all dynamic arrays that are written to disk during the run
+        #: (see the ``devices.cpp_standalone.spike_stream_chunk_size``
+        #: preference) instead of in ``_write_arrays``
+        self.streamed_arrays = set()
+
+        #: Names of external constants that are set when running the
+        #: compiled binary (see `declare_parameters`)
+        self.parameter_names = set()
+        #: Dictionary mapping the names of run-time parameters to their
+        #: `Constant` objects, filled during `build`
+        self.parameters = {}
+        #: Dictionary mapping ``'group.variable'`` names to the static arrays
+        #: used to set the variable with an array of values
+        self.initial_arrays = defaultdict(list)
+
         self.code_objects = {}
         self.main_queue = []
         self.report_func = ''
@@ -145,6 +419,21 @@ class CPPStandaloneDevice(Device):
             self.main_queue.append(('insert_code', code))
         else:
             logger.warn("Ignoring device code, unknown slot: %s, code: %s" % (slot, code))
+
+    def declare_parameters(self, *names):
+        '''
+        Declare external constants (e.g. ``tau`` in a model ``dv/dt = -v/tau :
+        1``) as run-time parameters. Their values are not inserted into the
+        generated code, but can be changed for each execution of the compiled
+        binary with the ``parameters`` argument of `run`. The values at the
+        time of the `build` call are used if no other value is given.
+
+        Parameters
+        ----------
+        names : str
+            The names of the constants, as used in the model descriptions.
+        '''
+        self.parameter_names.update(names)
             
     def static_array(self, name, arr):
         assert len(arr), 'length for %s: %d' % (name, len(arr))
@@ -241,6 +530,9 @@ class CPPStandaloneDevice(Device):
         # additional work to set up the pointer
         array_name = self.get_array_name(var, access_data=False)
         static_array_name = self.static_array(array_name, arr)
+        self.initial_arrays['%s.%s' % (var.owner.name,
+                                       var.name)].append((var,
+                                                          static_array_name))
         self.main_queue.append(('set_by_array', (array_name,
                                                  static_array_name)))
 
@@ -310,27 +602,32 @@ class CPPStandaloneDevice(Device):
             # disk
             if self.has_been_run:
                 dtype = var.dtype
-                fname = os.path.join(self.project_dir, 'results',
-                                     array_name)
-                with open(fname, 'rb') as f:
-                    data = np.fromfile(f, dtype=dtype)
+                fname = os.path.join(self.project_dir,
+                                     self.results_directory, array_name)
+                num_values = os.path.getsize(fname) // np.dtype(dtype).itemsize
+                shape = (num_values, )
                 # This is a bit of an heuristic, but our 2d dynamic arrays are
                 # only expanding in one dimension, we assume here that the
                 # other dimension has size 0 at the beginning
                 if isinstance(var.size, tuple) and len(var.size) == 2:
-                    if var.size[0] * var.size[1] == len(data):
-                        return data.reshape(var.size)
-                    elif var.size[0] == 0:
-                        return data.reshape((-1, var.size[1]))
-                    elif var.size[0] == 0:
-                        return data.reshape((var.size[1], -1))
+                    if var.size[0] * var.size[1] == num_values:
+                        shape = var.size
+                    elif var.size[0] == 0 and var.size[1] > 0:
+                        shape = (num_values // var.size[1], var.size[1])
+                    elif var.size[1] == 0 and var.size[0] > 0:
+                        shape = (var.size[0], num_values // var.size[0])
                     else:
                         raise IndexError(('Do not now how to deal with 2d '
                                           'array of size %s, the array on disk '
                                           'has length %d') % (str(var.size),
-                                                              len(data)))
-
-                return data
+                                                              num_values))
+                # np.memmap fails for empty files
+                if num_values == 0:
+                    return np.zeros(shape, dtype=dtype)
+                # Only map the file into memory, the values are read from disk
+                # when they are accessed. Changes to the returned array are not
+                # written back to the file.
+                return np.memmap(fname, dtype=dtype, mode='c', shape=shape)
             raise NotImplementedError('Cannot retrieve the values of state '
                                       'variables in standalone code before the '
                                       'simulation has been run.')
@@ -355,6 +652,15 @@ class CPPStandaloneDevice(Device):
     def code_object(self, owner, name, abstract_code, variables, template_name,
                     variable_indices, codeobj_class=None, template_kwds=None,
                     override_conditional_write=None):
+        if template_name == 'spikemonitor':
+            chunk_size = prefs.devices.cpp_standalone.spike_stream_chunk_size
+            if chunk_size < 0:
+                raise ValueError('The chunk size for streaming spikes can not '
+                                 'be negative.')
+            template_kwds = dict(template_kwds or {})
+            template_kwds['_spike_stream_chunk_size'] = chunk_size
+            if chunk_size > 0:
+                self.streamed_arrays.update([variables['i'], variables['t']])
         codeobj = super(CPPStandaloneDevice, self).code_object(owner, name, abstract_code, variables,
                                                                template_name, variable_indices,
                                                                codeobj_class=codeobj_class,
@@ -399,6 +705,8 @@ class CPPStandaloneDevice(Device):
             A list of additional header files to include in ``main.cpp``.
         run_includes : list of str
             A list of additional header files to include in ``run.cpp``.
+        run_args : list of str
+            Additional command line arguments for the program (see `run`).
         '''
         renames = {'project_dir': 'directory',
                    'compile_project': 'compile',
@@ -499,6 +807,27 @@ class CPPStandaloneDevice(Device):
         for net in networks:
             net.after_run()
 
+        # Collect the run-time parameters, their values at this point are used
+        # as the default values
+        self.parameters = {}
+        for codeobj in self.code_objects.itervalues():
+            for name in self.parameter_names:
+                var = codeobj.variables.get(name, None)
+                if not isinstance(var, Constant):
+                    continue
+                previous = self.parameters.setdefault(name, var)
+                if (previous.get_value() != var.get_value() or
+                        not have_same_dimensions(previous.unit, var.unit)):
+                    raise ValueError(('The run-time parameter %s refers to '
+                                      'different values in different '
+                                      'objects.') % name)
+        for name in sorted(self.parameter_names - set(self.parameters)):
+            logger.warn(("Run-time parameter '%s' is not used in the "
+                         "model.") % name, 'unused_parameter')
+        parameter_specs = [(name, c_data_type(var.dtype),
+                            cpp_constant(var.get_value()))
+                           for name, var in sorted(self.parameters.iteritems())]
+
         arr_tmp = CPPStandaloneCodeObject.templater.objects(
                         None, None,
                         array_specs=self.arrays,
@@ -509,6 +838,8 @@ class CPPStandaloneDevice(Device):
                         synapses=synapses,
                         clocks=self.clocks,
                         static_array_specs=static_array_specs,
+                        streamed_arrays=self.streamed_arrays,
+                        parameter_specs=parameter_specs,
                         networks=networks)
         writer.write('objects.*', arr_tmp)
 
@@ -607,7 +938,7 @@ class CPPStandaloneDevice(Device):
         for codeobj in self.code_objects.itervalues():
             ns = codeobj.variables
             # TODO: fix these freeze/CONSTANTS hacks somehow - they work but not elegant.
-            code = freeze(codeobj.code.cpp_file, ns)
+            code = freeze(codeobj.code.cpp_file, ns, self.parameters)
             code = code.replace('%CONSTANTS%', '\n'.join(code_object_defs[codeobj.name]))
             code = '#include "objects.h"\n'+code
             
@@ -626,12 +957,7 @@ class CPPStandaloneDevice(Device):
                                                           )
         writer.write('main.cpp', main_tmp)
 
-        if compiler=='msvc':
-            std_move = 'std::move'
-        else:
-            std_move = ''
-        network_tmp = CPPStandaloneCodeObject.templater.network(None, None,
-                                                             std_move=std_move)
+        network_tmp = CPPStandaloneCodeObject.templater.network(None, None)
         writer.write('network.*', network_tmp)
 
         synapses_classes_tmp = CPPStandaloneCodeObject.templater.synapses_classes(None, None)
@@ -693,18 +1019,40 @@ class CPPStandaloneDevice(Device):
         else:
             # Generate the makefile
             if os.name=='nt':
-                rm_cmd = 'del *.o /s\n\tdel main.exe $(DEPS)'
+                rm_cmd = 'del *.o /s\n\tdel *.d /s\n\tdel main.exe'
+            else:
+                rm_cmd = 'rm -f $(OBJS) $(PROGRAM) $(DEPS)'
+            # Streaming spikes to disk uses a background thread (using the
+            # thread support of the C++11 standard library)
+            if self.streamed_arrays:
+                thread_flags = '-std=c++11 -pthread'
             else:
-                rm_cmd = 'rm $(OBJS) $(PROGRAM) $(DEPS)'
+                thread_flags = ''
             makefile_tmp = CPPStandaloneCodeObject.templater.makefile(None, None,
                 source_files=' '.join(writer.source_files),
                 header_files=' '.join(writer.header_files),
                 compiler_flags=compiler_flags,
+                thread_flags=thread_flags,
                 rm_cmd=rm_cmd)
             writer.write('makefile', makefile_tmp)
-        
+        writer.save_hashes()
+
         # build the project
         if compile:
+            object_cache = None
+            cache_directory = prefs.devices.cpp_standalone.object_cache_directory
+            if cache_directory and compiler != 'msvc':
+                # The spike queue headers are copied separately
+                header_files = writer.header_files + ['brianlib/spikequeue.h',
+                                                      'brianlib/stdint_compat.h']
+                settings = ' '.join([compiler, compiler_flags, thread_flags,
+                                     'openmp=%s' % (nb_threads > 0),
+                                     'debug=%s' % debug, 'native=%s' % native])
+                max_size = prefs.devices.cpp_standalone.object_cache_max_size
+                object_cache = ObjectCache(cache_directory, directory,
+                                           writer.source_files, header_files,
+                                           settings,
+                                           max_size=int(max_size*1024*1024))
             with in_directory(directory):
                 if compiler=='msvc':
                     # TODO: handle debug
@@ -757,26 +1105,253 @@ class CPPStandaloneDevice(Device):
                     with std_silent(debug):
                         if clean:
                             os.system('make clean')
+                        if object_cache is not None:
+                            restored = object_cache.restore()
+                            logger.debug('Restored %d object files from the '
+                                         'cache' % restored)
+                        make_jobs = prefs.devices.cpp_standalone.make_jobs
+                        if make_jobs <= 0:
+                            make_jobs = multiprocessing.cpu_count()
+                        make_cmd = 'make -j%d' % make_jobs
                         if debug:
-                            x = os.system('make debug')
+                            x = os.system(make_cmd + ' debug')
                         elif native:
-                            x = os.system('make native')
+                            x = os.system(make_cmd + ' native')
                         else:
-                            x = os.system('make')
+                            x = os.system(make_cmd)
                         if x!=0:
                             raise RuntimeError("Project compilation failed")
-                if run:
-                    if not with_output:
-                        stdout = open(os.devnull, 'w')
-                    else:
-                        stdout = None
-                    if os.name=='nt':
-                        x = subprocess.call(['main'] + run_args, stdout=stdout)
-                    else:
-                        x = subprocess.call(['./main'] + run_args, stdout=stdout)
-                    if x:
-                        raise RuntimeError("Project run failed")
-                    self.has_been_run = True
+                        if object_cache is not None:
+                            object_cache.store()
+            if run:
+                self.run(directory, with_output=with_output, run_args=run_args)
+
+    def run(self, directory=None, with_output=True, run_args=None,
+            parameters=None, results_directory='results', seed=None):
+        '''
+        Run the compiled project. This can be used to run the same simulation
+        several times (e.g. with different values of its parameters) without
+        generating and compiling the code again. See `run_batch` for running
+        several simulations in parallel.
+
+        Parameters
+        ----------
+        directory : str, optional
+            The project directory, defaults to the directory used in the last
+            call to `build`.
+        with_output : bool, optional
+            Whether or not to show the ``stdout`` of the program.
+        run_args : list of str, optional
+            Additional command line arguments for the program.
+        parameters : dict, optional
+            Values for the run-time parameters declared with
+            `declare_parameters` and for state variables that have been set
+            with an array of values, e.g. ``{'tau': 20*ms, 'neurongroup.v':
+            v_init}``. Parameters that are not specified keep the values they
+            had when the project was built.
+        results_directory : str, optional
+            The directory where the results are stored (relative to the
+            project directory). Defaults to ``'results'``.
+        seed : int, optional
+            The seed for the random number generator. By default, the
+            generator is seeded with the current time.
+        '''
+        if directory is None:
+            directory = self.project_dir
+        self.project_dir = directory
+        command = self._run_command(directory, parameters, results_directory,
+                                    seed, run_args)
+        with in_directory(directory):
+            if not with_output:
+                stdout = open(os.devnull, 'w')
+            else:
+                stdout = None
+            x = subprocess.call(command, stdout=stdout)
+            if x:
+                raise RuntimeError("Project run failed")
+            self.results_directory = results_directory
+            self.results_key = next(self._results_counter)
+            self.has_been_run = True
+
+    def run_batch(self, parameters=None, n_runs=None, seeds=None,
+                  processes=None, directory=None,
+                  results_directory='batch_results', with_output=False,
+                  run_args=None):
+        '''
+        Run the compiled project several times in parallel, e.g. with
+        different parameters (see `declare_parameters`) or random seeds. Each
+        run stores its results in its own directory.
+
+        Parameters
+        ----------
+        parameters : list of dict, optional
+            The parameters for each run (see `run`).
+        n_runs : int, optional
+            The number of runs, only needed if no ``parameters`` are given.
+        seeds : list of int, optional
+            The seeds for the random number generator for each run. By
+            default, each run uses a different seed drawn with numpy's random
+            number generator.
+        processes : int, optional
+            The maximum number of simulations running at the same time,
+            defaults to the number of CPUs.
+        directory : str, optional
+            The project directory, defaults to the directory used in the last
+            call to `build`.
+        results_directory : str, optional
+            The directory where the results are stored (relative to the
+            project directory), each run stores its results in a numbered
+            subdirectory. Defaults to ``'batch_results'``.
+        with_output : bool, optional
+            Whether or not to show the ``stdout`` of the programs.
+        run_args : list of str, optional
+            Additional command line arguments for all runs.
+
+        Returns
+        -------
+        runs : list of `StandaloneRun`
+            The results of each run. Values of state variables and monitors
+            refer to a run when they are accessed within a ``with`` block for
+            that run.
+
+        Examples
+        --------
+        >>> runs = device.run_batch(parameters=[{'tau': 10*ms},  # doctest: +SKIP
+        ...                                     {'tau': 20*ms}])
+        >>> for run in runs:  # doctest: +SKIP
+        ...     with run:
+        ...         print(mon.num_spikes)
+        '''
+        if parameters is None:
+            if n_runs is None:
+                raise TypeError('Need either parameters or the number of '
+                                'runs.')
+            parameters = [{}] * n_runs
+        elif n_runs is not None and n_runs != len(parameters):
+            raise ValueError('Got parameters for %d runs, but n_runs is '
+                             '%d.' % (len(parameters), n_runs))
+        n_runs = len(parameters)
+        if seeds is None:
+            seeds = np.random.randint(0, 2**31 - 1, size=n_runs)
+        elif len(seeds) != n_runs:
+            raise ValueError('Got %d seeds for %d runs.' % (len(seeds), n_runs))
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+        if directory is None:
+            directory = self.project_dir
+        self.project_dir = directory
+
+        runs = []
+        commands = []
+        for index, (run_parameters, seed) in enumerate(zip(parameters, seeds)):
+            run_directory = os.path.join(results_directory, str(index))
+            commands.append(self._run_command(directory, run_parameters,
+                                              run_directory, seed, run_args,
+                                              os.path.join('parameters',
+                                                           str(index))))
+            runs.append(StandaloneRun(self, run_directory, run_parameters,
+                                      int(seed), next(self._results_counter)))
+
+        def run_command(command):
+            if with_output:
+                return subprocess.call(command, cwd=directory)
+            with open(os.devnull, 'w') as stdout:
+                return subprocess.call(command, cwd=directory, stdout=stdout)
+
+        # The actual work is done in the subprocesses, threads are therefore
+        # sufficient to launch them
+        pool = ThreadPool(min(processes, n_runs))
+        try:
+            return_codes = pool.map(run_command, commands)
+        finally:
+            pool.close()
+        failed = [index for index, code in enumerate(return_codes) if code]
+        if failed:
+            raise RuntimeError('Runs %s failed.' % ', '.join(str(index)
+                                                             for index in failed))
+        self.has_been_run = True
+        return runs
+
+    def _run_command(self, directory, parameters, results_directory, seed,
+                     run_args, parameter_directory='parameters'):
+        ensure_directory(os.path.join(directory, results_directory))
+        # The program expects a trailing separator
+        args = ['_results_dir=%s' % os.path.join(results_directory, '')]
+        if seed is not None:
+            args.append('_random_seed=%d' % seed)
+        args += self.parameter_args(directory, parameters or {},
+                                    parameter_directory)
+        args += list(run_args or [])
+        if os.name == 'nt':
+            return ['main'] + args
+        else:
+            return ['./main'] + args
+
+    def parameter_args(self, directory, parameters,
+                       parameter_directory='parameters'):
+        '''
+        Return the command line arguments that set the given parameters when
+        running the compiled project.
+
+        Parameters
+        ----------
+        directory : str
+            The project directory.
+        parameters : dict
+            Values for run-time parameters and state variables, see `run`.
+        parameter_directory : str, optional
+            The directory (relative to the project directory) where arrays of
+            values for state variables are stored. Defaults to
+            ``'parameters'``.
+
+        Returns
+        -------
+        args : list of str
+            The command line arguments.
+        '''
+        args = []
+        for name, value in sorted(parameters.iteritems()):
+            if name in self.parameters:
+                constant = self.parameters[name]
+                fail_for_dimension_mismatch(value, constant.unit,
+                                            'Value for parameter %s' % name)
+                value = np.asarray(value)
+                if value.shape != ():
+                    raise TypeError(('Value for parameter %s has to be a '
+                                     'scalar.') % name)
+                if constant.dtype == np.bool:
+                    value = int(bool(value))
+                elif np.issubdtype(constant.dtype, np.integer):
+                    value = int(value)
+                else:
+                    value = float(value)
+                args.append('%s=%r' % (name, value))
+            elif name in self.initial_arrays:
+                if len(self.initial_arrays[name]) > 1:
+                    raise ValueError(('Variable %s has been set with an array '
+                                      'of values more than once, cannot '
+                                      'replace its values.') % name)
+                var, static_array_name = self.initial_arrays[name][0]
+                fail_for_dimension_mismatch(value, var.unit,
+                                            'Values for variable %s' % name)
+                static_array = self.static_arrays[static_array_name]
+                value = np.asarray(value, dtype=static_array.dtype)
+                if value.shape == ():
+                    value = np.repeat(value, static_array.size)
+                if value.shape != static_array.shape:
+                    raise ValueError(('Values for variable %s have to have '
+                                      'shape %s, but have shape '
+                                      '%s.') % (name, static_array.shape,
+                                                value.shape))
+                fname = os.path.join(parameter_directory, static_array_name)
+                ensure_directory(os.path.join(directory, parameter_directory))
+                value.tofile(os.path.join(directory, fname))
+                args.append('%s=%s' % (static_array_name, fname))
+            else:
+                raise KeyError(("'%s' is neither a run-time parameter nor a "
+                                "variable that has been set with an "
+                                "array of values.") % name)
+        return args
 
     def network_run(self, net, duration, report=None, report_period=10*second,
                     namespace=None, profile=True, level=0, **kwds):
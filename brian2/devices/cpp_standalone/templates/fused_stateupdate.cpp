@@ -0,0 +1,65 @@
+{# IS_OPENMP_COMPATIBLE #}
+{% extends 'common_group.cpp' %}
+{# USES_VARIABLES { t, _spikespace, N } #}
+{# ALLOWS_SCALAR_WRITE #}
+
+{# The state update, threshold and (optionally) the reset of a NeuronGroup in
+   a single loop, see brian2.groups.neurongroup.fuse_neuron_updates #}
+{% block maincode %}
+	// not_refractory and lastspike are added as needed_variables in the
+	// StateUpdater class, we cannot use the USES_VARIABLE mechanism
+	// conditionally
+
+	//// MAIN CODE ////////////
+	// scalar code (in nested scopes, since the blocks might declare the same
+	// constants)
+	const int _vectorisation_idx = -1;
+	{{scalar_code['stateupdate']|autoindent}}
+	{
+	{{scalar_code['threshold']|autoindent}}
+	{
+	{% if _fused_reset %}
+	{{scalar_code['reset']|autoindent}}
+	{% endif %}
+
+	// The spikes have to be stored in order, the loop is therefore executed
+	// by a single thread (as the loop in the threshold template)
+	{{ openmp_pragma('single') }}
+	{
+		long _count = 0;
+		for(int _idx=0; _idx<N; _idx++)
+		{
+			const int _vectorisation_idx = _idx;
+			{
+				// vector code (state update)
+				{{vector_code['stateupdate']|autoindent}}
+			}
+			{
+				// vector code (threshold)
+				{{vector_code['threshold']|autoindent}}
+				if(_cond) {
+					{{_spikespace}}[_count++] = _idx;
+					{% if _fused_reset %}
+					{
+						// vector code (reset), executed before the neuron is
+						// marked as refractory, i.e. before the conditional
+						// write on not_refractory would prevent it
+						{{vector_code['reset']|autoindent}}
+					}
+					{% endif %}
+					{% if _uses_refractory %}
+					// We have to use the pointer names directly here: The
+					// condition might contain references to not_refractory or
+					// lastspike and in that case the names will refer to a
+					// single entry.
+					{{not_refractory}}[_idx] = false;
+					{{lastspike}}[_idx] = t;
+					{% endif %}
+				}
+			}
+		}
+		{{_spikespace}}[N] = _count;
+	}
+	}
+	}
+{% endblock %}
@@ -16,11 +16,21 @@
 
 #include <iostream>
 #include <fstream>
+#include <string>
 
 {{report_func|autoindent}}
 
 int main(int argc, char **argv)
 {
+	// Arguments of the form name=value set run-time parameters, all other
+	// arguments are ignored
+	for (int i=1; i<argc; i++)
+	{
+		const std::string arg(argv[i]);
+		const size_t pos = arg.find('=');
+		if (pos != std::string::npos)
+			_set_parameter(arg.substr(0, pos), arg.substr(pos+1));
+	}
 
 	brian_start();
 
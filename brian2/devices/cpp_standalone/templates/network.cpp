@@ -22,7 +22,7 @@ void Network::clear()
 
 void Network::add(Clock* clock, codeobj_func func)
 {
-	objects.push_back(std::make_pair<Clock*, codeobj_func>({{std_move}}(clock), {{std_move}}(func)));
+	objects.push_back(std::make_pair(clock, func));
 }
 
 void Network::run(const double duration, void (*report_func)(const double, const double, const double), const double report_period)
@@ -10,6 +10,9 @@
 #include "network.h"
 #include<iostream>
 #include<fstream>
+#include<sstream>
+#include<string>
+#include<map>
 
 //////////////// clocks ///////////////////
 {% for clock in clocks | sort(attribute='name') %}
@@ -21,6 +24,13 @@ Clock brian::{{clock.name}}({{clock.dt_}});
 Network brian::{{net.name}};
 {% endfor %}
 
+//////////////// run-time parameters //////
+std::string brian::results_dir = "results/";
+long brian::random_seed = -1;
+{% for name, c_type, value in parameter_specs %}
+{{c_type}} brian::_parameter_{{name}} = {{value}};
+{% endfor %}
+
 //////////////// arrays ///////////////////
 {% for var, varname in array_specs | dictsort(by='value') %}
 {% if not var in dynamic_array_specs %}
@@ -89,13 +99,50 @@ void _init_arrays()
 	{% endfor %}
 }
 
+// Files to read static arrays from instead of the static_arrays directory
+static std::map<std::string, std::string> _static_array_files;
+
+bool _set_parameter(const std::string &name, const std::string &value)
+{
+	using namespace brian;
+
+	if (name == "_results_dir")
+	{
+		results_dir = value;
+		return true;
+	}
+	if (name == "_random_seed")
+	{
+		std::istringstream(value) >> random_seed;
+		return true;
+	}
+	{% for name, c_type, default in parameter_specs %}
+	if (name == "{{name}}")
+	{
+		std::istringstream(value) >> _parameter_{{name}};
+		return true;
+	}
+	{% endfor %}
+	{% for (name, dtype_spec, N, filename) in static_array_specs | sort %}
+	if (name == "{{name}}")
+	{
+		_static_array_files[name] = value;
+		return true;
+	}
+	{% endfor %}
+	return false;
+}
+
 void _load_arrays()
 {
 	using namespace brian;
 
 	{% for (name, dtype_spec, N, filename) in static_array_specs | sort %}
 	ifstream f{{name}};
-	f{{name}}.open("static_arrays/{{name}}", ios::in | ios::binary);
+	if (_static_array_files.count("{{name}}"))
+		f{{name}}.open(_static_array_files["{{name}}"].c_str(), ios::in | ios::binary);
+	else
+		f{{name}}.open("static_arrays/{{name}}", ios::in | ios::binary);
 	if(f{{name}}.is_open())
 	{
 		f{{name}}.read(reinterpret_cast<char*>({{name}}), {{N}}*sizeof({{dtype_spec}}));
@@ -113,7 +160,7 @@ void _write_arrays()
 	{% for var, varname in array_specs | dictsort(by='value') %}
 	{% if not (var in dynamic_array_specs or var in dynamic_array_2d_specs) %}
 	ofstream outfile_{{varname}};
-	outfile_{{varname}}.open("results/{{varname}}", ios::binary | ios::out);
+	outfile_{{varname}}.open((results_dir + "{{varname}}").c_str(), ios::binary | ios::out);
 	if(outfile_{{varname}}.is_open())
 	{
 		outfile_{{varname}}.write(reinterpret_cast<char*>({{varname}}), {{var.size}}*sizeof({{varname}}[0]));
@@ -126,8 +173,10 @@ void _write_arrays()
 	{% endfor %}
 
 	{% for var, varname in dynamic_array_specs | dictsort(by='value') %}
+	{# streamed arrays have already been written during the run #}
+	{% if not var in streamed_arrays %}
 	ofstream outfile_{{varname}};
-	outfile_{{varname}}.open("results/{{varname}}", ios::binary | ios::out);
+	outfile_{{varname}}.open((results_dir + "{{varname}}").c_str(), ios::binary | ios::out);
 	if(outfile_{{varname}}.is_open())
 	{
 		outfile_{{varname}}.write(reinterpret_cast<char*>(&{{varname}}[0]), {{varname}}.size()*sizeof({{varname}}[0]));
@@ -136,11 +185,12 @@ void _write_arrays()
 	{
 		std::cout << "Error writing output file for {{varname}}." << endl;
 	}
+	{% endif %}
 	{% endfor %}
 
 	{% for var, varname in dynamic_array_2d_specs | dictsort(by='value') %}
 	ofstream outfile_{{varname}};
-	outfile_{{varname}}.open("results/{{varname}}", ios::binary | ios::out);
+	outfile_{{varname}}.open((results_dir + "{{varname}}").c_str(), ios::binary | ios::out);
 	if(outfile_{{varname}}.is_open())
 	{
         for (int n=0; n<{{varname}}.n; n++)
@@ -189,6 +239,7 @@ void _dealloc_arrays()
 #define _BRIAN_OBJECTS_H
 
 #include<vector>
+#include<string>
 #include<stdint.h>
 #include "synapses_classes.h"
 #include "brianlib/clocks.h"
@@ -209,6 +260,15 @@ extern Network magicnetwork;
 extern Network {{net.name}};
 {% endfor %}
 
+//////////////// run-time parameters //////
+// directory for the results (including a trailing separator)
+extern std::string results_dir;
+// seed for the random number generator (-1: seed with the current time)
+extern long random_seed;
+{% for name, c_type, value in parameter_specs %}
+extern {{c_type}} _parameter_{{name}};
+{% endfor %}
+
 //////////////// dynamic arrays ///////////
 {% for var, varname in dynamic_array_specs | dictsort(by='value') %}
 extern std::vector<{{c_data_type(var.dtype)}}> {{varname}};
@@ -248,6 +308,7 @@ extern SynapticPathway<double> {{path.name}};
 }
 
 void _init_arrays();
+bool _set_parameter(const std::string &name, const std::string &value);
 void _load_arrays();
 void _write_arrays();
 void _dealloc_arrays();
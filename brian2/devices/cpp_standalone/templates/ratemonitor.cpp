@@ -8,7 +8,7 @@
 	int _num_spikes = {{_spikespace}}[_num_spikespace-1];
 	// For subgroups, we do not want to record all spikes
     // We assume that spikes are ordered
-    int _start_idx = 0;
+    int _start_idx = _num_spikes;
     int _end_idx = - 1;
     {{ openmp_pragma('single-nowait') }}
     {
@@ -16,7 +16,10 @@ void brian_start()
 {
 	_init_arrays();
 	_load_arrays();
-	srand((unsigned int)time(NULL));
+	if (brian::random_seed >= 0)
+		srand((unsigned int)brian::random_seed);
+	else
+		srand((unsigned int)time(NULL));
 }
 
 void brian_end()
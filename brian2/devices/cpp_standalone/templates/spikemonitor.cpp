@@ -1,17 +1,37 @@
 {# IS_OPENMP_COMPATIBLE #}
 {% extends 'common_group.cpp' %}
 
+{% block extra_headers %}
+{% if _spike_stream_chunk_size %}
+#include "brianlib/spikestream.h"
+
+// Writes the recorded spikes to disk during the run
+static SpikeStream _stream_{{codeobj_name}}({{_spike_stream_chunk_size}});
+
+static void _open_stream_{{codeobj_name}}()
+{
+	if (!_stream_{{codeobj_name}}.is_open())
+		_stream_{{codeobj_name}}.open(brian::results_dir + "{{_dynamic_i}}",
+		                              brian::results_dir + "{{_dynamic_t}}");
+}
+{% endif %}
+{% endblock %}
+
 {% block maincode %}
 	//// MAIN CODE ////////////
     {# USES_VARIABLES { t, i, _clock_t, _spikespace, _count,
                         _source_start, _source_stop} #}
+	{% if _spike_stream_chunk_size %}
+	{{ openmp_pragma('single') }}
+	_open_stream_{{codeobj_name}}();
+	{% endif %}
 	int32_t _num_spikes = {{_spikespace}}[_num_spikespace-1];
     
     {{ openmp_pragma('single-nowait') }}
     {
         if (_num_spikes > 0)
         {
-            int _start_idx = 0;
+            int _start_idx = _num_spikes;
             int _end_idx = - 1;
             for(int _j=0; _j<_num_spikes; _j++)
             {
@@ -36,8 +56,12 @@
                 for(int _j=_start_idx; _j<_end_idx; _j++)
                 {
                     const int _idx = {{_spikespace}}[_j];
+                    {% if _spike_stream_chunk_size %}
+                    _stream_{{codeobj_name}}.push(_idx-_source_start, _clock_t);
+                    {% else %}
                     {{_dynamic_i}}.push_back(_idx-_source_start);
                     {{_dynamic_t}}.push_back(_clock_t);
+                    {% endif %}
                     {{_count}}[_idx-_source_start]++;
                 }
             }
@@ -50,14 +74,33 @@
 void _debugmsg_{{codeobj_name}}()
 {
 	using namespace brian;
+	{% if _spike_stream_chunk_size %}
+	std::cout << "Number of spikes: " << _stream_{{codeobj_name}}.size() << endl;
+	{% else %}
 	std::cout << "Number of spikes: " << {{_dynamic_i}}.size() << endl;
+	{% endif %}
+}
+{% if _spike_stream_chunk_size %}
+
+void _close_stream_{{codeobj_name}}()
+{
+	// Make sure that the files exist, even if nothing has been recorded
+	_open_stream_{{codeobj_name}}();
+	_stream_{{codeobj_name}}.close();
 }
+{% endif %}
 {% endblock %}
 
 {% block extra_functions_h %}
 void _debugmsg_{{codeobj_name}}();
+{% if _spike_stream_chunk_size %}
+void _close_stream_{{codeobj_name}}();
+{% endif %}
 {% endblock %}
 
 {% macro main_finalise() %}
+{% if _spike_stream_chunk_size %}
+_close_stream_{{codeobj_name}}();
+{% endif %}
 _debugmsg_{{codeobj_name}}();
 {% endmacro %}
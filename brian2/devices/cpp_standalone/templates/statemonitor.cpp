@@ -1,11 +1,53 @@
 {# IS_OPENMP_COMPATIBLE #}
 {% extends 'common_group.cpp' %}
 
+{# Update the accumulated value for a reduction (or store the value directly
+   if values are not accumulated) #}
+{% macro _update(varname, value, index) -%}
+{% set source, reduction = _recorded_sources[varname] %}
+{% if not _accumulators %}
+{{get_array_name(_recorded_variables[varname], access_data=False)}}(_new_size-1, {{index}}) = {{value}};
+{% else %}
+{% set _acc = get_array_name(_accumulators[varname]) %}
+{% if reduction == 'mean' %}
+{{_acc}}[{{index}}] = _step == 0 ? {{value}} : {{_acc}}[{{index}}] + {{value}};
+{% elif reduction == 'min' %}
+{{_acc}}[{{index}}] = (_step == 0 || {{value}} < {{_acc}}[{{index}}]) ? {{value}} : {{_acc}}[{{index}}];
+{% else %}
+{{_acc}}[{{index}}] = (_step == 0 || {{value}} > {{_acc}}[{{index}}]) ? {{value}} : {{_acc}}[{{index}}];
+{% endif %}
+{% endif %}
+{%- endmacro %}
+
 {% block maincode %}
     {# USES_VARIABLES { t, _clock_t, _indices } #}
 
+    {% if _block_size > 1 %}
+    const int _step = {{_block_step}}[0];
+    {% endif %}
+    {% if _accumulators %}
+    // Store the aggregated values at the end of each block
+    const bool _store = _step == {{_block_size - 1}};
     {{ openmp_pragma('single') }}
-    {{_dynamic_t}}.push_back(_clock_t);
+    {
+        if (_step == 0)
+            {{_block_start_t}}[0] = _clock_t;
+        if (_store)
+            {{_dynamic_t}}.push_back({{_block_start_t}}[0]);
+    }
+    {% else %}
+    {% if _block_size > 1 %}
+    // Only record the first time step of each block
+    const bool _store = _step == 0;
+    {% else %}
+    const bool _store = true;
+    {% endif %}
+    {{ openmp_pragma('single') }}
+    {
+        if (_store)
+            {{_dynamic_t}}.push_back(_clock_t);
+    }
+    {% endif %}
 
     const int _new_size = {{_dynamic_t}}.size();
     // Resize the dynamic arrays
@@ -13,27 +55,82 @@
     {% set _recorded =  get_array_name(var, access_data=False) %}
 
     {{ openmp_pragma('single') }}
-    {{_recorded}}.resize(_new_size, _num_indices);
+    {
+        if (_store)
+            {{_recorded}}.resize(_new_size, {{ '1' if _population else '_num_indices' }});
+    }
     {% endfor %}
 
     // scalar code
 	const int _vectorisation_idx = -1;
 	{{scalar_code|autoindent}}
 
-    {{ openmp_pragma('static') }}
-    for (int _i = 0; _i < _num_indices; _i++)
+    {% if _population %}
+    {{ openmp_pragma('single') }}
+    {
+        if ({{ 'true' if _accumulators else '_store' }})
+        {
+            {% for varname, var in _recorded_variables | dictsort %}
+            double _population_{{varname}} = 0;
+            {% endfor %}
+            for (int _i = 0; _i < _num_indices; _i++)
+            {
+                // vector code
+                const int _idx = {{_indices}}[_i];
+                const int _vectorisation_idx = _idx;
+                {{ vector_code|autoindent }}
+
+                {% for varname, var in _recorded_variables | dictsort %}
+                _population_{{varname}} += _to_record_{{_recorded_sources[varname][0]}};
+                {% endfor %}
+            }
+            {% for varname, var in _recorded_variables | dictsort %}
+            _population_{{varname}} /= _num_indices;
+            {{ _update(varname, '_population_' + varname, '0')|autoindent }}
+            {% endfor %}
+        }
+    }
+    {% else %}
+    if ({{ 'true' if _accumulators else '_store' }})
     {
-        // vector code
-        const int _idx = {{_indices}}[_i];
-        const int _vectorisation_idx = _idx;
-        {% block maincode_inner %}
-            {{ super() }}
+        {{ openmp_pragma('static') }}
+        for (int _i = 0; _i < _num_indices; _i++)
+        {
+            // vector code
+            const int _idx = {{_indices}}[_i];
+            const int _vectorisation_idx = _idx;
+            {% block maincode_inner %}
+                {{ super() }}
+
+                {% for varname, var in _recorded_variables | dictsort %}
+                {{ _update(varname, '_to_record_' + _recorded_sources[varname][0], '_i')|autoindent }}
+                {% endfor %}
+            {% endblock %}
+        }
+    }
+    {% endif %}
 
+    {% if _accumulators %}
+    if (_store)
+    {
+        {{ openmp_pragma('static') }}
+        for (int _i = 0; _i < {{ '1' if _population else '_num_indices' }}; _i++)
+        {
             {% for varname, var in _recorded_variables | dictsort %}
-            {% set _recorded =  get_array_name(var, access_data=False) %}
-            {{_recorded}}(_new_size-1, _i) = _to_record_{{varname}};
+            {% if _recorded_sources[varname][1] == 'mean' %}
+            {{get_array_name(var, access_data=False)}}(_new_size-1, _i) = {{get_array_name(_accumulators[varname])}}[_i] / {{_block_size}};
+            {% else %}
+            {{get_array_name(var, access_data=False)}}(_new_size-1, _i) = {{get_array_name(_accumulators[varname])}}[_i];
+            {% endif %}
             {% endfor %}
-        {% endblock %}
+        }
     }
+    {% endif %}
 
+    {% if _block_size > 1 %}
+    // Make sure that all threads have read the current step
+    {{ openmp_pragma('barrier') }}
+    {{ openmp_pragma('single') }}
+    {{_block_step}}[0] = (_step + 1) % {{_block_size}};
+    {% endif %}
 {% endblock %}
@@ -2,17 +2,23 @@
 Module containing the `Device` base class as well as the `RuntimeDevice`
 implementation and some helper functions to access/set devices.
 '''
+import re
 from weakref import WeakKeyDictionary
 
 import numpy as np
 
-from brian2.memory.dynamicarray import DynamicArray, DynamicArray1D
+from brian2.memory.dynamicarray import (DynamicArray, DynamicArray1D,
+                                        MemmapDynamicArray)
 from brian2.codegen.targets import codegen_targets
 from brian2.codegen.runtime.numpy_rt import NumpyCodeObject
+from brian2.codegen.codeobject import compile_code_object
 from brian2.core.names import find_name
-from brian2.core.preferences import prefs
-from brian2.core.variables import ArrayVariable, DynamicArrayVariable
+from brian2.core.preferences import prefs, BrianPreference
+from brian2.core.variables import (Variable, ArrayVariable,
+                                   DynamicArrayVariable, AttributeVariable,
+                                   Subexpression)
 from brian2.core.functions import Function
+from brian2.utils.caching import get_disk_cache
 from brian2.utils.logger import get_logger
 from brian2.utils.stringtools import code_representation, indent
 
@@ -29,10 +35,101 @@ all_devices = {}
 
 prefs.register_preferences('devices', 'Device preferences')
 
+prefs.register_preferences(
+    'devices.runtime',
+    'Runtime device preferences',
+    spike_queue=BrianPreference(
+        default='auto',
+        docs='''
+        The implementation of the spike queue used by the runtime device.
+
+        Can be one of:
+
+        * ``'auto'`` the default, use the C++ `SpikeQueue` if it is available
+          and the Python `SpikeQueue` otherwise.
+        * ``'python'`` use the Python `SpikeQueue`, storing the events in a
+          dense array of size (maximum delay in time steps) x (maximum number
+          of events per time step).
+        * ``'compact'`` use the `CompactSpikeQueue`, storing the events of all
+          time steps in a shared memory pool. Uses memory proportional to the
+          number of events in flight, which is useful for long heterogeneous
+          delays and bursty activity.
+        ''',
+        validator=lambda value: value in ['auto', 'python', 'compact']
+        )
+    )
+
 
 #: caches the automatically determined code generation target
 _auto_target = None
 
+
+def _describe_value(value, codeobj_class, device):
+    '''
+    Return a string describing everything about `value` that can influence
+    the code generated for a code object (e.g. the type of a variable but not
+    its values), for use in the key of the code cache. Returns ``None`` if
+    such a description cannot be given.
+    '''
+    if (value is None or
+            isinstance(value, (bool, int, long, float, basestring,
+                               np.number, np.bool_))):
+        return repr(value)
+    elif isinstance(value, dict):
+        items = sorted((repr(k), _describe_value(v, codeobj_class, device))
+                       for k, v in value.iteritems())
+        if any(description is None for _, description in items):
+            return None
+        return 'dict(%s)' % ', '.join('%s: %s' % item for item in items)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        items = [_describe_value(v, codeobj_class, device) for v in value]
+        if any(description is None for description in items):
+            return None
+        if isinstance(value, (set, frozenset)):
+            items = sorted(items)
+        return '%s(%s)' % (type(value).__name__, ', '.join(items))
+    elif isinstance(value, Function):
+        impl = value.implementations[codeobj_class]
+        code = impl.get_code(None) if not impl.dynamic else None
+        if impl.dynamic or not (code is None or
+                                isinstance(code, (basestring, dict))):
+            return None
+        # Only the types of the namespace values are used in the code
+        namespace = dict((k, (str(getattr(v, 'dtype', type(v).__name__)),
+                              getattr(v, 'shape', None)))
+                         for k, v in (impl.get_namespace(None) or {}).iteritems())
+        dependencies = _describe_value(impl.dependencies or {},
+                                       codeobj_class, device)
+        if dependencies is None:
+            return None
+        return 'Function(%r, %s, %s, %s)' % (impl.name,
+                                             _describe_value(code, codeobj_class,
+                                                             device),
+                                             sorted(namespace.items()),
+                                             dependencies)
+    elif isinstance(value, Variable):
+        description = [value.__class__.__name__, value.name, str(value.dtype),
+                       str(value.unit), value.scalar, value.constant,
+                       value.read_only, value.dynamic]
+        conditional_write = getattr(value, 'conditional_write', None)
+        if conditional_write is not None:
+            description.append(conditional_write.name)
+        if isinstance(value, ArrayVariable):
+            description.append(device.get_array_name(value))
+            if isinstance(value, DynamicArrayVariable):
+                description.extend([device.get_array_name(value,
+                                                           access_data=False),
+                                    value.constant_size])
+        elif isinstance(value, Subexpression):
+            description.append(value.expr)
+        elif isinstance(value, AttributeVariable):
+            attribute_value = getattr(value.obj, value.attribute)
+            description.extend([np.asarray(attribute_value).dtype.str,
+                                np.ndim(attribute_value)])
+        return repr(description)
+    else:
+        return None
+
 def auto_target():
     '''
     Automatically chose a code generation target (invoked when the
@@ -141,6 +238,20 @@ class Device(object):
         '''
         raise NotImplementedError()
 
+    def use_file_storage(self, var, filename):
+        '''
+        Store the values of a dynamic array in a file instead of in memory.
+
+        Parameters
+        ----------
+        var : `DynamicArrayVariable`
+            The array that should be stored in a file.
+        filename : str
+            The name of the file.
+        '''
+        raise NotImplementedError(('Device %s does not support storing arrays '
+                                   'in files.') % self.__class__.__name__)
+
     def init_with_zeros(self, var):
         '''
         Initialize an array with zeros.
@@ -232,39 +343,94 @@ class Device(object):
 
         logger.debug('%s abstract code:\n%s' % (name, indent(code_representation(abstract_code))))
 
-        scalar_code, vector_code, kwds = generator.translate(abstract_code,
-                                                             dtype=prefs['core.default_float_dtype'])
-        # Add the array names as keywords as well
-        for varname, var in variables.iteritems():
-            if isinstance(var, ArrayVariable):
-                pointer_name = generator.get_array_name(var)
-                template_kwds[varname] = pointer_name
-                if hasattr(var, 'resize'):
-                    dyn_array_name = generator.get_array_name(var,
-                                                              access_data=False)
-                    template_kwds['_dynamic_'+varname] = dyn_array_name
-
-
-        template_kwds.update(kwds)
-        logger.debug('%s snippet (scalar):\n%s' % (name, indent(code_representation(scalar_code))))
-        logger.debug('%s snippet (vector):\n%s' % (name, indent(code_representation(vector_code))))
-
         name = find_name(name)
 
-        code = template(scalar_code, vector_code,
-                        owner=owner, variables=variables, codeobj_name=name,
-                        variable_indices=variable_indices,
-                        get_array_name=generator.get_array_name,
-                        **template_kwds)
+        code_cache = get_disk_cache('code_objects')
+        cache_key = None
+        if code_cache is not None:
+            cache_key = self._code_object_cache_key(name, abstract_code,
+                                                    variables, template_name,
+                                                    template, variable_indices,
+                                                    codeobj_class,
+                                                    template_kwds,
+                                                    override_conditional_write)
+        code = code_cache.get(cache_key) if cache_key is not None else None
+        if code is not None:
+            logger.debug('Using cached code for %s' % name)
+        else:
+            original_variables = dict(variables)
+            scalar_code, vector_code, kwds = generator.translate(abstract_code,
+                                                                 dtype=prefs['core.default_float_dtype'])
+            # Add the array names as keywords as well
+            for varname, var in variables.iteritems():
+                if isinstance(var, ArrayVariable):
+                    pointer_name = generator.get_array_name(var)
+                    template_kwds[varname] = pointer_name
+                    if hasattr(var, 'resize'):
+                        dyn_array_name = generator.get_array_name(var,
+                                                                  access_data=False)
+                        template_kwds['_dynamic_'+varname] = dyn_array_name
+
+
+            template_kwds.update(kwds)
+            logger.debug('%s snippet (scalar):\n%s' % (name, indent(code_representation(scalar_code))))
+            logger.debug('%s snippet (vector):\n%s' % (name, indent(code_representation(vector_code))))
+
+            code = template(scalar_code, vector_code,
+                            owner=owner, variables=variables, codeobj_name=name,
+                            variable_indices=variable_indices,
+                            get_array_name=generator.get_array_name,
+                            **template_kwds)
+            # The code generator replaces functions with their implementations
+            # in the namespace, we can only store the code if this did not
+            # happen (otherwise, the translation is necessary to get the
+            # namespace of the code object)
+            if (cache_key is not None and
+                    set(variables) == set(original_variables) and
+                    all(variables[varname] is var
+                        for varname, var in original_variables.iteritems())):
+                code_cache.set(cache_key, code)
         logger.debug('%s code:\n%s' % (name, indent(code_representation(code))))
 
         codeobj = codeobj_class(owner, code, variables, variable_indices,
                                 template_name=template_name,
                                 template_source=template.template_source,
                                 name=name)
-        codeobj.compile()
+        compile_code_object(codeobj)
         return codeobj
     
+    def _code_object_cache_key(self, name, abstract_code, variables,
+                               template_name, template, variable_indices,
+                               codeobj_class, template_kwds,
+                               override_conditional_write):
+        '''
+        Return a string describing everything that influences the code
+        generated in `code_object`, used to look up the code in the code
+        cache. Returns ``None`` if the code should not be cached.
+        '''
+        if re.search(r'\bowner\b', template.template_source):
+            # The template might use arbitrary attributes of the owner
+            return None
+        description = [self.__class__.__name__,
+                       codeobj_class.__module__ + '.' + codeobj_class.__name__,
+                       template_name, name,
+                       repr(sorted(abstract_code.items())),
+                       repr(sorted(override_conditional_write or [])),
+                       repr(sorted((varname, variable_indices[varname])
+                                   for varname in variables
+                                   if varname in variable_indices))]
+        for value in [variables, template_kwds]:
+            value_description = _describe_value(value, codeobj_class, self)
+            if value_description is None:
+                return None
+            description.append(value_description)
+        # Preferences can influence the generated code as well
+        description.extend('%s=%r' % (pref_name, prefs[pref_name])
+                           for pref_name in sorted(prefs)
+                           if pref_name.split('.')[0] in ['codegen', 'core',
+                                                          'devices'])
+        return '\n'.join(description)
+
     def activate(self):
         '''
         Called when this device is set as the current device.
@@ -337,6 +503,15 @@ class RuntimeDevice(Device):
 
         self.arrays[var] = arr
 
+    def use_file_storage(self, var, filename):
+        if not isinstance(var, DynamicArrayVariable):
+            raise TypeError(('Only dynamic arrays can be stored in files, '
+                             '"%s" is of type %s.') % (var.name, type(var)))
+        old_arr = self.arrays[var]
+        arr = MemmapDynamicArray(filename, old_arr.shape, dtype=var.dtype)
+        arr[:] = old_arr.data
+        self.arrays[var] = arr
+
     def get_value(self, var, access_data=True):
         if isinstance(var, DynamicArrayVariable) and access_data:
                 return self.arrays[var].data
@@ -362,11 +537,22 @@ class RuntimeDevice(Device):
         self.arrays[var][:] = arr
 
     def spike_queue(self, source_start, source_end):
-        # Use the C++ version of the SpikeQueue when available
-        try:
-            from brian2.synapses.cythonspikequeue import SpikeQueue
-            logger.info('Using the C++ SpikeQueue', once=True)
-        except ImportError:
+        queue_type = prefs.devices.runtime.spike_queue
+        if queue_type == 'compact':
+            from brian2.synapses.spikequeue import CompactSpikeQueue
+            logger.info('Using the compact Python SpikeQueue', once=True)
+            return CompactSpikeQueue(source_start=source_start,
+                                     source_end=source_end)
+
+        SpikeQueue = None
+        if queue_type == 'auto':
+            # Use the C++ version of the SpikeQueue when available
+            try:
+                from brian2.synapses.cythonspikequeue import SpikeQueue
+                logger.info('Using the C++ SpikeQueue', once=True)
+            except ImportError:
+                pass
+        if SpikeQueue is None:
             from brian2.synapses.spikequeue import SpikeQueue
             logger.info('Using the Python SpikeQueue', once=True)
 
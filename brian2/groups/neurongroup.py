@@ -1,20 +1,24 @@
 '''
 This model defines the `NeuronGroup`, the core of most simulations.
 '''
+import weakref
+
 import numpy as np
 import sympy
 
+from brian2.core.preferences import prefs
 from brian2.equations.equations import (Equations, DIFFERENTIAL_EQUATION,
                                         SUBEXPRESSION, PARAMETER, BOOLEAN)
 from brian2.equations.refractory import add_refractoriness
 from brian2.stateupdaters.base import StateUpdateMethod
 from brian2.codegen.translation import analyse_identifiers
-from brian2.codegen.codeobject import check_code_units
+from brian2.codegen.codeobject import check_code_units, create_runner_codeobj
 from brian2.core.variables import (Variables, LinkedVariable,
                                    DynamicArrayVariable, Subexpression)
 from brian2.core.spikesource import SpikeSource
 from brian2.parsing.expressions import (parse_expression_unit,
                                         is_boolean_expression)
+from brian2.parsing.statements import parse_statement
 from brian2.utils.logger import get_logger
 from brian2.utils.stringtools import get_identifiers
 from brian2.units.allunits import second
@@ -65,6 +69,10 @@ class StateUpdater(CodeRunner):
                             name=group.name + '_stateupdater*',
                             check_units=False)
 
+        #: The `Thresholder` and `Resetter` objects that are executed as part
+        #: of this object's code object (see `fuse_neuron_updates`)
+        self._fused_runners = []
+
         # Don't do the check here for now since we don't have all the
         # information about functions yet
         # self.method = StateUpdateMethod.determine_stateupdater(self.group.equations,
@@ -136,15 +144,55 @@ class StateUpdater(CodeRunner):
 
         # Since we did not necessarily no all the functions at creation time,
         # we might want to reconsider our numerical integration method
-        self.method = StateUpdateMethod.determine_stateupdater(self.group.equations,
-                                                               variables,
-                                                               self.method_choice)
-        self.abstract_code += self.method(self.group.equations, variables)
+        self.method, code = StateUpdateMethod.apply_stateupdater(self.group.equations,
+                                                                 variables,
+                                                                 self.method_choice)
+        self.abstract_code += code
         user_code = '\n'.join(['{var} = {expr}'.format(var=var, expr=expr)
                                for var, expr in
                                self.group.equations.substituted_expressions])
         self.user_code = user_code
 
+    def before_run(self, run_namespace=None, level=0):
+        if not self._fused_runners:
+            CodeRunner.before_run(self, run_namespace, level=level+1)
+            return
+
+        # Generate a single code object for the state update, the threshold
+        # and (possibly) the reset
+        self.update_abstract_code(run_namespace=run_namespace, level=level+1)
+        code = {'stateupdate': self.abstract_code}
+        user_code = {'stateupdate': self.user_code}
+        needed_variables = []
+        template_kwds = {'_uses_refractory': False, '_fused_reset': False}
+        for runner in self._fused_runners:
+            runner.update_abstract_code(run_namespace=run_namespace,
+                                        level=level+1)
+            check_code_units(runner.abstract_code, self.group,
+                             user_code=runner.user_code,
+                             run_namespace=run_namespace, level=level+1)
+            if isinstance(runner, Thresholder):
+                code['threshold'] = runner.abstract_code
+                user_code['threshold'] = runner.user_code
+                needed_variables.extend(runner.needed_variables)
+                template_kwds.update(runner.template_kwds)
+            else:
+                code['reset'] = runner.abstract_code
+                user_code['reset'] = runner.user_code
+                template_kwds['_fused_reset'] = True
+        self.codeobj = create_runner_codeobj(group=self.group,
+                                             code=code,
+                                             user_code=user_code,
+                                             template_name='fused_stateupdate',
+                                             name=self.name+'_codeobject*',
+                                             check_units=False,
+                                             needed_variables=needed_variables,
+                                             run_namespace=run_namespace,
+                                             level=level+1,
+                                             template_kwds=template_kwds,
+                                             codeobj_class=self.codeobj_class)
+        self.code_objects[:] = [weakref.proxy(self.codeobj)]
+
 
 
 class Thresholder(CodeRunner):
@@ -169,6 +217,9 @@ class Thresholder(CodeRunner):
                             name=group.name+'_thresholder*',
                             needed_variables=needed_variables,
                             template_kwds=template_kwds)
+        #: The `StateUpdater` executing this object's code, if any (see
+        #: `fuse_neuron_updates`)
+        self._fused_into = None
 
         # Check the abstract code for unit mismatches (only works if the
         # namespace is already complete)
@@ -206,7 +257,15 @@ class Thresholder(CodeRunner):
             self.abstract_code = '_cond = %s' % self.group.threshold
         else:
             self.abstract_code = '_cond = (%s) and not_refractory' % self.group.threshold
-        
+
+    def before_run(self, run_namespace=None, level=0):
+        if self._fused_into is not None:
+            # The code is executed as part of the state updater's code object
+            self.codeobj = None
+            self.code_objects[:] = []
+        else:
+            CodeRunner.before_run(self, run_namespace, level=level+1)
+
 
 class Resetter(CodeRunner):
     '''
@@ -222,6 +281,9 @@ class Resetter(CodeRunner):
                             order=group.order,
                             name=group.name + '_resetter*',
                             override_conditional_write=['not_refractory'])
+        #: The `StateUpdater` executing this object's code, if any (see
+        #: `fuse_neuron_updates`)
+        self._fused_into = None
 
         # Check the abstract code for unit mismatches (only works if the
         # namespace is already complete)
@@ -245,8 +307,114 @@ class Resetter(CodeRunner):
                 error_msg += " Probably you intended to use '%s = ...'?" % vm_var
             raise TypeError(error_msg)
 
+        self.user_code = code
         self.abstract_code = code
 
+    def before_run(self, run_namespace=None, level=0):
+        if self._fused_into is not None:
+            # The code is executed as part of the state updater's code object
+            self.codeobj = None
+            self.code_objects[:] = []
+        else:
+            CodeRunner.before_run(self, run_namespace, level=level+1)
+
+
+def _can_be_reordered(obj):
+    '''
+    Whether the order of execution between ``obj`` and the `Thresholder` or
+    `Resetter` of another `NeuronGroup` does not matter, i.e. whether ``obj``
+    is part of a `NeuronGroup` that does not refer to variables of other
+    groups.
+    '''
+    return (isinstance(obj, (StateUpdater, Thresholder, Resetter)) and
+            not obj.group._linked_variables)
+
+
+def _can_fuse_reset(resetter):
+    '''
+    Whether the reset code can be executed directly after the threshold
+    condition for a neuron has been evaluated. This is not the case if it
+    refers to the refractoriness variables (which are only updated after the
+    reset in the fused code) or if it writes to shared variables (which would
+    become part of the scalar code, executed whether or not a spike occurred).
+    '''
+    code = resetter.group.reset
+    if not isinstance(code, basestring):
+        return False  # will raise an error in update_abstract_code
+    if get_identifiers(code) & {'not_refractory', 'lastspike'}:
+        return False
+    variables = resetter.group.variables
+    for line in code.split('\n'):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            varname = parse_statement(line)[0]
+        except ValueError:
+            return False  # will raise an error when generating the code
+        if varname in variables and variables[varname].scalar:
+            return False
+    return True
+
+
+def fuse_neuron_updates(objects):
+    '''
+    Merge the `Thresholder` and, if possible, the `Resetter` of each
+    `NeuronGroup` into its `StateUpdater`, so that all three operations are
+    performed in a single loop over the neurons instead of three separate
+    ones. Only does something if the `codegen.fuse_neuron_kernels` preference
+    is set and the code generation target provides a ``fused_stateupdate``
+    template. The objects are only merged if this does not change the
+    results, i.e. if all objects that are scheduled between them are part of
+    independent `NeuronGroup` objects.
+
+    Parameters
+    ----------
+    objects : list of `BrianObject`
+        All objects of a `Network`, in the order of execution.
+    '''
+    from brian2.devices.device import get_device
+    for obj in objects:
+        if isinstance(obj, StateUpdater):
+            obj._fused_runners = []
+        elif isinstance(obj, (Thresholder, Resetter)):
+            obj._fused_into = None
+
+    if not prefs.codegen.fuse_neuron_kernels:
+        return
+
+    active = [obj for obj in objects if obj.active]
+    position = dict((obj.id, idx) for idx, obj in enumerate(active))
+    device = get_device()
+    for idx, state_updater in enumerate(active):
+        if (not isinstance(state_updater, StateUpdater) or
+                state_updater.group._linked_variables):
+            continue
+        templater = device.code_object_class(state_updater.codeobj_class).templater
+        if not hasattr(templater, 'fused_stateupdate'):
+            continue
+        group = state_updater.group
+        last_idx = idx
+        for runner in [group.thresholder, group.resetter]:
+            if (runner is None or runner.id not in position or
+                    runner.clock is not state_updater.clock or
+                    runner.codeobj_class is not state_updater.codeobj_class):
+                break
+            runner_idx = position[runner.id]
+            if runner_idx < last_idx or not all(_can_be_reordered(obj)
+                                                for obj in active[last_idx+1:runner_idx]):
+                break
+            if isinstance(runner, Resetter) and not _can_fuse_reset(runner):
+                break
+            runner._fused_into = weakref.proxy(state_updater)
+            state_updater._fused_runners.append(runner)
+            last_idx = runner_idx
+        if state_updater._fused_runners:
+            logger.debug('Executing %s as part of %s' %
+                         (', '.join(runner.name
+                                    for runner in state_updater._fused_runners),
+                          state_updater.name), 'fuse_neuron_updates')
+
 
 class NeuronGroup(Group, SpikeSource):
     '''
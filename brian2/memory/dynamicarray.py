@@ -1,9 +1,13 @@
 '''
 TODO: rewrite this (verbatim from Brian 1.x), more efficiency
 '''
+import struct
+
+import numpy
 from numpy import *
+from numpy.lib import format as npy_format
 
-__all__ = ['DynamicArray', 'DynamicArray1D']
+__all__ = ['DynamicArray', 'DynamicArray1D', 'MemmapDynamicArray']
 
 def getslices(shape):
     return tuple(slice(0, x) for x in shape)
@@ -186,6 +190,133 @@ class DynamicArray1D(DynamicArray):
         self.data = self._data[:newshape]
         self.shape = (newshape,)      
     
+
+
+class MemmapDynamicArray(DynamicArray):
+    '''
+    Version of `DynamicArray` that stores its data in a memory-mapped file
+    instead of in memory. The array can only be resized in its first
+    dimension (e.g. the time dimension of recorded values).
+
+    The file uses the NPY format, i.e. it can be loaded with `numpy.load`
+    (use ``mmap_mode='r'`` to avoid loading it into memory). The header
+    describing the shape of the stored data is only updated when calling
+    `flush`, until then the header might describe a shorter array than the
+    one that has been written. The `data` attribute is a plain `ndarray` view
+    of the mapped file, since weave does not accept `numpy.memmap` objects as
+    arrays.
+
+    Initialisation arguments:
+
+    ``filename``
+        The name of the file (will be overwritten if it exists).
+    ``shape``, ``dtype``
+        The shape and dtype of the array to initialise, as in Numpy.
+    ``chunk_size``
+        The file is enlarged in chunks of (at least) this number of bytes, to
+        avoid re-mapping the file for every resize. Defaults to 64MB.
+
+    Examples
+    --------
+    >>> import os, tempfile
+    >>> filename = os.path.join(tempfile.mkdtemp(), 'data.npy')
+    >>> x = MemmapDynamicArray(filename, (0, 3), dtype=int)
+    >>> x.resize((2, 3))
+    >>> x[:] = 1
+    >>> x.resize((3, 3))
+    >>> x[2, :] = 2
+    >>> x.flush()
+    >>> load(filename)
+    array([[1, 1, 1],
+           [1, 1, 1],
+           [2, 2, 2]])
+    '''
+    #: The size of the NPY header in bytes (fixed, so that the header can be
+    #: rewritten in place when the shape changes)
+    header_size = 128
+
+    def __init__(self, filename, shape, dtype=float,
+                 chunk_size=64*1024*1024):
+        if isinstance(shape, int):
+            shape = (shape,)
+        self.filename = filename
+        self.dtype = dtype
+        self.shape = tuple(shape)
+        self._row_size = (int(prod(self.shape[1:])) *
+                          numpy.dtype(dtype).itemsize)
+        self.chunk_rows = max(1, chunk_size // max(self._row_size, 1))
+        # Create (or truncate) the file
+        open(self.filename, 'wb').close()
+        self._write_header()
+        self._data = None
+        self._mmap = None
+        self._map(self.shape[0])
+        self.data = self._data
+
+    def _write_header(self):
+        header = {'descr': npy_format.dtype_to_descr(numpy.dtype(self.dtype)),
+                  'fortran_order': False,
+                  'shape': self.shape}
+        prefix = npy_format.magic(1, 0)
+        header_len = self.header_size - len(prefix) - 2
+        header = (repr(header).ljust(header_len - 1) + '\n').encode('latin1')
+        if len(header) > header_len:
+            raise ValueError('Header for shape %s does not fit into %d '
+                             'bytes.' % (self.shape, self.header_size))
+        with open(self.filename, 'r+b') as f:
+            f.write(prefix + struct.pack('<H', header_len) + header)
+
+    def _map(self, capacity):
+        '''
+        Resize the file to hold ``capacity`` rows and (re-)map it to memory.
+        '''
+        if self._mmap is not None:
+            self._mmap.flush()
+        with open(self.filename, 'r+b') as f:
+            f.truncate(self.header_size + capacity*self._row_size)
+        data_shape = (capacity, ) + self.shape[1:]
+        if capacity*self._row_size == 0:
+            # Empty files cannot be mapped to memory
+            self._mmap = None
+            self._data = zeros(data_shape, dtype=self.dtype)
+        else:
+            self._mmap = memmap(self.filename, dtype=self.dtype, mode='r+',
+                                offset=self.header_size, shape=data_shape)
+            self._data = self._mmap.view(ndarray)
+
+    def resize(self, newshape):
+        '''
+        Resizes the data to the new shape, only the first dimension can be
+        changed.
+        '''
+        if isscalar(newshape):
+            newshape = (newshape,)
+        newshape = tuple(newshape)
+        if newshape[1:] != self.shape[1:]:
+            raise ValueError('A MemmapDynamicArray can only be resized in '
+                             'its first dimension.')
+        if newshape[0] > self._data.shape[0]:
+            self._map(max(newshape[0], self._data.shape[0] + self.chunk_rows))
+        self.data = self._data[:newshape[0]]
+        self.shape = newshape
+
+    def shrink(self, newshape):
+        '''
+        Reduces the data to the given shape, and truncates the file
+        accordingly.
+        '''
+        self.resize(newshape)
+        self._map(self.shape[0])
+        self.data = self._data
+
+    def flush(self):
+        '''
+        Write all changes to disk and update the shape stored in the header.
+        '''
+        if self._mmap is not None:
+            self._mmap.flush()
+        self._write_header()
+
             
 if __name__=='__main__':
     if 1:
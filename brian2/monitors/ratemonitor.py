@@ -1,6 +1,7 @@
 import numpy as np
 
 from brian2.core.variables import Variables
+from brian2.devices.device import RuntimeDevice
 from brian2.units.allunits import second, hertz
 from brian2.units.fundamentalunits import Unit, Quantity
 from brian2.groups.group import CodeRunner, Group
@@ -28,6 +29,10 @@ class PopulationRateMonitor(Group, CodeRunner):
     Currently, this monitor can only monitor the instantaneous firing rates at
     each time step of the source clock. Any binning/smoothing of the firing
     rates has to be done manually afterwards.
+
+    The arrays storing the recorded values are allocated for the full duration
+    of a run at its start, accessing them during a run (e.g. from a
+    `NetworkOperation`) only returns the values recorded so far.
     '''
     invalidates_magic_network = False
     add_to_magic_network = True
@@ -54,6 +59,10 @@ class PopulationRateMonitor(Group, CodeRunner):
                                          constant_size=False)
         self.variables.add_dynamic_array('t', size=0, unit=second,
                                          constant_size=False)
+        # The number of recorded time steps (the arrays might be larger)
+        self.variables.add_array('_num_recorded', size=1, unit=Unit(1),
+                                 dtype=np.int32, values=np.array([0]),
+                                 scalar=True)
         self.variables.add_reference('_num_source_neurons', source, 'N')
         self.variables.add_attribute_variable('N', unit=Unit(1), obj=self,
                                               attribute='_N', dtype=np.int32)
@@ -63,12 +72,43 @@ class PopulationRateMonitor(Group, CodeRunner):
 
     @property
     def _N(self):
+        self._trim_to_recorded()
         return len(self.variables['t'].get_value())
 
     def resize(self, new_size):
         self.variables['rate'].resize(new_size)
         self.variables['t'].resize(new_size)
 
+    def _trim_to_recorded(self):
+        '''
+        Hide the unused entries at the end of the preallocated arrays, so that
+        accessing them during a run only returns the values recorded so far.
+        The arrays keep their allocated memory, the recording code enlarges
+        them again when needed.
+        '''
+        if isinstance(self.variables['t'].device, RuntimeDevice):
+            self.resize(self.variables['_num_recorded'].get_value()[0])
+
+    def state(self, name, use_units=True, level=0):
+        self._trim_to_recorded()
+        return super(PopulationRateMonitor, self).state(name,
+                                                        use_units=use_units,
+                                                        level=level+1)
+
+    def before_run(self, run_namespace=None, level=0):
+        super(PopulationRateMonitor, self).before_run(run_namespace,
+                                                      level=level+1)
+        if isinstance(self.variables['t'].device, RuntimeDevice):
+            # Allocate the memory for all values recorded during the run, the
+            # arrays are trimmed to the recorded values in after_run
+            n_steps = max(0, int(self._clock._i_end) - int(self._clock._i))
+            num_recorded = self.variables['_num_recorded'].get_value()[0]
+            self.resize(num_recorded + n_steps)
+
+    def after_run(self):
+        super(PopulationRateMonitor, self).after_run()
+        self._trim_to_recorded()
+
     def __len__(self):
         return self._N
 
@@ -1,6 +1,7 @@
 import numpy as np
 
 from brian2.core.variables import Variables
+from brian2.devices.device import RuntimeDevice
 from brian2.units.allunits import second
 from brian2.units.fundamentalunits import Unit, Quantity
 from brian2.groups.group import CodeRunner, Group
@@ -30,6 +31,12 @@ class SpikeMonitor(Group, CodeRunner):
         ``source.name+'_spikemonitor_0'``, etc.
     codeobj_class : class, optional
         The `CodeObject` class to run code with.
+
+    Notes
+    -----
+    The arrays storing the recorded spikes grow in large steps during a run,
+    accessing them during a run (e.g. from a `NetworkOperation`) only returns
+    the spikes recorded so far.
     '''
     invalidates_magic_network = False
     add_to_magic_network = True
@@ -56,6 +63,10 @@ class SpikeMonitor(Group, CodeRunner):
                                          dtype=np.int32, constant_size=False)
         self.variables.add_dynamic_array('t', size=0, unit=second,
                                          constant_size=False)
+        # The number of recorded spikes (the arrays might be larger)
+        self.variables.add_array('_num_recorded', size=1, unit=Unit(1),
+                                 dtype=np.int32, values=np.array([0]),
+                                 scalar=True)
         self.variables.add_arange('_source_i', size=len(source))
         self.variables.add_array('_count', size=len(source), unit=Unit(1),
                                  dtype=np.int32, read_only=True,
@@ -66,16 +77,139 @@ class SpikeMonitor(Group, CodeRunner):
                                               attribute='_N', dtype=np.int32)
         self.variables.create_clock_variables(self._clock,
                                               prefix='_clock_')
+        self._reset_spike_trains()
         self._enable_group_attributes()
 
     @property
     def _N(self):
+        self._trim_to_recorded()
         return len(self.variables['t'].get_value())
 
     def resize(self, new_size):
         self.variables['i'].resize(new_size)
         self.variables['t'].resize(new_size)
 
+    def _trim_to_recorded(self):
+        '''
+        Hide the unused entries at the end of the preallocated arrays, so that
+        accessing them during a run only returns the values recorded so far.
+        The arrays keep their allocated memory, the recording code enlarges
+        them again when needed.
+        '''
+        if isinstance(self.variables['t'].device, RuntimeDevice):
+            self.resize(self.variables['_num_recorded'].get_value()[0])
+
+    def state(self, name, use_units=True, level=0):
+        self._trim_to_recorded()
+        return super(SpikeMonitor, self).state(name, use_units=use_units,
+                                               level=level+1)
+
+    def after_run(self):
+        super(SpikeMonitor, self).after_run()
+        if isinstance(self.variables['t'].device, RuntimeDevice):
+            # Remove the unused space at the end of the arrays
+            self._trim_to_recorded()
+            self._update_spike_trains()
+
+    def _restore(self, name='default'):
+        super(SpikeMonitor, self)._restore(name)
+        self._reset_spike_trains()
+
+    def _reset_spike_trains(self):
+        # The spike times sorted by neuron index (and by time for each neuron)
+        # and the number of spikes per neuron in this sorted array, updated by
+        # `_update_spike_trains`
+        self._sorted_spike_times = np.zeros(0)
+        self._sorted_spike_counts = np.zeros(len(self.source), dtype=np.int32)
+        self._sorted_spike_offsets = np.zeros(len(self.source) + 1,
+                                              dtype=np.int64)
+        # Identifies the results that have been sorted, the results of a
+        # standalone simulation can be replaced by the results of another run
+        self._sorted_results_key = None
+
+    def _update_spike_trains(self):
+        '''
+        Add the spikes recorded since the last call to the spike times sorted
+        by neuron index. The new spikes are sorted separately and then merged
+        into the existing array, using the number of spikes per neuron in the
+        ``_count`` variable to determine the new position of each spike.
+        '''
+        results_key = getattr(self.variables['i'].device, 'results_key', None)
+        if results_key != self._sorted_results_key:
+            self._reset_spike_trains()
+            self._sorted_results_key = results_key
+        # Only use the spikes recorded so far (during a run, the arrays are
+        # larger)
+        self._trim_to_recorded()
+        indices = self.variables['i'].get_value()
+        times = self.variables['t'].get_value()
+        counts = self.variables['_count'].get_value()
+        old_counts = self._sorted_spike_counts
+        n_old = len(self._sorted_spike_times)
+        if len(indices) == n_old:
+            return
+        new_counts = counts - old_counts
+        offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+
+        sorted_times = np.empty(len(indices), dtype=times.dtype)
+        # Move the previously sorted spikes to their new positions
+        old_neurons = np.repeat(np.arange(len(counts)), old_counts)
+        old_offsets = self._sorted_spike_offsets[:-1]
+        sorted_times[np.arange(n_old) - old_offsets[old_neurons] +
+                     offsets[old_neurons]] = self._sorted_spike_times[:n_old]
+        # Add the new spikes after the previous spikes of the same neuron (a
+        # stable sort keeps the spikes of each neuron sorted by time)
+        new_indices = indices[n_old:]
+        order = np.argsort(new_indices, kind='mergesort')
+        new_neurons = new_indices[order]
+        new_offsets = np.cumsum(new_counts) - new_counts
+        rank = np.arange(len(new_neurons)) - new_offsets[new_neurons]
+        sorted_times[offsets[new_neurons] + old_counts[new_neurons] +
+                     rank] = times[n_old:][order]
+
+        self._sorted_spike_times = sorted_times
+        self._sorted_spike_counts = counts.copy()
+        self._sorted_spike_offsets = offsets
+
+    def spike_train(self, index):
+        '''
+        Return the spike times of a single neuron.
+
+        Parameters
+        ----------
+        index : int
+            The index of the neuron (relative to the recorded group).
+
+        Returns
+        -------
+        spike_times : `Quantity`
+            The spike times of the neuron, a view on an internal array that is
+            sorted by neuron index.
+        '''
+        self._update_spike_trains()
+        offsets = self._sorted_spike_offsets
+        if not 0 <= index < len(offsets) - 1:
+            raise IndexError('Neuron index %d out of range' % index)
+        return Quantity(self._sorted_spike_times[offsets[index]:offsets[index+1]],
+                        dim=second.dim)
+
+    def spike_trains(self):
+        '''
+        Return the spike times of all neurons.
+
+        Returns
+        -------
+        spike_trains : dict
+            Dictionary mapping each neuron index to its spike times (see
+            `spike_train`).
+        '''
+        self._update_spike_trains()
+        offsets = self._sorted_spike_offsets
+        times = Quantity(self._sorted_spike_times, dim=second.dim)
+        return dict((index, times[offsets[index]:offsets[index+1]])
+                    for index in xrange(len(offsets) - 1))
+
     def __len__(self):
         return self._N
 
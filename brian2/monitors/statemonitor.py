@@ -1,9 +1,12 @@
 import collections
 import numbers
+import os
 
 import numpy as np
 
+from brian2.core.preferences import prefs
 from brian2.core.variables import (Variables, Subexpression, get_dtype)
+from brian2.devices.device import RuntimeDevice
 from brian2.groups.group import Group, CodeRunner
 from brian2.utils.logger import get_logger
 from brian2.units.fundamentalunits import Unit, Quantity
@@ -38,11 +41,11 @@ class StateMonitorView(object):
             return Quantity(mon.variables['t'].get_value(), dim=second.dim)
         elif item == 't_':
             return mon.variables['t'].get_value()
-        elif item in mon.record_variables:
-            unit = mon.variables[item].unit
+        elif item in mon.recorded_variables:
+            unit = mon.variables['_recorded_'+item].unit
             return Quantity(mon.variables['_recorded_'+item].get_value().T[self.indices],
                             dim=unit.dim, copy=True)
-        elif item.endswith('_') and item[:-1] in mon.record_variables:
+        elif item.endswith('_') and item[:-1] in mon.recorded_variables:
             return mon.variables['_recorded_'+item[:-1]].get_value().T[self.indices].copy()
         else:
             raise AttributeError('Unknown attribute %s' % item)
@@ -121,6 +124,32 @@ class StateMonitor(Group, CodeRunner):
         ``source.name+'statemonitor_0'``, etc.
     codeobj_class : `CodeObject`, optional
         The `CodeObject` class to create.
+    storage : str, optional
+        Where to store the recorded values. Defaults to ``'memory'``. Use
+        ``'mmap:<directory>'`` to store them in memory-mapped files in the
+        given directory instead (one file per recorded variable, plus one for
+        the recording times, e.g. ``statemonitor_v.npy`` and
+        ``statemonitor_t.npy``). This allows to record more values than fit
+        into memory, the recorded values will only be loaded from disk when
+        they are accessed. The files use the NPY format and can be loaded with
+        `numpy.load` after the run.
+    every : int, optional
+        Record only once every ``every`` time steps of the monitor's clock.
+        Without a `reduction`, the values at the first time step of each block
+        of ``every`` time steps are recorded. Defaults to 1, i.e. values are
+        recorded at every time step.
+    reduction : str or sequence of str, optional
+        Record a reduction of the values over each block of ``every`` time
+        steps instead of the values themselves, one or more of ``'mean'``,
+        ``'min'`` and ``'max'``. The recorded values are available as
+        attributes with the reduction as a suffix (e.g. ``v_mean`` or
+        ``v_max``), the recorded times (``t``) refer to the start of each
+        block. Values of a block that is not completed at the end of a run
+        will be recorded when it is completed in a subsequent run.
+    population : bool, optional
+        Whether to record the average over all recorded indices instead of the
+        individual values (applied before a `reduction`). The recorded values
+        then have the shape ``(1, len(t))``. Defaults to ``False``.
 
     Examples
     --------
@@ -139,6 +168,22 @@ class StateMonitor(Group, CodeRunner):
         plot(M.t, M.V.T)
         show()
 
+    Record the membrane potential of 10000 neurons in files in the
+    ``recordings`` directory::
+
+        M = StateMonitor(G, 'V', record=True, storage='mmap:recordings')
+        run(100*second)
+        plot(M.t, M[0].V)  # only loads the values for the first neuron
+
+    Record the average membrane potential over all neurons and its minimum
+    and maximum over each block of 10 time steps::
+
+        M = StateMonitor(G, 'V', record=True, every=10, population=True,
+                         reduction=('mean', 'min', 'max'))
+        run(100*ms)
+        plot(M.t, M.V_mean[0])
+        fill_between(M.t, M.V_min[0], M.V_max[0])
+
     Notes
     -----
 
@@ -147,11 +192,16 @@ class StateMonitor(Group, CodeRunner):
     the recording is done *after* application of the reset statement, i.e the
     recorded membrane potential trace will never be above threshold. Set the
     `when` keyword to a different value if this is not what you want.
+
+    The arrays storing the recorded values are allocated for the full duration
+    of a run at its start, accessing them during a run (e.g. from a
+    `NetworkOperation`) only returns the values recorded so far.
     '''
     invalidates_magic_network = False
     add_to_magic_network = True
     def __init__(self, source, variables, record=None, dt=None, clock=None,
-                 when='end', order=0, name='statemonitor*', codeobj_class=None):
+                 when='end', order=0, name='statemonitor*', codeobj_class=None,
+                 storage='memory', every=1, reduction=None, population=False):
         self.source = source
         # Make the monitor use the explicitly defined namespace of its source
         # group (if it exists)
@@ -170,6 +220,25 @@ class StateMonitor(Group, CodeRunner):
         #: The variables to record
         self.record_variables = variables
 
+        if reduction is None:
+            reductions = []
+        elif isinstance(reduction, basestring):
+            reductions = [reduction]
+        else:
+            reductions = list(reduction)
+        for red in reductions:
+            if red not in ('mean', 'min', 'max'):
+                raise ValueError(('Unknown reduction "%s", has to be one of '
+                                  '"mean", "min", or "max".') % red)
+        if int(every) != every or every < 1:
+            raise ValueError('every has to be a positive integer, is %s' % every)
+        #: The number of time steps over which values are aggregated
+        self.every = int(every)
+        #: The reductions applied to the values of each block of time steps
+        self.reductions = reductions
+        #: Whether the average over the recorded indices is recorded
+        self.population = population
+
         # record should always be an array of ints
         self.record_all = False
         if hasattr(record, '_indices'):
@@ -190,6 +259,8 @@ class StateMonitor(Group, CodeRunner):
         #: The array of recorded indices
         self.record = record
         self.n_indices = len(record)
+        # The number of values recorded per time step
+        self._n_values = 1 if population else self.n_indices
 
         # Some dummy code so that code generation takes care of the indexing
         # and subexpressions
@@ -215,15 +286,22 @@ class StateMonitor(Group, CodeRunner):
         self.variables.add_attribute_variable('N', unit=Unit(1),
                                               dtype=np.int32,
                                               obj=self, attribute='_N')
+        # The number of recorded time steps (the arrays might be larger)
+        self.variables.add_array('_num_recorded', size=1, unit=Unit(1),
+                                 dtype=np.int32, values=np.array([0]),
+                                 scalar=True)
         self.variables.add_array('_indices', size=len(self.record),
                                  unit=Unit(1), dtype=self.record.dtype,
                                  constant=True, read_only=True,
                                  values=self.record)
         self.variables.create_clock_variables(self._clock,
                                               prefix='_clock_')
+        # Maps the names of the recorded values (e.g. "v" or "v_mean") to the
+        # recorded variable and the reduction
+        recorded_sources = {}
         for varname in variables:
             var = source.variables[varname]
-            if var.scalar and len(self.record) > 1:
+            if var.scalar and len(self.record) > 1 and not population:
                 logger.warn(('Variable %s is a shared variable but it will be '
                              'recorded once for every target.' % varname),
                             once=True)
@@ -231,12 +309,34 @@ class StateMonitor(Group, CodeRunner):
             self.variables.add_reference(varname, source, varname, index=index)
             if not index in ('_idx', '0') and index not in variables:
                 self.variables.add_reference(index, source)
-            self.variables.add_dynamic_array('_recorded_' + varname,
-                                             size=(0, len(self.record)),
-                                             unit=var.unit,
-                                             dtype=var.dtype,
-                                             constant=False,
-                                             constant_size=False)
+            for red in (reductions if reductions else [None]):
+                recorded_name = varname if red is None else varname+'_'+red
+                recorded_sources[recorded_name] = (varname, red)
+                # Averages are always stored as floating point values
+                if red == 'mean' or population:
+                    dtype = prefs['core.default_float_dtype']
+                else:
+                    dtype = var.dtype
+                self.variables.add_dynamic_array('_recorded_' + recorded_name,
+                                                 size=(0, self._n_values),
+                                                 unit=var.unit,
+                                                 dtype=dtype,
+                                                 constant=False,
+                                                 constant_size=False)
+                if self.every > 1 and red is not None:
+                    self.variables.add_array('_accumulated_' + recorded_name,
+                                             size=self._n_values,
+                                             unit=var.unit, dtype=dtype)
+        if self.every > 1:
+            # The position in the current block of time steps
+            self.variables.add_array('_block_step', size=1, unit=Unit(1),
+                                     dtype=np.int32, values=np.array([0]),
+                                     scalar=True)
+            if reductions:
+                # The time at the start of the current block
+                self.variables.add_array('_block_start_t', size=1,
+                                         unit=second, dtype=np.float64,
+                                         scalar=True)
 
         for varname in self.record_variables:
             var = self.source.variables[varname]
@@ -245,19 +345,49 @@ class StateMonitor(Group, CodeRunner):
                                                   dtype=var.dtype,
                                                   scalar=var.scalar)
 
-        self.recorded_variables = dict([(varname,
-                                         self.variables['_recorded_'+varname])
-                                        for varname in self.record_variables])
-        recorded_names = ['_recorded_'+varname
-                          for varname in self.record_variables]
-
-        self.needed_variables = recorded_names
+        self.recorded_variables = dict([(name,
+                                         self.variables['_recorded_'+name])
+                                        for name in recorded_sources])
+        recorded_names = ['_recorded_'+name for name in recorded_sources]
+        accumulators = dict([(name, self.variables['_accumulated_'+name])
+                             for name in recorded_sources
+                             if '_accumulated_'+name in self.variables])
+        accumulator_names = ['_accumulated_'+name for name in accumulators]
+        block_names = [name for name in ['_block_step', '_block_start_t']
+                       if name in self.variables]
+
+        self.needed_variables = recorded_names + accumulator_names + block_names
         self.template_kwds = template_kwds={'_recorded_variables':
-                                            self.recorded_variables}
+                                            self.recorded_variables,
+                                            '_recorded_sources':
+                                            recorded_sources,
+                                            '_accumulators': accumulators,
+                                            '_block_size': self.every,
+                                            '_population': population}
+
+        #: Where the recorded values are stored (see the ``storage`` argument)
+        self.storage = storage
+        if storage != 'memory':
+            if not storage.startswith('mmap:'):
+                raise ValueError(('storage has to be either "memory" or '
+                                  '"mmap:<directory>", not "%s".') % storage)
+            directory = storage[len('mmap:'):]
+            if not os.path.exists(directory):
+                os.makedirs(directory)
+            for varname in ['t'] + list(self.recorded_variables):
+                if varname == 't':
+                    var = self.variables['t']
+                else:
+                    var = self.recorded_variables[varname]
+                filename = os.path.join(directory,
+                                        '%s_%s.npy' % (self.name, varname))
+                var.device.use_file_storage(var, filename)
+
         self._enable_group_attributes()
 
     @property
     def _N(self):
+        self._trim_to_recorded()
         return self.variables['t'].get_value().shape[0]
 
     def __len__(self):
@@ -267,12 +397,47 @@ class StateMonitor(Group, CodeRunner):
         self.variables['t'].resize(new_size)
 
         for var in self.recorded_variables.values():
-            var.resize((new_size, self.n_indices))
+            var.resize((new_size, self._n_values))
+
+    def _trim_to_recorded(self):
+        '''
+        Hide the unused entries at the end of the preallocated arrays, so that
+        accessing them during a run only returns the values recorded so far.
+        The arrays keep their allocated memory, the recording code enlarges
+        them again when needed.
+        '''
+        if isinstance(self.variables['t'].device, RuntimeDevice):
+            self.resize(self.variables['_num_recorded'].get_value()[0])
+
+    def state(self, name, use_units=True, level=0):
+        self._trim_to_recorded()
+        return super(StateMonitor, self).state(name, use_units=use_units,
+                                               level=level+1)
 
     def reinit(self):
         raise NotImplementedError()
 
+    def before_run(self, run_namespace=None, level=0):
+        super(StateMonitor, self).before_run(run_namespace, level=level+1)
+        if isinstance(self.variables['t'].device, RuntimeDevice):
+            # Allocate the memory for all values recorded during the run, the
+            # arrays are trimmed to the recorded values in after_run
+            n_steps = max(0, int(self._clock._i_end) - int(self._clock._i))
+            num_recorded = self.variables['_num_recorded'].get_value()[0]
+            self.resize(num_recorded + n_steps // self.every + 1)
+
+    def after_run(self):
+        super(StateMonitor, self).after_run()
+        self._trim_to_recorded()
+        if self.storage != 'memory':
+            # Write the recorded values to disk
+            for var in [self.variables['t']] + self.recorded_variables.values():
+                var.device.get_value(var, access_data=False).flush()
+
     def __getitem__(self, item):
+        if self.population:
+            raise IndexError('Cannot index a monitor that records the average '
+                             'over all indices.')
         dtype = get_dtype(item)
         if np.issubdtype(dtype, np.int):
             return StateMonitorView(self, item)
@@ -303,11 +468,14 @@ class StateMonitor(Group, CodeRunner):
             raise AttributeError
         if not hasattr(self, '_group_attribute_access_active'):
             raise AttributeError
-        if item in self.record_variables:
-            unit = self.variables[item].unit
+        if item in self.recorded_variables:
+            self._trim_to_recorded()
+            unit = self.variables['_recorded_'+item].unit
+            # Do not copy values stored in files, to only load them on access
             return Quantity(self.variables['_recorded_'+item].get_value().T,
-                            dim=unit.dim, copy=True)
-        elif item.endswith('_') and item[:-1] in self.record_variables:
+                            dim=unit.dim, copy=self.storage == 'memory')
+        elif item.endswith('_') and item[:-1] in self.recorded_variables:
+            self._trim_to_recorded()
             return self.variables['_recorded_'+item[:-1]].get_value().T
         else:
             return Group.__getattr__(self, item)
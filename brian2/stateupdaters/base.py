@@ -6,19 +6,118 @@ for example in `NeuronGroup` when no state updater is given explicitly.
 '''
 from abc import abstractmethod, ABCMeta
 import collections
+import re
 
+from brian2.utils.caching import LRUCache, get_disk_cache
 from brian2.utils.logger import get_logger
 
 __all__ = ['StateUpdateMethod']
 
 logger = get_logger(__name__)
 
+
+def _canonical_code(code):
+    '''
+    Remove all whitespace from a code string that does not separate two
+    names or numbers.
+    '''
+    code = re.sub(r'\s*([^\w\s.])\s*', r'\1', code.strip())
+    return re.sub(r'\s+', ' ', code)
+
+
+def _canonical_equations(equations):
+    '''
+    Return a string describing the given `Equations` that does not depend on
+    the formatting of the equations, e.g. on the use of whitespace.
+    '''
+    lines = []
+    for eq in equations.ordered:
+        expr = '' if eq.expr is None else _canonical_code(eq.expr.code)
+        lines.append('%s %s = %s : %s (%s)' % (eq.type, eq.varname, expr,
+                                               eq.unit,
+                                               ', '.join(sorted(eq.flags))))
+    return '\n'.join(lines)
+
+
+def _stateupdater_cache_key(equations, variables, method, referenced=None):
+    '''
+    Return a string describing everything that influences the choice of the
+    state updater and the abstract code it generates, used to look up the
+    results in a cache. Returns ``None`` if the results should not be cached,
+    e.g. because the state updater was not chosen by name or because the
+    equations use user-defined functions. If a list is given as
+    ``referenced``, such objects are instead described by their identity and
+    appended to the list -- the resulting key is then only valid as long as
+    these objects exist, i.e. it can only be used for an in-memory cache that
+    stores the objects together with the result.
+    '''
+    from brian2.core.functions import Function, DEFAULT_FUNCTIONS
+    from brian2.core.variables import Variable, Subexpression
+
+    description = [_canonical_equations(equations)]
+    if isinstance(method, basestring):
+        names = [method.lower()]
+    elif (isinstance(method, collections.Iterable) and
+              all(isinstance(name, basestring) for name in method)):
+        names = list(method)
+    elif referenced is not None and hasattr(method, '__call__'):
+        names = []
+        description.append('state updater: %d' % id(method))
+        referenced.append(method)
+    else:
+        return None
+    for name in names:
+        stateupdater = StateUpdateMethod.stateupdaters.get(name, None)
+        if stateupdater is None:
+            description.append(name)
+            continue
+        cls = type(stateupdater)
+        if not cls.__module__.startswith('brian2.'):
+            if referenced is None:
+                return None
+            description.append('%s: %d' % (name, id(stateupdater)))
+            referenced.append(stateupdater)
+        elif cls.__repr__ is object.__repr__:
+            description.append('%s: %s.%s' % (name, cls.__module__,
+                                              cls.__name__))
+        else:
+            description.append('%s: %r' % (name, stateupdater))
+    for varname in sorted(variables):
+        var = variables[varname]
+        if isinstance(var, Function):
+            if var is DEFAULT_FUNCTIONS.get(varname, None):
+                description.append('%s: default function' % varname)
+            elif referenced is not None:
+                description.append('%s: function %d' % (varname, id(var)))
+                referenced.append(var)
+            else:
+                return None
+        elif isinstance(var, Variable):
+            var_description = [var.__class__.__name__, str(var.dtype),
+                               str(var.unit), var.scalar, var.constant]
+            if isinstance(var, Subexpression):
+                var_description.append(_canonical_code(var.expr))
+            if varname == 'dt':
+                # The time step is used to decide whether functions are
+                # constant over a time step
+                var_description.append(repr(var.get_value()))
+            description.append('%s: %r' % (varname, var_description))
+        else:
+            return None
+    return '\n'.join(description)
+
+
 class StateUpdateMethod(object):
     __metaclass__ = ABCMeta
 
     #: A dictionary mapping state updater names to `StateUpdateMethod` objects
     stateupdaters = dict()
 
+    #: An in-memory cache (`LRUCache`) for the results of
+    #: `apply_stateupdater`, shared by all groups with the same equations.
+    #: Its ``hits`` and ``misses`` attributes count the lookups.
+    derivation_cache = LRUCache(128)
+
     @abstractmethod
     def can_integrate(self, equations, variables):
         '''
@@ -93,6 +192,76 @@ class StateUpdateMethod(object):
 
         StateUpdateMethod.stateupdaters[name] = stateupdater
 
+    @staticmethod
+    def apply_stateupdater(equations, variables, method):
+        '''
+        Determine a suitable state updater (see `determine_stateupdater`) and
+        use it to generate the abstract code for a state update step. If the
+        state updater is chosen by name, the results are stored in a
+        persistent cache (see the `codegen.cache_directory` preference), later
+        calls with the same equations, the same method and the same kind of
+        variables (e.g. in a new Python process) will therefore not repeat the
+        symbolic calculations. Within a process, all results are in addition
+        stored in `StateUpdateMethod.derivation_cache`.
+
+        Parameters
+        ----------
+        equations : `Equations`
+            The model equations.
+        variables : `dict`
+            The dictionary of `Variable` objects, describing the internal
+            model variables.
+        method : {callable, str, list of str}
+            A callable usable as a state updater, the name of a registered
+            state updater or a list of names of state updaters.
+
+        Returns
+        -------
+        stateupdater : `StateUpdateMethod`
+            The state updater that has been used.
+        code : str
+            The abstract code performing a state update step.
+        '''
+        referenced = []
+        key = _stateupdater_cache_key(equations, variables, method,
+                                      referenced)
+        if key is not None:
+            cached = StateUpdateMethod.derivation_cache.get(key)
+            if cached is not None:
+                stateupdater, code, _ = cached
+                logger.debug('Reusing state update code for "%r"' % stateupdater)
+                return stateupdater, code
+
+        # Keys referring to objects by identity are not valid across processes
+        cache = None
+        if key is not None and not referenced:
+            cache = get_disk_cache('stateupdaters')
+        if cache is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                name, code = cached
+                logger.debug('Using cached state update code for "%s"' % name)
+                stateupdater = StateUpdateMethod.stateupdaters[name]
+                StateUpdateMethod.derivation_cache.set(key, (stateupdater,
+                                                             code, referenced))
+                return stateupdater, code
+
+        stateupdater = StateUpdateMethod.determine_stateupdater(equations,
+                                                               variables,
+                                                               method)
+        code = stateupdater(equations, variables)
+        if key is not None:
+            # Store the referenced objects as well, so that their ids are not
+            # reused while the key is in the cache
+            StateUpdateMethod.derivation_cache.set(key, (stateupdater, code,
+                                                         referenced))
+        if cache is not None:
+            for name, registered in StateUpdateMethod.stateupdaters.iteritems():
+                if registered is stateupdater:
+                    cache.set(key, (name, code))
+                    break
+        return stateupdater, code
+
     @staticmethod
     def determine_stateupdater(equations, variables, method):
         '''
@@ -18,6 +18,9 @@ public:
 	scalar dt;
 	unsigned int offset;
 	unsigned int *delays;
+	// for a scalar delay, delays is NULL and the delay is stored here
+	bool scalar_delay;
+	unsigned int the_delay;
 	int source_start;
 	int source_end;
     unsigned int openmp_padding;
@@ -33,6 +36,8 @@ public:
 		offset = 0;
 		dt = 0.0;
 		delays = NULL;
+		scalar_delay = false;
+		the_delay = 0;
         openmp_padding = 0;
 	};
 
@@ -44,7 +49,10 @@ public:
         assert(n_delays == 1 || n_delays == n_synapses);
 
         if (delays)
+        {
             delete [] delays;
+            delays = NULL;
+        }
 
         if (dt != 0.0 && dt != _dt)
         {
@@ -64,14 +72,19 @@ public:
             offset = 0;
         }
 
-        delays = new unsigned int[n_synapses];
+        // Do not store a delay per synapse if all synapses have the same delay
+        scalar_delay = (n_delays == 1);
+        if (scalar_delay)
+            the_delay = (int)(real_delays[0] / _dt + 0.5); //round to nearest int
+        else
+            delays = new unsigned int[n_synapses];
         synapses.clear();
         synapses.resize(source_end - source_start);
 
         for (unsigned int i=0; i<n_synapses; i++)
         {
-            scalar delay = n_delays > 1 ? real_delays[i] : real_delays[0];
-            delays[i] =  (int)(delay / _dt + 0.5); //round to nearest int
+            if (!scalar_delay)
+                delays[i] =  (int)(real_delays[i] / _dt + 0.5); //round to nearest int
             synapses[sources[i] - source_start].push_back(i + openmp_padding);
         }
 
@@ -123,6 +136,20 @@ public:
 	{
 		const unsigned int start = lower_bound(spikes, spikes+nspikes, source_start)-spikes;
 		const unsigned int stop = upper_bound(spikes, spikes+nspikes, source_end-1)-spikes;
+		if (scalar_delay)
+		{
+			// all events go into the same queue
+			if (start < stop)
+				ensure_delay(the_delay);
+			vector<DTYPE_int> &target_queue = queue[(offset+the_delay)%queue.size()];
+			for(unsigned int idx_spike=start; idx_spike<stop; idx_spike++)
+			{
+				const vector<int> &cur_indices = synapses[spikes[idx_spike] - source_start];
+				target_queue.insert(target_queue.end(), cur_indices.begin(),
+				                    cur_indices.end());
+			}
+			return;
+		}
 		for(unsigned int idx_spike=start; idx_spike<stop; idx_spike++)
 		{
 			const unsigned int idx_neuron = spikes[idx_spike] - source_start;
@@ -51,7 +51,10 @@ cdef class SpikeQueue:
 
     def prepare(self, np.ndarray[double, ndim=1, mode='c'] real_delays,
                 double dt,
-                np.ndarray[int32_t, ndim=1, mode='c'] sources):
+                np.ndarray[int32_t, ndim=1, mode='c'] sources,
+                delays_version=None):
+        # The C++ queue does not cache any information, delays_version is only
+        # accepted for compatibility with the Python SpikeQueue
         self.thisptr.prepare(<double*>real_delays.data,
                              real_delays.shape[0],
                              <int32_t*>sources.data,
@@ -10,13 +10,29 @@ import numpy as np
 from brian2.memory.dynamicarray import DynamicArray1D
 from brian2.utils.logger import get_logger
 
-__all__=['SpikeQueue']
+__all__=['SpikeQueue', 'CompactSpikeQueue']
 
 logger = get_logger(__name__)
 
 INITIAL_MAXSPIKESPER_DT = 1
 
 
+def _concatenated_ranges(starts, counts):
+    '''
+    Return the concatenation of the integer ranges
+    ``starts[k]:starts[k]+counts[k]`` for all ``k``, without looping in Python.
+
+    Examples
+    --------
+    >>> _concatenated_ranges(np.array([5, 0, 10]), np.array([2, 3, 0]))
+    array([5, 6, 0, 1, 2])
+    '''
+    # The position of the first element of each range in the output array
+    block_starts = np.cumsum(counts) - counts
+    return (np.arange(np.sum(counts)) +
+            np.repeat(starts - block_starts, counts))
+
+
 class SpikeQueue(object):
     '''
     Data structure saving the spikes and taking care of delays.
@@ -52,7 +68,15 @@ class SpikeQueue(object):
     direction (rows) and dynamic in the events direction (columns). The
     row index corresponding to the current timestep is `currentime`.
     Each element contains the target synapse index.    
-    
+
+    **Connectivity**
+
+    The synapses of each source neuron are stored in compressed sparse row
+    (CSR) format: `_source_synapses` contains all synapse indices sorted by
+    their source neuron, and `_source_indptr` the start position of each
+    neuron's synapses in this array. This allows to gather the synaptic events
+    for all neurons that spiked in a time step with vectorised operations.
+
     **Offsets**
     
     Offsets are used to solve the problem of inserting multiple synaptic events
@@ -88,10 +112,16 @@ class SpikeQueue(object):
         #: The dt used for storing the spikes (will be set in `prepare`)
         self._dt = None
 
+        #: The number of synapses for which the connectivity has been prepared
+        self._n_synapses = None
+
+        #: The version of the delays used for the delay-dependent data
+        self._delays_version = None
+
         #: Storage for the store/restore mechanism
         self._stored_spikes = {}
 
-    def prepare(self, delays, dt, synapse_sources):
+    def prepare(self, delays, dt, synapse_sources, delays_version=None):
         '''
         Prepare the data structure and pre-compute offsets.
         This is called every time the network is run. The size of the
@@ -99,9 +129,35 @@ class SpikeQueue(object):
         delay in `delays`, if necessary. Offsets are calculated, unless
         the option `precompute_offsets` is set to ``False``. A flag is set if
         delays are homogeneous, in which case insertion will use a faster method
-        implemented in `insert_homogeneous`.        
+        implemented in `insert_homogeneous`, and only a single delay (and no
+        offsets) is stored for all synapses.
+
+        The connectivity is only recalculated if the number of synapses
+        changed, and delay-dependent data (including the offsets) only if
+        the delays (according to `delays_version`) or `dt` changed. If nothing
+        changed since the last call, the data structure is left untouched.
+
+        Parameters
+        ----------
+        delays : ndarray
+            The delays of all synapses (or a single delay for all synapses).
+        dt : float
+            The time step of the source group (in seconds).
+        synapse_sources : ndarray of int
+            The source neuron index of all synapses.
+        delays_version : int, optional
+            A counter that changes whenever the values in `delays` change (see
+            `ArrayVariable.version`). If not given, the delays are assumed to
+            have changed.
         '''
         n_synapses = len(synapse_sources)
+        connectivity_changed = n_synapses != self._n_synapses
+        delays_changed = (connectivity_changed or
+                          delays_version is None or
+                          delays_version != self._delays_version or
+                          dt != self._dt)
+        if not delays_changed:
+            return
 
         if self._dt is not None:
             # store the current spikes
@@ -120,25 +176,57 @@ class SpikeQueue(object):
         else:
             max_delays = min_delays = 0
 
+        # Check if delays are homogeneous
+        self._homogeneous = (max_delays == min_delays)
+        if self._homogeneous and len(delays) > 1:
+            # Only store a single delay for all synapses
+            delays = delays[:1].copy()
         self._delays = delays
 
-        # Prepare the data structure used in propagation
-        synapse_sources = synapse_sources[:]        
-        ss = np.ravel(synapse_sources)
-        # mergesort to retain relative order, keeps the output lists in sorted order
-        I = np.argsort(ss, kind='mergesort')
-        ss_sorted = ss[I]
-        splitinds = np.searchsorted(ss_sorted, np.arange(self._source_start, self. _source_end+1))
-        self._neurons_to_synapses = [I[splitinds[j]:splitinds[j+1]] for j in xrange(len(splitinds)-1)]
-        max_events = max(map(len, self._neurons_to_synapses))
+        if connectivity_changed:
+            # Prepare the data structure used in propagation
+            synapse_sources = synapse_sources[:]
+            ss = np.ravel(synapse_sources)
+            # mergesort to retain relative order, keeps the output lists in sorted order
+            I = np.argsort(ss, kind='mergesort')
+            ss_sorted = ss[I]
+            # Connectivity in compressed sparse row (CSR) format: the synapses of
+            # source neuron j are _source_synapses[_source_indptr[j]:_source_indptr[j+1]]
+            self._source_indptr = np.searchsorted(ss_sorted,
+                                                  np.arange(self._source_start,
+                                                            self._source_end+1))
+            self._source_synapses = np.asarray(I, dtype=np.int32)
+            if len(self._source_indptr) > 1:
+                self._max_events = np.max(np.diff(self._source_indptr))
+            else:
+                self._max_events = 0
+            self._n_synapses = n_synapses
 
         n_steps = max_delays + 1
         
         # Adjust the maximum delay and number of events per timestep if necessary
-        # Check if delays are homogeneous
-        self._homogeneous = (max_delays == min_delays)
+        self._prepare_storage(n_steps, self._max_events)
+
+        # Precompute offsets (not needed for homogeneous delays, the events
+        # are inserted with `_insert_homogeneous`)
+        if self._precompute_offsets and not self._homogeneous:
+            self._do_precompute_offsets()
+        else:
+            self._offsets = None
+
+        # Re-insert the spikes into the data structure
+        if spikes is not None:
+            self._store_spikes(spikes)
 
-        # Resize
+        self._dt = dt
+        self._delays_version = delays_version
+
+    def _prepare_storage(self, n_steps, max_events):
+        '''
+        Make sure that the data structure can store events for `n_steps` time
+        steps, with (initially) `max_events` events per time step. If the data
+        structure is resized, all events stored in it are lost.
+        '''
         if (n_steps > self.X.shape[0]) or (max_events > self.X.shape[1]): # Resize
             # Choose max_delay if is is larger than the maximum delay
             n_steps = max(n_steps, self.X.shape[0])
@@ -147,16 +235,6 @@ class SpikeQueue(object):
             self.X_flat = self.X.reshape(n_steps*max_events,)
             self.n = np.zeros(n_steps, dtype=int) # number of events in each time step
 
-        # Precompute offsets
-        if self._precompute_offsets:
-            self._do_precompute_offsets(n_synapses)
-
-        # Re-insert the spikes into the data structure
-        if spikes is not None:
-            self._store_spikes(spikes)
-
-        self._dt = dt
-
     def _extract_spikes(self):
         '''
         Get all the stored spikes
@@ -168,13 +246,12 @@ class SpikeQueue(object):
             The first column gives the time (as integer time steps) and the
             second column gives the index of the target synapse.
         '''
+        n_steps = len(self.n)
+        row_starts = np.arange(n_steps) * self.X.shape[1]
         spikes = np.zeros((np.sum(self.n), 2))
-        counter = 0
-        for idx, n in enumerate(self.n):
-            t = (idx - self.currenttime) % len(self.n)
-            for target in self.X[idx, :n]:
-                spikes[counter, :] = np.array([t, target])
-                counter += 1
+        spikes[:, 0] = np.repeat((np.arange(n_steps) - self.currenttime) % n_steps,
+                                 self.n)
+        spikes[:, 1] = self.X_flat[_concatenated_ranges(row_starts, self.n)]
         return spikes
 
     def _store_spikes(self, spikes):
@@ -192,10 +269,15 @@ class SpikeQueue(object):
         '''
         # Clear all spikes
         self.n[:] = 0
-        for t, target in spikes:
-            row_idx = (t + self.currenttime) % len(self.n)
-            self.X[row_idx, self.n[row_idx]] = target
-            self.n[row_idx] += 1
+        if len(spikes) == 0:
+            return
+        rows = (np.asarray(spikes[:, 0], dtype=int) + self.currenttime) % len(self.n)
+        n = np.bincount(rows, minlength=len(self.n))
+        if np.max(n) > self.X.shape[1]:
+            self._resize(np.max(n))
+        offsets = self._calc_offsets(rows)
+        self.X_flat[rows*self.X.shape[1] + offsets] = spikes[:, 1]
+        self.n[:] = n
 
     def _store(self, name='default'):
         self._stored_spikes[name] = self._extract_spikes()
@@ -243,39 +325,59 @@ class SpikeQueue(object):
             if stop <= sources[-1]:
                 stop_idx = bisect.bisect_left(sources, stop, lo=start_idx)
             else:
-                stop_idx = len(self._neurons_to_synapses)
+                stop_idx = len(sources)
             sources = sources[start_idx:stop_idx]
             if len(sources)==0:
                 return
-            synapse_indices = self._neurons_to_synapses
-            indices = np.concatenate([synapse_indices[source - start]
-                                      for source in sources]).astype(np.int32)
+            positions = self._gather_positions(sources - start)
+            indices = self._source_synapses[positions]
             if self._homogeneous:  # homogeneous delays
                 self._insert_homogeneous(self._delays[0], indices)
-            elif self._offsets is None:  # vectorise over synaptic events
-                # there are no precomputed offsets, this is the case
-                # (in particular) when there are dynamic delays
+            elif self._offsets is None or len(sources) > 1:
+                # vectorise over synaptic events. This is necessary if there
+                # are no precomputed offsets, (in particular) when there are
+                # dynamic delays, but also if more than one neuron spiked:
+                # the precomputed offsets are only unique within the synapses
+                # of a single neuron.
                 self._insert(self._delays[indices], indices)
             else: # offsets are precomputed
-                self._insert(self._delays[indices], indices, self._offsets[indices])
-                # Note: the trick can only work if offsets are ordered in the right way
+                self._insert(self._delays[indices], indices,
+                             self._offsets[positions])
+
+    def _gather_positions(self, sources):
+        '''
+        Return the positions (in the CSR connectivity arrays) of all synapses
+        of the given neurons, without looping over the neurons in Python.
+
+        Parameters
+        ----------
+        sources : ndarray of int
+            The indices of the neurons (relative to the start of the source
+            group).
+
+        Returns
+        -------
+        positions : ndarray of int
+            The positions of the synapses in `_source_synapses`, ordered by
+            source neuron (in the order given by `sources`) and by synapse
+            index within each neuron.
+        '''
+        starts = self._source_indptr[sources]
+        counts = self._source_indptr[sources + 1] - starts
+        return _concatenated_ranges(starts, counts)
 
-    def _do_precompute_offsets(self, n_synapses):
+    def _do_precompute_offsets(self):
         '''
         Precompute all offsets corresponding to delays. This assumes that
-        delays will not change during the simulation.
+        delays will not change during the simulation and that they are not
+        homogeneous (i.e. that there is one delay per synapse).
         '''
-        if len(self._delays) == 1 and n_synapses != 1:
-            # We have a scalar delay value
-            delays = self._delays.repeat(n_synapses)
-        else:
-            delays = self._delays
-        self._offsets = np.zeros_like(delays)
-        index = 0
-        for targets in self._neurons_to_synapses:
-            target_delays = delays[targets]
-            self._offsets[index:index+len(target_delays)] = self._calc_offsets(target_delays)
-            index += len(target_delays)
+        # The offsets are stored in the order of the CSR connectivity arrays
+        self._offsets = np.zeros_like(self._delays)
+        indptr = self._source_indptr
+        for start, end in zip(indptr[:-1], indptr[1:]):
+            target_delays = self._delays[self._source_synapses[start:end]]
+            self._offsets[start:end] = self._calc_offsets(target_delays)
 
     def _calc_offsets(self, delay):
         '''
@@ -294,8 +396,8 @@ class SpikeQueue(object):
         xs = delay[I]
         J = xs[1:]!=xs[:-1]
         A = np.hstack((0, np.cumsum(J)))
-        B = np.hstack((0, np.cumsum(-J)))
-        BJ = np.hstack((0, B[J]))
+        B = np.hstack((0, np.cumsum(~J)))
+        BJ = np.hstack((0, B[:-1][J]))
         ei = B-BJ[A]
         ofs = np.zeros_like(delay)
         ofs[I] = np.array(ei, dtype=ofs.dtype) # maybe types should be signed?
@@ -376,3 +478,150 @@ class SpikeQueue(object):
 
         self.X = newX
         self.X_flat = self.X.reshape(self.X.shape[0]*new_maxevents,)
+
+
+class CompactSpikeQueue(SpikeQueue):
+    '''
+    A `SpikeQueue` storing the synaptic events in a compact memory pool.
+
+    The standard `SpikeQueue` uses a dense 2D array with a fixed number of
+    columns for each time step, which wastes a lot of memory for heterogeneous
+    delays with many time steps and bursty input. This queue instead stores the
+    events of all time steps in a single, shared array (the "pool"). Each time
+    step owns a contiguous region of the pool, described by its start position
+    and its capacity. If a region overflows, it is moved to the end of the pool
+    with a doubled capacity, and the pool is compacted when it is full.
+    The memory use is therefore proportional to the number of events that are
+    actually in flight. The queue can be selected with the
+    `devices.runtime.spike_queue` preference.
+
+    Parameters
+    ----------
+    source_start : int
+        The start of the source indices (for subgroups)
+    source_end : int
+        The end of the source indices (for subgroups)
+    dtype : `dtype`, optional
+        The dtype used for the synaptic indices.
+    precompute_offsets : bool, optional
+        Whether to precompute the offsets, see `SpikeQueue`.
+    '''
+    def __init__(self, source_start, source_end, dtype=np.int32,
+                 precompute_offsets=True):
+        super(CompactSpikeQueue, self).__init__(source_start, source_end,
+                                                dtype=dtype,
+                                                precompute_offsets=precompute_offsets)
+        # We do not use the dense data structure
+        self.X = self.X_flat = None
+        #: The memory pool storing the events of all time steps
+        self._pool = np.zeros(0, dtype=dtype)
+        #: The end of the used part of the pool
+        self._pool_end = 0
+        #: The start of the region of each time step in the pool
+        self._slot_start = np.zeros(1, dtype=int)
+        #: The capacity of the region of each time step in the pool
+        self._slot_capacity = np.zeros(1, dtype=int)
+
+    def _prepare_storage(self, n_steps, max_events):
+        if n_steps > len(self.n):
+            self.n = np.zeros(n_steps, dtype=int)
+            self._slot_start = np.zeros(n_steps, dtype=int)
+            self._slot_capacity = np.zeros(n_steps, dtype=int)
+            self._pool_end = 0
+
+    def _extract_spikes(self):
+        n_steps = len(self.n)
+        targets = self._pool[_concatenated_ranges(self._slot_start, self.n)]
+        times = np.repeat((np.arange(n_steps) - self.currenttime) % n_steps,
+                          self.n)
+        spikes = np.zeros((len(targets), 2))
+        spikes[:, 0] = times
+        spikes[:, 1] = targets
+        return spikes
+
+    def _store_spikes(self, spikes):
+        # Clear all spikes
+        self.n[:] = 0
+        if len(spikes):
+            self._insert(spikes[:, 0], spikes[:, 1].astype(self.dtype))
+
+    def peek(self):
+        start = self._slot_start[self.currenttime]
+        return self._pool[start:start+self.n[self.currenttime]]
+
+    def _insert(self, delay, target, offset=None):
+        delay = np.array(delay, dtype=int)
+
+        if offset is None:
+            offset = self._calc_offsets(delay)
+
+        timesteps = (self.currenttime + delay) % len(self.n)
+        # The new number of events in each time step (using the same trick as
+        # in `SpikeQueue._insert`)
+        new_n = self.n.copy()
+        new_n[timesteps] += offset + 1
+        self._reserve(new_n)
+
+        self._pool[self._slot_start[timesteps] + self.n[timesteps] + offset] = target
+        self.n = new_n
+
+    def _insert_homogeneous(self, delay, target):
+        timestep = (self.currenttime + delay) % len(self.n)
+        nevents = len(target)
+        new_n = self.n.copy()
+        new_n[timestep] += nevents
+        self._reserve(new_n)
+
+        k = self._slot_start[timestep] + self.n[timestep]
+        self._pool[k:k+nevents] = target
+        self.n = new_n
+
+    def _reserve(self, new_n):
+        '''
+        Make sure that the region of each time step in the pool can store the
+        given number of events. Regions that are too small are moved to the end
+        of the pool with a capacity rounded up to the next power of 2. If there
+        is not enough space left in the pool, the pool is compacted instead.
+
+        Parameters
+        ----------
+        new_n : ndarray of int
+            The number of events that have to fit into each time step.
+        '''
+        overflow = np.flatnonzero(new_n > self._slot_capacity)
+        if len(overflow) == 0:
+            return
+        new_capacity = (2**np.ceil(np.log2(new_n[overflow]))).astype(int)
+        if self._pool_end + np.sum(new_capacity) > len(self._pool):
+            self._compact(new_n)
+            return
+        for slot, capacity in zip(overflow, new_capacity):
+            old_start = self._slot_start[slot]
+            n = self.n[slot]
+            new_start = self._pool_end
+            self._pool[new_start:new_start+n] = self._pool[old_start:old_start+n]
+            self._slot_start[slot] = new_start
+            self._slot_capacity[slot] = capacity
+            self._pool_end += capacity
+
+    def _compact(self, new_n):
+        '''
+        Copy all stored events into a new pool, where the region of each time
+        step has exactly the size given in `new_n`. The new pool is allocated
+        with twice the necessary size, to amortize the cost of future
+        compactions.
+
+        Parameters
+        ----------
+        new_n : ndarray of int
+            The number of events that have to fit into each time step.
+        '''
+        needed = np.sum(new_n)
+        new_pool = np.zeros(2*needed, dtype=self.dtype)
+        new_start = np.cumsum(new_n) - new_n
+        new_pool[_concatenated_ranges(new_start, self.n)] = \
+            self._pool[_concatenated_ranges(self._slot_start, self.n)]
+        self._pool = new_pool
+        self._slot_start = new_start
+        self._slot_capacity = new_n.copy()
+        self._pool_end = needed
@@ -55,12 +55,9 @@ class StateUpdater(CodeRunner):
     
     def update_abstract_code(self, run_namespace=None, level=0):
         
-        self.method = StateUpdateMethod.determine_stateupdater(self.group.equations,
-                                                               self.group.variables,
-                                                               self.method_choice)
-        
-        self.abstract_code = self.method(self.group.equations,
-                                         self.group.variables)
+        self.method, self.abstract_code = StateUpdateMethod.apply_stateupdater(self.group.equations,
+                                                                               self.group.variables,
+                                                                               self.method_choice)
 
 
 class SummedVariableUpdater(CodeRunner):
@@ -259,7 +256,8 @@ class SynapticPathway(CodeRunner, Group):
         # Update the dt (might have changed between runs)
 
         self.queue.prepare(self._delays.get_value(), self.source.clock.dt_,
-                           self.synapse_sources.get_value())
+                           self.synapse_sources.get_value(),
+                           delays_version=self._delays.version)
 
         if len({self.source.clock.dt_, self.synapses.clock.dt_,
                 self.target.clock.dt_}) > 1:
@@ -1164,6 +1162,16 @@ class Synapses(Group):
             variables.add_auxiliary_variable('_n', unit=Unit(1), dtype=np.int32)
             variables.add_auxiliary_variable('_p', unit=Unit(1))
 
+            # For a constant connection probability, the templates do not have
+            # to draw a random number for every (i, j) pair but can directly
+            # draw the pairs passing the probability test (skipping ahead
+            # over the others), the condition is then only evaluated for them
+            skip_ahead = not isinstance(p, basestring) and 0 < p < 1
+            needed_variables = []
+            if skip_ahead:
+                variables.add_constant('_skip_ahead_p', Unit(1), value=float(p))
+                needed_variables.append('_skip_ahead_p')
+
             if '_sub_idx' in self.source.variables:
                 variables.add_reference('_all_pre', self.source, '_sub_idx')
             else:
@@ -1187,6 +1195,8 @@ class Synapses(Group):
                                             'synapses_create',
                                             variable_indices=variable_indices,
                                             additional_variables=variables,
+                                            needed_variables=needed_variables,
+                                            template_kwds={'skip_ahead': skip_ahead},
                                             check_units=False,
                                             run_namespace=namespace,
                                             level=level+1)
@@ -10,7 +10,8 @@ from brian2.codegen.translation import (analyse_identifiers,
                                         apply_loop_invariant_optimisations
                                         )
 from brian2.codegen.statements import Statement
-from brian2.codegen.codeobject import CodeObject
+from brian2.codegen.codeobject import (CodeObject, deferred_compilation,
+                                       compile_code_object)
 from brian2.core.variables import Subexpression, Variable, Constant
 from brian2.core.functions import Function, DEFAULT_FUNCTIONS
 from brian2.devices.device import auto_target
@@ -18,6 +19,9 @@ from brian2.units.fundamentalunits import Unit
 from brian2.units import second, ms
 
 FakeGroup = namedtuple('FakeGroup', ['variables'])
+FakeCode = namedtuple('FakeCode', ['main', 'support_code'])
+FakeWeave = namedtuple('FakeWeave', ['inline'])
+FakeInlineTools = namedtuple('FakeInlineTools', ['function_cache'])
 
 @attr('codegen-independent')
 def test_auto_target():
@@ -120,10 +124,226 @@ def test_apply_loop_invariant_optimisation_integer():
     # The optimisation should not pull out 2*N
     assert len(scalar) == 0
 
+
+@attr('codegen-independent')
+def test_deferred_compilation():
+    compiled = []
+    compiled_together = []
+
+    class ImmediateCodeObject(CodeObject):
+        def compile(self):
+            compiled.append(self.name)
+
+    class DeferredCodeObject(ImmediateCodeObject):
+        supports_deferred_compilation = True
+
+        @classmethod
+        def compile_all(cls, code_objects):
+            compiled_together.append(sorted(c.name for c in code_objects))
+
+    def create(codeobj_class, name):
+        codeobj = codeobj_class(None, '', {}, {}, 'template', '', name=name)
+        compile_code_object(codeobj)
+        return codeobj
+
+    with deferred_compilation():
+        objects = [create(DeferredCodeObject, 'deferred_1'),
+                   create(ImmediateCodeObject, 'immediate'),
+                   create(DeferredCodeObject, 'deferred_2')]
+        # Only the code object that does not support deferred compilation
+        # has been compiled so far
+        assert compiled == ['immediate']
+        assert compiled_together == []
+    assert compiled_together == [['deferred_1', 'deferred_2']]
+
+    # Without deferred compilation, code objects are compiled directly
+    objects.append(create(DeferredCodeObject, 'deferred_3'))
+    assert compiled == ['immediate', 'deferred_3']
+    assert compiled_together == [['deferred_1', 'deferred_2']]
+
+    # Nothing is compiled if an error occurs
+    try:
+        with deferred_compilation():
+            objects.append(create(DeferredCodeObject, 'deferred_4'))
+            raise ValueError()
+    except ValueError:
+        pass
+    assert compiled_together == [['deferred_1', 'deferred_2']]
+
+
+@attr('codegen-independent')
+def test_cython_namespace_binding():
+    from brian2 import NeuronGroup, SpikeMonitor
+    from brian2.codegen.generators.cython_generator import CythonCodeGenerator
+    from brian2.codegen.runtime.cython_rt import CythonCodeObject
+    from brian2.devices.device import get_device
+    G = NeuronGroup(5, 'v : 1', threshold='v>1')
+    mon = SpikeMonitor(G)
+    variables = {'v': G.variables['v'],
+                 'N': G.variables['N'],
+                 't': mon.variables['t'],
+                 '_clock_t': mon.variables['_clock_t']}
+    generator = CythonCodeGenerator(variables, {}, G, False, CythonCodeObject,
+                                    'test', 'stateupdate')
+    keywords = generator.determine_keywords()
+    device = get_device()
+    v_name = device.get_array_name(G.variables['v'])
+    t_name = device.get_array_name(mon.variables['t'])
+    # Constant values and arrays of fixed size are only bound once...
+    assert "self.N = _namespace['N']" in keywords['bind_namespace']
+    assert "_namespace['%s']" % v_name in keywords['bind_namespace']
+    assert '= _state.%s' % v_name in keywords['load_namespace']
+    # ... the time and arrays that grow during a run are taken from the
+    # namespace in every call
+    assert "_namespace['_clock_t']" in keywords['load_namespace']
+    assert "_namespace['%s']" % t_name in keywords['load_namespace']
+    assert "_namespace['%s']" % t_name not in keywords['bind_namespace']
+
+
+@attr('codegen-independent')
+def test_code_cache():
+    import gc
+    import tempfile
+    import shutil
+    from brian2 import (NeuronGroup, Network, prefs, defaultclock,
+                        StateUpdateMethod)
+    from brian2.utils.caching import get_disk_cache
+
+    def run_model():
+        # Simulate a new process, where only the persistent cache is available
+        StateUpdateMethod.derivation_cache.clear()
+        G = NeuronGroup(3, 'dv/dt = (2 - v)/(10*ms) : 1', threshold='v>1',
+                        reset='v=0', method='euler', name='cached_group')
+        G.v = [0, 0.5, 1.5]
+        net = Network(G)
+        net.run(5*defaultclock.dt)
+        v = G.v[:]
+        del net, G
+        gc.collect()  # make the name available again
+        return v
+
+    old_directory = prefs.codegen.cache_directory
+    directory = tempfile.mkdtemp()
+    try:
+        prefs.codegen.cache_directory = directory
+        codeobj_cache = get_disk_cache('code_objects')
+        stateupdater_cache = get_disk_cache('stateupdaters')
+        v1 = run_model()
+        assert codeobj_cache.hits == 0 and codeobj_cache.misses > 0
+        assert stateupdater_cache.hits == 0
+        assert stateupdater_cache.misses == 1
+        misses = codeobj_cache.misses
+        v2 = run_model()
+        assert codeobj_cache.hits == misses
+        assert codeobj_cache.misses == misses
+        assert stateupdater_cache.hits == 1
+        assert np.all(v1 == v2)
+    finally:
+        prefs.codegen.cache_directory = old_directory
+        shutil.rmtree(directory)
+
+
+@attr('codegen-independent')
+def test_weave_direct_call():
+    # weave.inline and its cache of compiled functions are replaced by fake
+    # versions, so this does not need a working weave installation
+    from brian2.codegen.runtime.weave_rt import weave_rt
+    calls = []
+    function_cache = {}
+
+    def fake_inline(code, arg_names, local_dict, global_dict, **kwds):
+        calls.append('inline')
+        assert set(arg_names) == set(local_dict.keys())
+        # A compiled function only accepts the argument types it has been
+        # compiled for (as the functions generated by weave)
+        compiled_type = type(local_dict['x'])
+        def compiled_function(local_dict, global_dict):
+            calls.append('compiled')
+            assert global_dict is weave_rt.__dict__
+            if local_dict['x'] is None:
+                raise TypeError('unsupported operand')
+            if type(local_dict['x']) is not compiled_type:
+                raise TypeError('Conversion Error: received wrong type')
+            return local_dict['x']
+        if code != 'uncached':
+            function_cache[code] = compiled_function
+        return compiled_function(local_dict, global_dict)
+
+    def create_codeobj(code, has_main_code=True):
+        codeobj = weave_rt.WeaveCodeObject.__new__(weave_rt.WeaveCodeObject)
+        codeobj._done_first_run = False
+        codeobj.compiled_function = None
+        codeobj.namespace = {'x': 1}
+        codeobj.compiled_function_args = (codeobj.namespace,
+                                          weave_rt.__dict__)
+        codeobj.code = FakeCode(main=code, support_code='')
+        codeobj.annotated_code = code
+        codeobj.compiler = 'gcc'
+        codeobj.extra_compile_args = []
+        codeobj.include_dirs = []
+        codeobj.has_main_code = has_main_code
+        codeobj.compiled_python_pre = None
+        codeobj.python_code_namespace = {'post_calls': []}
+        codeobj.compiled_python_post = compile('post_calls.append(True)',
+                                               '(string)', 'exec')
+        return codeobj
+
+    old_weave, old_inline_tools = weave_rt.weave, weave_rt.inline_tools
+    weave_rt.weave = FakeWeave(inline=fake_inline)
+    weave_rt.inline_tools = FakeInlineTools(function_cache=function_cache)
+    try:
+        codeobj = create_codeobj('code')
+        # The first run goes through weave.inline
+        assert codeobj.run() == 1
+        assert calls == ['inline', 'compiled']
+        # Later runs call the compiled function with the updated namespace
+        del calls[:]
+        codeobj.namespace['x'] = 2
+        assert codeobj.run() == 2
+        assert codeobj.run() == 2
+        assert calls == ['compiled', 'compiled']
+        # A changed argument type falls back to weave.inline (which compiles
+        # a new function)...
+        del calls[:]
+        codeobj.namespace['x'] = 3.0
+        assert codeobj.run() == 3.0
+        assert calls == ['compiled', 'inline', 'compiled']
+        # ... which is then called directly
+        del calls[:]
+        assert codeobj.run() == 3.0
+        assert calls == ['compiled']
+        # Other errors are not handled
+        codeobj.namespace['x'] = None
+        assert_raises(TypeError, codeobj.run)
+        # The Python code after the compiled code is executed once per
+        # successful run
+        assert len(codeobj.python_code_namespace['post_calls']) == 5
+
+        # Without a cached function, weave.inline is used for every run
+        del calls[:]
+        codeobj = create_codeobj('uncached')
+        assert codeobj.run() == 1
+        assert codeobj.run() == 1
+        assert calls == ['inline', 'compiled', 'inline', 'compiled']
+
+        # Templates without main code only execute their Python code
+        del calls[:]
+        codeobj = create_codeobj('', has_main_code=False)
+        assert codeobj.run() is None
+        assert calls == []
+        assert len(codeobj.python_code_namespace['post_calls']) == 1
+    finally:
+        weave_rt.weave, weave_rt.inline_tools = old_weave, old_inline_tools
+
+
 if __name__ == '__main__':
     test_auto_target()
     test_analyse_identifiers()
     test_get_identifiers_recursively()
     test_nested_subexpressions()
     test_apply_loop_invariant_optimisation()
-    test_apply_loop_invariant_optimisation_integer()
\ No newline at end of file
+    test_apply_loop_invariant_optimisation_integer()
+    test_deferred_compilation()
+    test_cython_namespace_binding()
+    test_code_cache()
+    test_weave_direct_call()
\ No newline at end of file
@@ -1,13 +1,15 @@
 import tempfile
 import os
+import gc
 
 from nose import with_setup
 from nose.plugins.attrib import attr
 import numpy
-from numpy.testing.utils import assert_allclose, assert_equal
+from numpy.testing.utils import assert_allclose, assert_equal, assert_raises
 
 from brian2 import *
 from brian2.devices.cpp_standalone import cpp_standalone_device
+from brian2.devices.cpp_standalone.device import CPPWriter, ObjectCache
 from brian2.devices.device import restore_device
 
 @attr('cpp_standalone', 'standalone-only')
@@ -243,6 +245,221 @@ def test_timedarray(with_output=True):
 
     set_device(previous_device)
 
+@attr('cpp_standalone', 'standalone-only')
+@with_setup(teardown=restore_device)
+def test_spike_stream(with_output=False):
+    previous_device = get_device()
+    set_device('cpp_standalone')
+    prefs.devices.cpp_standalone.spike_stream_chunk_size = 7
+    try:
+        G = NeuronGroup(10, '''dv/dt = rate : 1
+                               rate : Hz''', threshold='v>1', reset='v=0')
+        G.rate = '(i + 1)*100*Hz'
+        mon = SpikeMonitor(G)
+        run(100*ms)
+        tempdir = tempfile.mkdtemp()
+        if with_output:
+            print tempdir
+        device.build(directory=tempdir, compile=True, run=True,
+                     with_output=with_output)
+    finally:
+        prefs.devices.cpp_standalone.spike_stream_chunk_size = 0
+    # The number of spikes is not a multiple of the chunk size
+    assert len(mon.i) % 7 != 0
+    assert len(mon.t) == len(mon.i) == sum(mon.count)
+    assert_equal(mon.count, np.bincount(mon.i, minlength=10))
+    assert all(np.diff(mon.t) >= 0*ms)
+    for idx in xrange(10):
+        assert_equal(len(mon.spike_train(idx)), mon.count[idx])
+
+    set_device(previous_device)
+
+@attr('cpp_standalone', 'standalone-only')
+@with_setup(teardown=restore_device)
+def test_memory_mapped_results(with_output=False):
+    previous_device = get_device()
+    set_device('cpp_standalone')
+    G = NeuronGroup(3, 'v : 1', threshold='False')
+    G.v = 'i'
+    state_mon = StateMonitor(G, 'v', record=[0, 2])
+    spike_mon = SpikeMonitor(G)
+    run(1*ms)
+    tempdir = tempfile.mkdtemp()
+    if with_output:
+        print tempdir
+    device.build(directory=tempdir, compile=True, run=True,
+                 with_output=with_output)
+    # Results are mapped into memory with the correct shape
+    values = state_mon.variables['_recorded_v'].get_value()
+    assert isinstance(values, numpy.memmap)
+    assert values.shape == (10, 2)
+    assert isinstance(state_mon.variables['t'].get_value(), numpy.memmap)
+    assert_equal(state_mon.v, [np.zeros(10), 2*np.ones(10)])
+    assert_equal(G.v[:], [0, 1, 2])
+    # Empty files cannot be mapped
+    assert len(spike_mon.i) == len(spike_mon.t) == 0
+
+    set_device(previous_device)
+
+@attr('codegen-independent')
+def test_writer_unchanged_files():
+    tempdir = tempfile.mkdtemp()
+    writer = CPPWriter(tempdir)
+    writer.write('test.cpp', 'int x = 1;')
+    writer.write('test2.cpp', 'int y = 1;')
+    writer.save_hashes()
+    fname = os.path.join(tempdir, 'test.cpp')
+    # Set the modification time into the past to detect rewrites
+    os.utime(fname, (0, 0))
+    writer = CPPWriter(tempdir)
+    writer.write('test.cpp', 'int x = 1;')
+    assert os.stat(fname).st_mtime == 0
+    writer.write('test.cpp', 'int x = 2;')
+    assert os.stat(fname).st_mtime > 0
+    # A file that was changed since it was written is compared by content
+    with open(os.path.join(tempdir, 'test2.cpp'), 'w') as f:
+        f.write('int y = 2;')
+    writer.write('test2.cpp', 'int y = 1;')
+    with open(os.path.join(tempdir, 'test2.cpp')) as f:
+        assert f.read() == 'int y = 1;'
+    assert writer.source_files == ['test.cpp', 'test.cpp', 'test2.cpp']
+
+@attr('cpp_standalone', 'standalone-only')
+@with_setup(teardown=restore_device)
+def test_object_cache(with_output=False):
+    previous_device = get_device()
+    cache_dir = tempfile.mkdtemp()
+    old_cache_dir = prefs.devices.cpp_standalone.object_cache_directory
+    prefs.devices.cpp_standalone.object_cache_directory = cache_dir
+
+    def build_and_run():
+        set_device('cpp_standalone')
+        device.reinit()
+        # Use fixed names, so that the generated code is identical
+        G = NeuronGroup(10, 'dv/dt = (2 - v)/(10*ms) : 1',
+                        threshold='v>1', reset='v=0', name='cached_group')
+        mon = SpikeMonitor(G, name='cached_monitor')
+        run(10*ms)
+        tempdir = tempfile.mkdtemp()
+        device.build(directory=tempdir, compile=True, run=True,
+                     with_output=with_output)
+        return tempdir, mon.count[:]
+
+    try:
+        results = []
+        for _ in range(2):
+            results.append(build_and_run())
+            device.reinit()
+            gc.collect()
+    finally:
+        prefs.devices.cpp_standalone.object_cache_directory = old_cache_dir
+    # The second build reused all object files of the first build
+    object_files = [fname for fname in os.listdir(cache_dir)
+                    if fname.endswith('.o')]
+    local_files = [fname for root, _, fnames in os.walk(results[1][0])
+                   for fname in fnames if fname.endswith('.o')]
+    assert len(object_files) == len(local_files) > 0
+    code_objects = os.path.join(results[1][0], 'code_objects')
+    for fname in os.listdir(code_objects):
+        if fname.endswith('.o'):
+            first = os.path.join(results[0][0], 'code_objects', fname)
+            second = os.path.join(code_objects, fname)
+            assert open(first, 'rb').read() == open(second, 'rb').read()
+    assert_equal(results[0][1], results[1][1])
+
+    set_device(previous_device)
+
+@attr('codegen-independent')
+def test_object_cache_max_size():
+    project_dir = tempfile.mkdtemp()
+    cache_dir = tempfile.mkdtemp()
+    for name in ['a', 'b', 'c']:
+        with open(os.path.join(project_dir, name + '.cpp'), 'w') as f:
+            f.write('int %s = 1;' % name)
+        for ext in ['.o', '.d']:
+            with open(os.path.join(project_dir, name + ext), 'wb') as f:
+                f.write(b'x' * 100)
+    cache = ObjectCache(cache_dir, project_dir, ['a.cpp', 'b.cpp', 'c.cpp'],
+                        [], 'g++ -O3', max_size=450)
+    cache.store()
+    cached_files = os.listdir(cache_dir)
+    # Only the files of two sources fit into the cache
+    assert len(cached_files) == 4
+
+@attr('cpp_standalone', 'standalone-only')
+@with_setup(teardown=restore_device)
+def test_runtime_parameters(with_output=False):
+    previous_device = get_device()
+    set_device('cpp_standalone')
+    tau = 10*ms
+    v_max = 2
+    device.declare_parameters('tau', 'v_max')
+    G = NeuronGroup(3, 'dv/dt = (v_max - v)/tau : 1')
+    G.v = [0, 0.5, 1]
+    mon = StateMonitor(G, 'v', record=True, when='start')
+    run(5*ms)
+    tempdir = tempfile.mkdtemp()
+    if with_output:
+        print tempdir
+    device.build(directory=tempdir, compile=True, run=True,
+                 with_output=with_output)
+
+    def expected(tau, v_max, v_init):
+        decay = np.exp(-np.asarray(mon.t_)/float(tau))
+        return v_max + (np.asarray(v_init)[:, None] - v_max)*decay[None, :]
+
+    assert_allclose(mon.v, expected(tau, v_max, [0, 0.5, 1]), rtol=1e-3)
+    # Run the same binary again with different values
+    device.run(with_output=with_output,
+               parameters={'tau': 20*ms, 'v_max': 3,
+                           G.name + '.v': [1, 1, 1]})
+    assert_allclose(mon.v, expected(20*ms, 3, [1, 1, 1]), rtol=1e-3)
+    # Values that are not specified keep their default value
+    device.run(with_output=with_output, parameters={'v_max': 1})
+    assert_allclose(mon.v, expected(tau, 1, [0, 0.5, 1]), rtol=1e-3)
+    assert_raises(DimensionMismatchError,
+                  lambda: device.run(parameters={'tau': 20}))
+    assert_raises(ValueError,
+                  lambda: device.run(parameters={G.name + '.v': [0, 1]}))
+    assert_raises(KeyError,
+                  lambda: device.run(parameters={'unknown': 1}))
+
+    set_device(previous_device)
+
+@attr('cpp_standalone', 'standalone-only')
+@with_setup(teardown=restore_device)
+def test_run_batch(with_output=False):
+    previous_device = get_device()
+    set_device('cpp_standalone')
+    rate = 200*Hz
+    device.declare_parameters('rate')
+    G = NeuronGroup(10, 'v : 1', threshold='rand() < rate*dt')
+    mon = SpikeMonitor(G)
+    run(100*ms)
+    tempdir = tempfile.mkdtemp()
+    if with_output:
+        print tempdir
+    device.build(directory=tempdir, compile=True, run=False,
+                 with_output=with_output)
+    runs = device.run_batch(parameters=[{}, {}, {}, {'rate': 0*Hz}],
+                            seeds=[1, 1, 2, 1], processes=2,
+                            with_output=with_output)
+    assert len(set(r.directory for r in runs)) == 4
+    spikes = []
+    for batch_run in runs:
+        with batch_run:
+            spikes.append((mon.i[:], mon.t[:]))
+            trains = mon.spike_trains()
+            assert_equal(mon.count, [len(trains[idx]) for idx in xrange(10)])
+    # The same seed leads to the same results
+    assert_equal(spikes[0][0], spikes[1][0])
+    assert_equal(spikes[0][1], spikes[1][1])
+    assert len(spikes[0][0]) != len(spikes[2][0]) or any(spikes[0][0] != spikes[2][0])
+    assert len(spikes[3][0]) == 0
+    assert_equal(runs[0].get_value(mon.variables['i']), spikes[0][0])
+
+    set_device(previous_device)
+
 
 if __name__=='__main__':
     # Print the debug output when testing this file only but not when running
@@ -252,7 +469,12 @@ if __name__=='__main__':
              test_multiple_connects,
              test_storing_loading,
              test_openmp_consistency,
-             test_timedarray
+             test_timedarray,
+             test_spike_stream,
+             test_memory_mapped_results,
+             test_object_cache,
+             test_runtime_parameters,
+             test_run_batch
              ]:
         t(with_output=True)
         restore_device()
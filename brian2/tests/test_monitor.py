@@ -1,3 +1,7 @@
+import os
+import shutil
+import tempfile
+
 from numpy.testing.utils import assert_allclose, assert_array_equal, assert_raises
 from nose import with_setup
 from nose.plugins.attrib import attr
@@ -34,6 +38,49 @@ def test_spike_monitor():
     assert_array_equal(t_, mon.t_)
 
 
+@with_setup(teardown=restore_device)
+def test_spike_monitor_spike_trains():
+    G = NeuronGroup(10, 'rate : Hz', threshold='rand() < rate*dt')
+    G.rate = 'i*100*Hz'
+    mon = SpikeMonitor(G)
+    mon_sub = SpikeMonitor(G[3:7])
+    net = Network(G, mon, mon_sub)
+
+    def check_spike_trains():
+        i, t = mon.it
+        trains = mon.spike_trains()
+        assert sorted(trains.keys()) == range(10)
+        for idx in xrange(10):
+            assert_array_equal(trains[idx], t[i == idx])
+            assert_array_equal(mon.spike_train(idx), t[i == idx])
+        for idx in xrange(4):
+            assert_array_equal(mon_sub.spike_train(idx), t[i == idx + 3])
+
+    net.run(10*ms)
+    check_spike_trains()
+    net.store()
+    # The index is extended with the spikes of the following runs
+    net.run(10*ms)
+    check_spike_trains()
+    net.run(10*ms)
+    check_spike_trains()
+    # and rebuilt after restoring a previous state
+    net.restore()
+    check_spike_trains()
+    net.run(20*ms)
+    check_spike_trains()
+    assert len(mon.spike_train(0)) == 0
+    assert_raises(IndexError, lambda: mon.spike_train(10))
+    assert_raises(IndexError, lambda: mon_sub.spike_train(4))
+    # The spike trains can also be accessed during a run
+    @network_operation(dt=1*ms)
+    def check_during_run():
+        check_spike_trains()
+    net.add(check_during_run)
+    net.run(10*ms)
+    check_spike_trains()
+
+
 def test_synapses_state_monitor():
     G = NeuronGroup(2, '')
     S = Synapses(G, G, 'w: siemens')
@@ -151,6 +198,83 @@ def test_state_monitor_indexing():
     assert_raises(TypeError, lambda: mon[5.0])
     assert_raises(TypeError, lambda: mon[[5.0, 6.0]])
 
+
+@attr('standalone-compatible')
+@with_setup(teardown=restore_device)
+def test_state_monitor_reductions():
+    G = NeuronGroup(5, '''dv/dt = (sin(2*pi*i*t/ms) - v) / (2*ms) : 1
+                          n : integer''')
+    G.n = 'i'
+    full = StateMonitor(G, ['v', 'n'], record=True)
+    decimated = StateMonitor(G, 'v', record=[1, 3], every=3)
+    aggregated = StateMonitor(G, ['v', 'n'], record=[1, 3], every=4,
+                              reduction=['mean', 'min', 'max'])
+    population = StateMonitor(G, 'v', record=True, population=True)
+    population_max = StateMonitor(G, 'v', record=True, population=True,
+                                  every=2, reduction='max')
+    net = Network(G, full, decimated, aggregated, population, population_max)
+    # The second run continues the blocks that started in the first run
+    net.run(1.5*ms)
+    net.run(0.6*ms)
+
+    n_steps = len(full.t)
+    assert_allclose(decimated.t, full.t[::3])
+    assert_allclose(decimated.v, full.v[[1, 3]][:, ::3])
+
+    n_blocks = n_steps // 4
+    v = full.v[[1, 3]][:, :n_blocks*4].reshape(2, n_blocks, 4)
+    assert_allclose(aggregated.t, full.t[:n_blocks*4:4])
+    assert_allclose(aggregated.v_mean, v.mean(axis=2))
+    assert_allclose(aggregated.v_min, v.min(axis=2))
+    assert_allclose(aggregated.v_max, v.max(axis=2))
+    assert_array_equal(aggregated.n_max, [[1]*n_blocks, [3]*n_blocks])
+    assert_allclose(aggregated.n_mean, [[1]*n_blocks, [3]*n_blocks])
+
+    assert_allclose(population.v, [full.v.mean(axis=0)])
+    n_blocks = n_steps // 2
+    population_v = full.v.mean(axis=0)[:n_blocks*2].reshape(n_blocks, 2)
+    assert_allclose(population_max.v_max, [population_v.max(axis=1)])
+
+
+@attr('codegen-independent')
+def test_state_monitor_reductions_incorrect():
+    G = NeuronGroup(5, 'v : 1')
+    assert_raises(ValueError, lambda: StateMonitor(G, 'v', record=True,
+                                                   reduction='median'))
+    assert_raises(ValueError, lambda: StateMonitor(G, 'v', record=True,
+                                                   every=0))
+    mon = StateMonitor(G, 'v', record=True, population=True)
+    assert_raises(IndexError, lambda: mon[0])
+
+
+@with_setup(teardown=restore_device)
+def test_state_monitor_file_storage():
+    directory = tempfile.mkdtemp()
+    try:
+        G = NeuronGroup(10, 'dv/dt = -v / (10*ms) : volt')
+        G.v = np.arange(10) * volt
+        mon = StateMonitor(G, 'v', record=True)
+        file_mon = StateMonitor(G, 'v', record=[5, 6, 7],
+                                storage='mmap:' + directory, name='file_mon')
+        net = Network(G, mon, file_mon)
+        net.run(1*ms)
+        net.run(1*ms)
+
+        assert_array_equal(file_mon.t, mon.t)
+        assert_array_equal(file_mon.v, mon.v[[5, 6, 7]])
+        assert_array_equal(file_mon.v_, mon.v_[[5, 6, 7]])
+        assert_array_equal(file_mon[6].v, mon[6].v)
+        # The files can be loaded directly
+        assert_array_equal(np.load(os.path.join(directory, 'file_mon_t.npy')),
+                           mon.t_)
+        assert_array_equal(np.load(os.path.join(directory, 'file_mon_v.npy'),
+                                   mmap_mode='r').T,
+                           mon.v_[[5, 6, 7]])
+        assert_raises(ValueError, lambda: StateMonitor(G, 'v', record=True,
+                                                       storage='disk'))
+    finally:
+        shutil.rmtree(directory)
+
 @attr('standalone-compatible')
 @with_setup(teardown=restore_device)
 def test_rate_monitor():
@@ -194,9 +318,80 @@ def test_rate_monitor_subgroups():
     defaultclock.dt = old_dt
 
 
+@with_setup(teardown=restore_device)
+def test_monitor_preallocation():
+    G = NeuronGroup(5, 'v : 1', threshold='v>1')  # no reset
+    G.v = 1.1  # All neurons spike every time step
+    state_mon = StateMonitor(G, 'v', record=[0, 1])
+    rate_mon = PopulationRateMonitor(G)
+    spike_mon = SpikeMonitor(G)
+    sizes = []
+    @network_operation(when='start')
+    def record_sizes():
+        sizes.append((len(state_mon.variables['t'].get_value()),
+                      len(rate_mon.variables['t'].get_value())))
+    net = Network(G, state_mon, rate_mon, spike_mon, record_sizes)
+    net.run(10*defaultclock.dt)
+    # The arrays are allocated for the full run...
+    assert all(state_size >= 10 and rate_size >= 10
+               for state_size, rate_size in sizes)
+    # ...and trimmed afterwards
+    assert_allclose(state_mon.t, np.arange(10) * defaultclock.dt)
+    assert_allclose(rate_mon.t, np.arange(10) * defaultclock.dt)
+    assert_array_equal(state_mon.v, 1.1 * np.ones((2, 10)))
+    assert len(spike_mon.t) == len(spike_mon.i) == 50
+    assert_array_equal(spike_mon.i, np.tile(np.arange(5), 10))
+
+    # Stopping a run early only keeps the recorded values
+    @network_operation(when='end')
+    def stop_run():
+        if defaultclock.t >= 14*defaultclock.dt:
+            net.stop()
+    net.add(stop_run)
+    net.run(10*defaultclock.dt)
+    assert_allclose(state_mon.t, np.arange(15) * defaultclock.dt)
+    assert_allclose(rate_mon.t, np.arange(15) * defaultclock.dt)
+    assert_allclose(rate_mon.rate, np.ones(15) / defaultclock.dt)
+    assert_array_equal(state_mon.v, 1.1 * np.ones((2, 15)))
+    assert len(spike_mon.t) == len(spike_mon.i) == 75
+    assert_allclose(spike_mon.t, np.repeat(np.arange(15), 5) * defaultclock.dt)
+
+
+@with_setup(teardown=restore_device)
+def test_monitor_access_during_run():
+    G = NeuronGroup(5, 'v : 1', threshold='v>1')  # no reset
+    G.v = 1.1  # All neurons spike every time step
+    state_mon = StateMonitor(G, 'v', record=[0, 1])
+    rate_mon = PopulationRateMonitor(G)
+    spike_mon = SpikeMonitor(G)
+    sizes = []
+    @network_operation(when='start')
+    def record_sizes():
+        sizes.append((len(state_mon.t), state_mon.v.shape[1],
+                      len(rate_mon.rate), spike_mon.num_spikes,
+                      len(spike_mon.i)))
+        # Only the recorded values are visible
+        assert_allclose(state_mon.t, np.arange(len(sizes) - 1) * defaultclock.dt)
+    net = Network(G, state_mon, rate_mon, spike_mon, record_sizes)
+    net.run(10*defaultclock.dt)
+    assert sizes == [(step, step, step, 5*step, 5*step)
+                     for step in range(10)]
+    # Accessing the values does not disturb the recording
+    assert_allclose(state_mon.t, np.arange(10) * defaultclock.dt)
+    assert_array_equal(state_mon.v, 1.1 * np.ones((2, 10)))
+    assert_allclose(rate_mon.rate, np.ones(10) / defaultclock.dt)
+    assert_array_equal(spike_mon.i, np.tile(np.arange(5), 10))
+
+
 if __name__ == '__main__':
     test_spike_monitor()
+    test_spike_monitor_spike_trains()
     test_state_monitor()
     test_state_monitor_indexing()
+    test_state_monitor_reductions()
+    test_state_monitor_reductions_incorrect()
+    test_state_monitor_file_storage()
     test_rate_monitor()
     test_rate_monitor_subgroups()
+    test_monitor_preallocation()
+    test_monitor_access_during_run()
@@ -3,7 +3,7 @@ import copy
 import logging
 
 import numpy as np
-from numpy.testing import assert_equal, assert_raises
+from numpy.testing import assert_equal, assert_raises, assert_allclose
 from nose import with_setup
 from nose.plugins.attrib import attr
 
@@ -13,7 +13,7 @@ from brian2 import (Clock, Network, ms, second, BrianObject, defaultclock,
                     NeuronGroup, StateMonitor, SpikeMonitor,
                     PopulationRateMonitor, MagicNetwork, magic_network,
                     PoissonGroup, Hz, collect, store, restore, BrianLogger,
-                    start_scope)
+                    start_scope, Profiler, profiling_summary)
 from brian2.utils.logger import catch_logs
 
 @attr('codegen-independent')
@@ -206,6 +206,45 @@ def test_network_active_flag():
     assert_equal(y.count, 0)
 
 
+@attr('codegen-independent')
+@with_setup(teardown=restore_initial_state)
+def test_network_active_flag_during_run():
+    # changes of the active flag during a run have to be taken into account
+    NameLister.updates[:] = []
+    x = NameLister(name='x', dt=1*ms, order=0)
+    y = NameLister(name='y', dt=2*ms, order=1)
+    @network_operation(dt=1*ms, when='end')
+    def toggle(t):
+        if t == 3*ms:
+            y.active = False
+        elif t == 6*ms:
+            y.active = True
+            x.active = False
+    net = Network(x, y, toggle)
+    net.run(10*ms)
+    assert_equal(''.join(NameLister.updates), 'xyxxyxxxxy')
+    # Removing/adding objects between runs
+    NameLister.updates[:] = []
+    x.active = True
+    net.remove(y)
+    net.run(2*ms)
+    assert_equal(''.join(NameLister.updates), 'xx')
+    # Changes by an earlier object in the same time step take effect
+    # immediately
+    NameLister.updates[:] = []
+    z = NameLister(name='z', dt=1*ms, order=1)
+    z.active = False
+    @network_operation(dt=1*ms, when='start')
+    def toggle_early(t):
+        if t == 13*ms:
+            x.active = False
+            z.active = True
+    net.remove(toggle)
+    net.add(z, toggle_early)
+    net.run(3*ms)
+    assert_equal(''.join(NameLister.updates), 'xzz')
+
+
 @attr('codegen-independent')
 @with_setup(teardown=restore_initial_state)
 def test_network_t():
@@ -743,6 +782,8 @@ def test_profile():
     G.v = 1.1
     net = Network(G)
     net.run(1*ms, profile=True)
+    # Only the total times are recorded, without detailed statistics
+    assert net.profiler is None
     # The should be four simulated CodeObjects, one for the group and one each
     # for state update, threshold and reset
     info = net.profiling_info
@@ -753,6 +794,55 @@ def test_profile():
     assert 'profile_test_thresholder' in info_dict
     assert 'profile_test_resetter' in info_dict
     assert all([t>=0*second for _, t in info])
+    summary = str(profiling_summary(net))
+    assert 'profile_test_stateupdater' in summary and 'median' not in summary
+
+
+@attr('codegen-independent')
+@with_setup(teardown=restore_initial_state)
+def test_profiler():
+    G = NeuronGroup(10, 'dv/dt = -v / (10*ms) : 1', threshold='v>1',
+                    reset='v=0', name='profile_test')
+    G.v = 1.1
+    @network_operation
+    def f():
+        pass
+    recorded = []
+    profiler = Profiler(callback=lambda *args: recorded.append(args))
+    net = Network(G, f)
+    net.run(1*ms, profile=profiler)
+    assert net.profiler is profiler
+    stats = profiler.statistics
+    assert set(stats.keys()) == {'profile_test', 'profile_test_stateupdater',
+                                 'profile_test_thresholder',
+                                 'profile_test_resetter', f.name}
+    assert len(recorded) == 5*10
+    assert_allclose(sorted(set(t for _, t, _, _ in recorded)),
+                    np.arange(10)*defaultclock.dt_)
+    for name, s in stats.iteritems():
+        assert s.calls == 10
+        assert s.histogram.sum() == 10
+        assert 0 <= s.code_total <= s.total
+        assert s.min <= s.percentile(50) <= s.percentile(95) <= s.max
+        assert_equal(s.total, sum(elapsed for n, _, elapsed, _ in recorded
+                                  if n == name))
+    # A network operation does not execute generated code
+    assert stats[f.name].code_total == 0
+    assert stats[f.name].python_total == stats[f.name].total
+    # The information is also available via profiling_info
+    assert_equal(sorted(net.profiling_info),
+                 sorted((name, s.total*second) for name, s in stats.iteritems()))
+    summary = str(profiling_summary(net))
+    assert 'median' in summary and 'profile_test_stateupdater' in summary
+
+    # Statistics are reset for each run
+    net.run(0.5*ms, profile=profiler)
+    assert all(s.calls == 5 for s in profiler.statistics.itervalues())
+
+    # No profiler when not profiling
+    net.run(0.5*ms, profile=False)
+    assert net.profiler is None
+    assert_raises(ValueError, lambda: net.profiling_info)
 
 
 @attr('codegen-independent')
@@ -785,6 +875,7 @@ if __name__=='__main__':
             test_network_stop,
             test_network_operations,
             test_network_active_flag,
+            test_network_active_flag_during_run,
             test_network_t,
             test_incorrect_dt_defaultclock,
             test_incorrect_dt_custom_clock,
@@ -806,6 +897,7 @@ if __name__=='__main__':
             test_multiple_runs_defaultclock,
             test_multiple_runs_defaultclock_incorrect,
             test_profile,
+            test_profiler,
             test_magic_scope,
             ]:
         t()
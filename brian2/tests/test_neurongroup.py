@@ -614,6 +614,44 @@ def test_threshold_reset():
     net.run(defaultclock.dt)
     assert_equal(G.v[:], np.array([0, 1, 0.5]))
 
+def test_fused_threshold_reset():
+    '''
+    Test that executing threshold and reset as part of the state update does
+    not change the results.
+    '''
+    def run_network(with_synapses):
+        G = NeuronGroup(10, '''dv/dt = (v0 - v) / (10*ms) : 1 (unless refractory)
+                               v0 : 1''',
+                        threshold='v > 1', reset='v = 0', refractory=2*ms)
+        G.v0 = np.linspace(1.1, 3, 10)
+        H = NeuronGroup(5, 'dv/dt = -v / (5*ms) : 1',
+                        threshold='v > 0.5', reset='v = 0')
+        mon = StateMonitor(G, 'v', record=True)
+        monH = StateMonitor(H, 'v', record=True)
+        net = Network(G, H, mon, monH)
+        if with_synapses:
+            # The synaptic effect occurs between the thresholds and the resets
+            net.add(Synapses(G, H, pre='v += 0.3', connect='i % 5 == j'))
+        net.run(20*ms)
+        return G, H, mon.v[:], monH.v[:]
+
+    for with_synapses in [False, True]:
+        try:
+            prefs.codegen.fuse_neuron_kernels = False
+            _, _, v_G, v_H = run_network(with_synapses)
+            prefs.codegen.fuse_neuron_kernels = True
+            G, H, v_G_fused, v_H_fused = run_network(with_synapses)
+        finally:
+            prefs.codegen.fuse_neuron_kernels = False
+        assert_allclose(v_G, v_G_fused)
+        assert_allclose(v_H, v_H_fused)
+        if hasattr(G.state_updater.codeobj.templater, 'fused_stateupdate'):
+            for group in [G, H]:
+                assert len(group.thresholder.code_objects) == 0
+                assert len(group.resetter.code_objects) == int(with_synapses)
+        else:
+            assert len(G.thresholder.code_objects) == 1
+
 @attr('codegen-independent')
 def test_unit_errors_threshold_reset():
     '''
@@ -1142,6 +1180,7 @@ if __name__ == '__main__':
     test_stochastic_variable_multiplicative()
     test_unit_errors()
     test_threshold_reset()
+    test_fused_threshold_reset()
     test_unit_errors_threshold_reset()
     test_incomplete_namespace()
     test_namespace_errors()
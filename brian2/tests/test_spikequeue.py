@@ -2,7 +2,7 @@ import numpy as np
 from numpy.testing.utils import assert_equal
 from nose.plugins.attrib import attr
 
-from brian2.synapses.spikequeue import SpikeQueue
+from brian2.synapses.spikequeue import SpikeQueue, CompactSpikeQueue
 from brian2.units.stdunits import ms
 from brian2.memory.dynamicarray import DynamicArray1D
 
@@ -37,29 +37,194 @@ def create_one_to_one(N, dt):
 def test_spikequeue():
     N = 100
     dt = float(0.1*ms)
-    synapses, delays = create_one_to_one(N, dt)
-    queue = SpikeQueue(source_start=0, source_end=N)
-    queue.prepare(delays[:], dt, synapses)
-    queue.push(np.arange(N, dtype=np.int32))
-    for i in xrange(N):
-        assert_equal(queue.peek(), np.array([i]))
-        queue.advance()
-    for i in xrange(N):
+    for queue_class in [SpikeQueue, CompactSpikeQueue]:
+        synapses, delays = create_one_to_one(N, dt)
+        queue = queue_class(source_start=0, source_end=N)
+        queue.prepare(delays[:], dt, synapses)
+        queue.push(np.arange(N, dtype=np.int32))
+        for i in xrange(N):
+            assert_equal(queue.peek(), np.array([i]))
+            queue.advance()
+        for i in xrange(N):
+            assert_equal(queue.peek(), np.array([]))
+            queue.advance()
+
+        synapses, delays = create_all_to_all(N, dt)
+
+        queue = queue_class(source_start=0, source_end=N)
+        queue.prepare(delays[:], dt, synapses)
+        queue.push(np.arange(N*N, dtype=np.int32))
+        for i in xrange(N):
+            assert_equal(queue.peek(), i*N + np.arange(N))
+            queue.advance()
+        for i in xrange(N):
+            assert_equal(queue.peek(), np.array([]))
+            queue.advance()
+
+
+@attr('codegen-independent')
+def test_spikequeue_multiple_sources():
+    # Several neurons spiking in the same time step, with events of different
+    # neurons arriving in the same time step
+    dt = float(0.1*ms)
+    synapses = np.array([0, 1, 0, 1, 2, 2], dtype=np.int32)
+    delays = np.array([1, 1, 2, 2, 1, 3]) * dt
+    for queue_class, precompute_offsets in [(SpikeQueue, True),
+                                            (SpikeQueue, False),
+                                            (CompactSpikeQueue, True),
+                                            (CompactSpikeQueue, False)]:
+        queue = queue_class(source_start=0, source_end=3,
+                            precompute_offsets=precompute_offsets)
+        queue.prepare(delays, dt, synapses)
+        queue.push(np.array([0, 1, 2], dtype=np.int32))
         assert_equal(queue.peek(), np.array([]))
         queue.advance()
+        assert_equal(np.sort(queue.peek()), np.array([0, 1, 4]))
+        queue.advance()
+        assert_equal(np.sort(queue.peek()), np.array([2, 3]))
+        queue.advance()
+        assert_equal(queue.peek(), np.array([5]))
+        queue.advance()
+        # Only a single neuron spikes
+        queue.push(np.array([1], dtype=np.int32))
+        queue.advance()
+        assert_equal(queue.peek(), np.array([1]))
+        queue.advance()
+        assert_equal(queue.peek(), np.array([3]))
+
 
+@attr('codegen-independent')
+def test_spikequeue_store_restore():
+    N = 100
+    dt = float(0.1*ms)
     synapses, delays = create_all_to_all(N, dt)
+    for queue_class in [SpikeQueue, CompactSpikeQueue]:
+        queue = queue_class(source_start=0, source_end=N)
+        queue.prepare(delays[:], dt, synapses)
+        queue.push(np.arange(0, N, 2, dtype=np.int32))
+        queue.advance()
+        queue.push(np.arange(1, N, 2, dtype=np.int32))
+        queue.advance()
+        queue._store()
+        expected = []
+        for i in xrange(N):
+            expected.append(np.sort(queue.peek()))
+            queue.advance()
+        assert sum(len(e) for e in expected) == N*N - N
+        queue._restore()
+        for i in xrange(N):
+            assert_equal(np.sort(queue.peek()), expected[i])
+            queue.advance()
+        # Restoring a state that has not been stored empties the queue
+        queue._restore('not_stored')
+        for i in xrange(N):
+            assert_equal(queue.peek(), np.array([]))
+            queue.advance()
+
 
-    queue = SpikeQueue(source_start=0, source_end=N)
-    queue.prepare(delays[:], dt, synapses)
-    queue.push(np.arange(N*N, dtype=np.int32))
-    for i in xrange(N):
-        assert_equal(queue.peek(), i*N + np.arange(N))
+@attr('codegen-independent')
+def test_spikequeue_prepare_cache():
+    N = 10
+    dt = float(0.1*ms)
+    synapses, delays = create_all_to_all(N, dt)
+    for queue_class in [SpikeQueue, CompactSpikeQueue]:
+        queue = queue_class(source_start=0, source_end=N)
+        queue.prepare(delays[:], dt, synapses, delays_version=0)
+        connectivity = queue._source_synapses
+        offsets = queue._offsets
+        # Nothing changed
+        queue.prepare(delays[:], dt, synapses, delays_version=0)
+        assert queue._source_synapses is connectivity
+        assert queue._offsets is offsets
+        # Changed delays, the connectivity can be reused
+        queue.prepare(delays[::-1], dt, synapses, delays_version=1)
+        assert queue._source_synapses is connectivity
+        assert queue._offsets is not offsets
+        # The synapses of the last neuron now have zero delay
+        queue.push(np.array([N-1], dtype=np.int32))
+        assert_equal(queue.peek(), N*(N-1) + np.arange(N))
         queue.advance()
-    for i in xrange(N):
-        assert_equal(queue.peek(), np.array([]))
+        # Changed dt
+        offsets = queue._offsets
+        queue.prepare(delays[::-1], dt/2, synapses, delays_version=1)
+        assert queue._offsets is not offsets
+        # New synapses
+        queue.prepare(np.hstack([delays[::-1], [0]]), dt/2,
+                      np.hstack([synapses, [N-1]]), delays_version=1)
+        assert queue._source_synapses is not connectivity
+        queue.push(np.array([N-1], dtype=np.int32))
+        assert_equal(np.sort(queue.peek()), N*(N-1) + np.arange(N+1))
+
+
+@attr('codegen-independent')
+def test_spikequeue_homogeneous_delays():
+    N = 100
+    dt = float(0.1*ms)
+    synapses = np.repeat(np.arange(N, dtype=np.int32), 10)
+    for queue_class in [SpikeQueue, CompactSpikeQueue]:
+        # A scalar delay and identical delays for all synapses
+        for delays in [np.array([1.4*dt]), np.ones(N*10)*1.4*dt]:
+            queue = queue_class(source_start=0, source_end=N)
+            queue.prepare(delays, dt, synapses)
+            # Neither per-synapse delays nor offsets are stored
+            assert len(queue._delays) == 1
+            assert queue._offsets is None
+            queue.push(np.array([1, 3], dtype=np.int32))
+            # delay is rounded to a single time step
+            assert_equal(queue.peek(), np.array([]))
+            queue.advance()
+            assert_equal(queue.peek(), np.hstack([np.arange(10, 20),
+                                                  np.arange(30, 40)]))
+            queue.advance()
+            assert_equal(queue.peek(), np.array([]))
+        # Delays that are no longer homogeneous
+        delays = np.ones(N*10)*dt
+        delays[0] = 0
+        queue.prepare(delays, dt, synapses, delays_version=1)
+        assert len(queue._delays) == N*10
+        queue.push(np.array([0], dtype=np.int32))
+        assert_equal(queue.peek(), np.array([0]))
+
+
+@attr('codegen-independent')
+def test_compact_spikequeue_growth():
+    # Many events arriving in a few time steps, forcing the compact queue to
+    # grow and compact its pool several times
+    dt = float(0.1*ms)
+    N = 50
+    synapses = np.repeat(np.arange(N, dtype=np.int32), 20)
+    delays = np.tile(np.arange(20), N) * dt
+    reference = SpikeQueue(source_start=0, source_end=N)
+    queue = CompactSpikeQueue(source_start=0, source_end=N)
+    for q in [reference, queue]:
+        q.prepare(delays, dt, synapses)
+    for step in xrange(100):
+        spiking = np.arange(step % 7, N, 3 + step % 5, dtype=np.int32)
+        for q in [reference, queue]:
+            q.push(spiking)
+        assert_equal(np.sort(queue.peek()), np.sort(reference.peek()))
+        for q in [reference, queue]:
+            q.advance()
+    # The compact queue should not need more memory than the events in flight
+    # (up to a constant factor)
+    assert len(queue._pool) <= 8 * np.sum(queue.n)
+
+    # Storing and restoring spikes
+    def sorted_spikes(spikes):
+        return spikes[np.lexsort((spikes[:, 1], spikes[:, 0]))]
+    spikes = sorted_spikes(queue._extract_spikes())
+    assert_equal(spikes, sorted_spikes(reference._extract_spikes()))
+    queue._store()
+    while np.sum(queue.n):
         queue.advance()
+    queue._restore()
+    assert_equal(sorted_spikes(queue._extract_spikes()), spikes)
 
 
 if __name__ == '__main__':
     test_spikequeue()
+    test_spikequeue_multiple_sources()
+    test_spikequeue_store_restore()
+    test_spikequeue_prepare_cache()
+    test_spikequeue_homogeneous_delays()
+    test_compact_spikequeue_growth()
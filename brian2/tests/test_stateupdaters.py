@@ -611,6 +611,46 @@ def test_locally_constant_check():
     net = Network(G)
     net.run(0*ms)
 
+
+@attr('codegen-independent')
+def test_derivation_cache():
+    '''
+    Test that the state update code is only derived once for groups with
+    identical equations.
+    '''
+    cache = StateUpdateMethod.derivation_cache
+    cache.clear()
+    hits, misses = cache.hits, cache.misses
+    # The persistent cache should not be used for this test
+    old_directory = prefs.codegen.cache_directory
+    prefs.codegen.cache_directory = ''
+    try:
+        G1 = NeuronGroup(1, '''dv/dt = (I - v)/(10*ms) : 1
+                               I : 1''', method='rk2')
+        # Same equations, different formatting
+        G2 = NeuronGroup(1, '''dv/dt=(I-v) / (10*ms):1
+                               I:1''', method='rk2')
+        # Different integration method
+        G3 = NeuronGroup(1, '''dv/dt = (I - v)/(10*ms) : 1
+                               I : 1''', method='euler')
+        # A user-provided state updater
+        updater = ExplicitStateUpdater('x_new = x + dt*f(x, t)')
+        G4 = NeuronGroup(1, 'dv/dt = -v/(10*ms) : 1', method=updater)
+        G5 = NeuronGroup(1, 'dv/dt = -v/(10*ms) : 1', method=updater)
+        net = Network(G1, G2, G3, G4, G5)
+        net.run(0*ms)
+        assert cache.misses - misses == 3
+        assert cache.hits - hits == 2
+        assert G2.state_updater.method is StateUpdateMethod.stateupdaters['rk2']
+        assert G5.state_updater.method is updater
+        assert (G1.state_updater.abstract_code ==
+                G2.state_updater.abstract_code)
+        assert (G1.state_updater.abstract_code !=
+                G3.state_updater.abstract_code)
+    finally:
+        prefs.codegen.cache_directory = old_directory
+
+
 if __name__ == '__main__':
     test_determination()
     test_explicit_stateupdater_parsing()
@@ -628,3 +668,4 @@ if __name__ == '__main__':
     test_registration()
     test_subexpressions()
     test_locally_constant_check()
+    test_derivation_cache()
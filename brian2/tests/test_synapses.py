@@ -239,6 +239,35 @@ def test_connection_string_deterministic():
     _compare(S, expected)
 
 
+@attr('codegen-independent')
+@with_setup(teardown=restore_initial_state)
+def test_connection_string_blocks():
+    # The results should not depend on the way the pairs are evaluated (the
+    # preferences only apply to the numpy target)
+    prefs.codegen.target = 'numpy'
+    G = NeuronGroup(17, 'x : 1')
+    G.x = 'i'
+    G2 = NeuronGroup(5, 'x : 1')
+    G2.x = 'i'
+    results = []
+    for block_size, processes in [(1, 1), (10, 1), (1000, 1), (10, 2)]:
+        prefs.codegen.runtime.numpy.synapse_creation_block_size = block_size
+        prefs.codegen.runtime.numpy.synapse_creation_processes = processes
+        S = Synapses(G, G2, 'w:1')
+        S.connect('(x_pre + x_post) % 3 == 0', n='1 + i % 2')
+        results.append((S.i[:], S.j[:]))
+        if processes > 1:
+            # Random connections can differ, but have to follow the condition
+            S = Synapses(G, G2, 'w:1')
+            S.connect('i != j', p=0.5)
+            assert all(S.i[:] != S.j[:])
+    expected_i, expected_j = results[0]
+    assert len(expected_i) > 0
+    for i, j in results[1:]:
+        assert_equal(i, expected_i)
+        assert_equal(j, expected_j)
+
+
 def test_connection_random_basic():
     G = NeuronGroup(4, 'v: 1')
     G2 = NeuronGroup(7, 'v: 1')
@@ -309,6 +338,41 @@ def test_connection_random():
     S.connect([0, 1], [0, 2], p=0.3)
 
 
+def test_connection_random_skip_ahead():
+    '''
+    Test random connections with a constant probability (where the candidate
+    pairs are drawn directly instead of testing every pair).
+    '''
+    G = NeuronGroup(1000, 'v: 1')
+    G2 = NeuronGroup(500, 'v: 1')
+    p = 0.05
+    expected = p * len(G) * len(G2)
+    std = np.sqrt(expected * (1 - p))
+
+    S = Synapses(G, G2, 'w:1', 'v+=w')
+    S.connect(True, p=p)
+    assert abs(len(S) - expected) < 5*std
+    # Every pair is only drawn once
+    pairs = S.i[:] * len(G2) + S.j[:]
+    assert len(np.unique(pairs)) == len(S)
+    # The candidates should be spread over all source and target neurons
+    assert abs(np.mean(S.i[:]) - (len(G) - 1)/2.) < 0.02*len(G)
+    assert abs(np.mean(S.j[:]) - (len(G2) - 1)/2.) < 0.02*len(G2)
+
+    # The condition is still evaluated for the drawn candidates
+    S = Synapses(G, G2, 'w:1', 'v+=w')
+    S.connect('i < 500', p=p, n=2)
+    assert all(S.i[:] < 500)
+    assert abs(len(S)/2 - expected/2) < 5*std
+    assert_equal(np.bincount(S.i[:] * len(G2) + S.j[:])[S.i[:] * len(G2) + S.j[:]],
+                 2*np.ones(len(S)))
+
+    # Very low probabilities
+    S = Synapses(G, G2, 'w:1', 'v+=w')
+    S.connect('i != j', p=1e-9)
+    assert len(S) < 10
+
+
 def test_connection_multiple_synapses():
     '''
     Test multiple synapses per connection.
@@ -607,6 +671,76 @@ def test_changed_dt_spikes_in_queue():
     assert_equal(mon.t[:], expected)
 
 
+def test_changed_delays_between_runs():
+    inp = SpikeGeneratorGroup(2, [0, 1, 0, 1], [0, 0, 5, 5]*ms)
+    target = NeuronGroup(2, 'v:1')
+    S = Synapses(inp, target, pre='v+=1', connect='i==j')
+    S.delay = [1, 2]*ms
+    mon = StateMonitor(target, 'v', record=True)
+    net = Network(inp, target, S, mon)
+    net.run(4*ms)
+    assert_equal(mon[0].v[mon.t<1*ms], 0)
+    assert_equal(mon[0].v[mon.t>=1*ms], 1)
+    assert_equal(mon[1].v[mon.t<2*ms], 0)
+    assert_equal(mon[1].v[mon.t>=2*ms], 1)
+    # Running again without changes
+    net.run(1*ms)
+    # Changing the delays between runs
+    S.delay[1] = 0.5*ms
+    net.run(2*ms)
+    assert_equal(mon[0].v[mon.t>=6*ms], 2)
+    assert_equal(mon[1].v[(mon.t>=4*ms) & (mon.t<5.5*ms)], 1)
+    assert_equal(mon[1].v[mon.t>=5.5*ms], 2)
+
+
+@with_setup(teardown=restore_initial_state)
+def test_compact_spike_queue():
+    # Heterogeneous delays with several neurons spiking in the same time steps
+    results = {}
+    for queue_type in ['python', 'compact']:
+        prefs.devices.runtime.spike_queue = queue_type
+        inp = SpikeGeneratorGroup(5, [0, 1, 2, 3, 4, 0, 2, 4],
+                                  [0, 0, 0, 0, 0, 1, 1, 1]*ms)
+        target = NeuronGroup(5, 'v:1')
+        S = Synapses(inp, target, pre='v+=1', connect=True)
+        S.delay = '(i + j)*0.3*ms'
+        mon = StateMonitor(target, 'v', record=True)
+        net = Network(inp, target, S, mon)
+        net.run(1*ms)
+        # Store and restore with events in the queue
+        net.store()
+        net.run(1*ms)
+        net.restore()
+        net.run(3*ms)
+        results[queue_type] = mon.v[:]
+        assert_equal(mon.v[:, -1], 8)
+    assert_equal(results['compact'], results['python'])
+
+
+def test_transmission_repeated_targets():
+    # Several synapses targeting the same neurons in the same time step, with
+    # additive updates (that do not depend on the order of the updates) and
+    # with updates that depend on the updated variable
+    inp = SpikeGeneratorGroup(5, [0, 1, 2, 3, 4], np.zeros(5)*ms)
+    target = NeuronGroup(3, '''dv/dt = 0/ms : 1 (unless refractory)
+                               x : 1
+                               y : 1''', threshold='i == 2', reset='',
+                         refractory=1*second)
+    target.y = 1
+    S_add = Synapses(inp, target, 'w : 1', pre='v_post += w; x_post -= 1')
+    S_add.connect(True, n=2)
+    S_add.w = 'i + j'
+    S_mult = Synapses(inp, target, pre='y_post = y_post * 2', connect=True)
+    net = Network(inp, target, S_add, S_mult)
+    net.run(2*defaultclock.dt)
+    # Neuron 2 is refractory, v is not updated
+    assert_equal(target.v[:], [2*np.sum(np.arange(5)),
+                               2*np.sum(np.arange(5) + 1), 0])
+    assert_equal(target.x[:], -10*np.ones(3))
+    # Each update of S_mult doubles y
+    assert_equal(target.y[:], 2**5*np.ones(3))
+
+
 @attr('codegen-independent')
 def test_no_synapses():
     # Synaptic pathway but no synapses
@@ -824,7 +958,10 @@ if __name__ == '__main__':
     test_name_clashes()
     test_incoming_outgoing()
     test_connection_string_deterministic()
+    test_connection_string_blocks()
+    restore_initial_state()
     test_connection_random()
+    test_connection_random_skip_ahead()
     test_connection_multiple_synapses()
     test_connection_arrays()
     test_connection_array_standalone()
@@ -839,6 +976,10 @@ if __name__ == '__main__':
     test_transmission_scalar_delay_different_clocks()
     test_clocks()
     test_changed_dt_spikes_in_queue()
+    test_changed_delays_between_runs()
+    test_compact_spike_queue()
+    restore_initial_state()
+    test_transmission_repeated_targets()
     test_no_synapses()
     test_summed_variable()
     test_summed_variable_errors()
@@ -1,5 +1,10 @@
+import os
+import tempfile
+import shutil
+
 from nose.plugins.attrib import attr
 
+from brian2.utils.caching import DiskCache
 from brian2.utils.environment import running_from_ipython
 from brian2.utils.stringtools import SpellChecker
 
@@ -37,6 +42,51 @@ def test_spell_check():
     assert checker.suggest('gamma') == set()
 
 
+@attr('codegen-independent')
+def test_disk_cache():
+    directory = tempfile.mkdtemp()
+    try:
+        cache = DiskCache(directory)
+        assert cache.get('key') is None
+        cache.set('key', {'code': 'v = 0'})
+        cache.set('other key', 'x = 1')
+        assert cache.get('key') == {'code': 'v = 0'}
+        # A new cache object for the same directory (e.g. in a new process)
+        # finds the stored values
+        cache2 = DiskCache(directory)
+        assert cache2.get('other key') == 'x = 1'
+        assert (cache.hits, cache.misses) == (1, 1)
+        assert (cache2.hits, cache2.misses) == (1, 0)
+        cache.clear()
+        assert cache.get('key') is None
+    finally:
+        shutil.rmtree(directory)
+
+
+@attr('codegen-independent')
+def test_disk_cache_max_size():
+    directory = tempfile.mkdtemp()
+    try:
+        cache = DiskCache(directory)
+        for idx in range(3):
+            cache.set('key %d' % idx, 'x' * 1000)
+            # mark the values as used in the order they were stored
+            os.utime(cache._filename('key %d' % idx), (idx, idx))
+        file_size = os.path.getsize(cache._filename('key 0'))
+        # Using a value makes it the most recently used one
+        assert cache.get('key 0') is not None
+        cache = DiskCache(directory, max_size=3*file_size)
+        cache.set('key 3', 'x' * 1000)
+        assert cache.get('key 1') is None
+        assert cache.get('key 0') is not None
+        assert cache.get('key 2') is not None
+        assert cache.get('key 3') is not None
+    finally:
+        shutil.rmtree(directory)
+
+
 if __name__ == '__main__':
     test_environment()
     test_spell_check()
+    test_disk_cache()
+    test_disk_cache_max_size()
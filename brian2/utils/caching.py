@@ -0,0 +1,270 @@
+'''
+Caches for results of code generation that are expensive to compute but only
+depend on a description of their input, e.g. the code generated for a code
+object or the abstract code derived from model equations by a state updater.
+'''
+import os
+import hashlib
+import cPickle as pickle
+from collections import OrderedDict
+
+from brian2.core.preferences import prefs
+from brian2.utils.filetools import ensure_directory
+from brian2.utils.logger import get_logger
+
+__all__ = ['LRUCache', 'DiskCache', 'get_disk_cache', 'source_fingerprint',
+           'prune_directory']
+
+logger = get_logger(__name__)
+
+_source_fingerprint = None
+
+
+def _as_bytes(text):
+    '''
+    Encode a string for hashing (strings are already bytes on Python 2).
+    '''
+    if isinstance(text, bytes):
+        return text
+    return text.encode('utf-8')
+
+
+def source_fingerprint():
+    '''
+    Return a string identifying the installed version of Brian, based on its
+    version number and on the names, sizes and modification times of all its
+    source files and templates. Changing any file (e.g. in a development
+    version of Brian) therefore invalidates all cached results.
+    '''
+    global _source_fingerprint
+    if _source_fingerprint is None:
+        import brian2
+        root = os.path.dirname(os.path.abspath(brian2.__file__))
+        fingerprint = hashlib.sha1(_as_bytes(brian2.__version__))
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = sorted(d for d in dirnames if d != 'tests')
+            for filename in sorted(filenames):
+                if os.path.splitext(filename)[1] in ['.pyc', '.pyo']:
+                    continue
+                stat = os.stat(os.path.join(dirpath, filename))
+                description = '%s:%d:%r' % (os.path.join(dirpath, filename),
+                                            stat.st_size, stat.st_mtime)
+                fingerprint.update(_as_bytes(description))
+        _source_fingerprint = fingerprint.hexdigest()
+    return _source_fingerprint
+
+
+def prune_directory(directory, max_size, extensions=None):
+    '''
+    Delete the least recently used files in a directory until the total size
+    of the files is at most ``max_size``. The modification time of a file is
+    used as the time of its last use, i.e. files should be "touched" when
+    they are used.
+
+    Parameters
+    ----------
+    directory : str
+        The directory.
+    max_size : int
+        The maximum total size of the files in bytes.
+    extensions : list of str, optional
+        Only consider files with these extensions. By default, all files are
+        considered.
+
+    Returns
+    -------
+    size : int
+        The total size of the remaining files.
+    '''
+    if not os.path.isdir(directory):
+        return 0
+    files = []
+    for filename in os.listdir(directory):
+        if (extensions is not None and
+                os.path.splitext(filename)[1] not in extensions):
+            continue
+        full_name = os.path.join(directory, filename)
+        try:
+            stat = os.stat(full_name)
+        except OSError:
+            continue  # deleted by another process in the meantime
+        files.append((stat.st_mtime, stat.st_size, full_name))
+    size = sum(file_size for _, file_size, _ in files)
+    for _, file_size, full_name in sorted(files):
+        if size <= max_size:
+            break
+        try:
+            os.remove(full_name)
+        except OSError:
+            pass
+        size -= file_size
+    return size
+
+
+class LRUCache(object):
+    '''
+    An in-memory cache storing a limited number of values. If the cache is
+    full, the least recently used value is discarded.
+
+    Parameters
+    ----------
+    maxsize : int
+        The maximum number of stored values.
+    '''
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._values = OrderedDict()
+        #: The number of successful lookups
+        self.hits = 0
+        #: The number of lookups that did not find a value
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._values)
+
+    def get(self, key):
+        '''
+        Return the value stored for ``key`` or ``None`` if there is none.
+        '''
+        try:
+            value = self._values.pop(key)
+        except KeyError:
+            self.misses += 1
+            return None
+        self._values[key] = value  # mark as most recently used
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        '''
+        Store ``value`` for ``key``.
+        '''
+        self._values.pop(key, None)
+        self._values[key] = value
+        while len(self._values) > self.maxsize:
+            self._values.popitem(last=False)
+
+    def clear(self):
+        '''
+        Delete all stored values.
+        '''
+        self._values.clear()
+
+
+class DiskCache(object):
+    '''
+    A directory storing pickled values, looked up by the hash of a string
+    describing everything the value depends on. The cache can be shared
+    between processes.
+
+    Parameters
+    ----------
+    directory : str
+        The directory of the cache, will be created if it does not exist.
+    max_size : int, optional
+        The maximum total size of the stored files in bytes. If storing a
+        value makes the cache exceed this size, the least recently used values
+        are deleted. By default, the size is not limited.
+    '''
+    def __init__(self, directory, max_size=None):
+        self.directory = os.path.abspath(os.path.expanduser(directory))
+        self.max_size = max_size
+        # The total size of the stored files, determined when storing the
+        # first value
+        self._size = None
+        #: The number of successful lookups
+        self.hits = 0
+        #: The number of lookups that did not find a value
+        self.misses = 0
+
+    def _filename(self, key):
+        key_hash = hashlib.sha1(_as_bytes(source_fingerprint() + key))
+        key_hash = key_hash.hexdigest()
+        return os.path.join(self.directory, key_hash + '.pickle')
+
+    def get(self, key):
+        '''
+        Return the value stored for ``key`` or ``None`` if there is none.
+        '''
+        filename = self._filename(key)
+        try:
+            with open(filename, 'rb') as f:
+                stored_key, value = pickle.load(f)
+        except IOError:
+            self.misses += 1
+            return None
+        except Exception as ex:
+            # e.g. a file written by an incompatible version of a library
+            logger.debug('Ignoring cache file %s: %s' % (filename, ex))
+            self.misses += 1
+            return None
+        if stored_key != key:  # should never happen
+            self.misses += 1
+            return None
+        self.hits += 1
+        try:
+            os.utime(filename, None)  # mark as recently used
+        except OSError:
+            pass
+        return value
+
+    def set(self, key, value):
+        '''
+        Store ``value`` for ``key``.
+        '''
+        filename = self._filename(key)
+        # Write to a temporary file first, so that other processes never see a
+        # partially written file
+        tmp_name = '%s.%d.tmp' % (filename, os.getpid())
+        try:
+            ensure_directory(self.directory)
+            with open(tmp_name, 'wb') as f:
+                pickle.dump((key, value), f, pickle.HIGHEST_PROTOCOL)
+            os.rename(tmp_name, filename)
+        except Exception as ex:
+            logger.debug('Could not write cache file %s: %s' % (filename, ex))
+            if os.path.exists(tmp_name):
+                os.remove(tmp_name)
+            return
+        if self.max_size is not None:
+            # Only scan the directory when the cache might be too big
+            if self._size is None:
+                self._size = prune_directory(self.directory, self.max_size,
+                                             ['.pickle'])
+            else:
+                self._size += os.path.getsize(filename)
+                if self._size > self.max_size:
+                    self._size = prune_directory(self.directory,
+                                                 self.max_size, ['.pickle'])
+
+    def clear(self):
+        '''
+        Delete all stored values.
+        '''
+        if not os.path.exists(self.directory):
+            return
+        for filename in os.listdir(self.directory):
+            if filename.endswith('.pickle'):
+                os.remove(os.path.join(self.directory, filename))
+        self._size = None
+
+
+_disk_caches = {}
+
+
+def get_disk_cache(name):
+    '''
+    Return the `DiskCache` with the given name, stored in a subdirectory of
+    the directory given by the `codegen.cache_directory` preference and
+    limited to the size given by the `codegen.cache_max_size` preference.
+    Returns ``None`` if the preference is set to an empty string.
+    '''
+    directory = prefs.codegen.cache_directory
+    if not directory:
+        return None
+    directory = os.path.join(os.path.expanduser(directory), name)
+    if directory not in _disk_caches:
+        _disk_caches[directory] = DiskCache(directory)
+    cache = _disk_caches[directory]
+    cache.max_size = int(prefs.codegen.cache_max_size * 1024 * 1024)
+    return cache
@@ -0,0 +1,59 @@
+'''
+Benchmark extracting and re-inserting the events stored in a `SpikeQueue`, as
+done by `Network.store`/`Network.restore` and when the dt changes between runs.
+'''
+import timeit
+import itertools
+
+import numpy as np
+
+GENERAL_SETUP = ['import numpy as np',
+                 'from brian2.tests.test_spikequeue import create_all_to_all',
+                 'from brian2.units.stdunits import ms',
+                 'from brian2.synapses.spikequeue import SpikeQueue, CompactSpikeQueue']
+
+
+def get_setup_code(N, queue_class):
+    # N*N synapses with N different delays, half of the neurons spiked
+    return GENERAL_SETUP + [
+        'dt = float(0.1*ms)',
+        'synapses, delays = create_all_to_all({}, dt)'.format(N),
+        'queue = {}(source_start=0, source_end={})'.format(queue_class, N),
+        'queue.prepare(delays[:], dt, synapses)',
+        'queue.push(np.arange(0, {}, 2, dtype=np.int32))'.format(N)]
+
+
+def test_store(N, queue_class):
+    setup_code = get_setup_code(N, queue_class)
+    results = timeit.repeat('queue._store()', ';'.join(setup_code), repeat=5,
+                            number=1)
+    return np.array(results)
+
+
+def test_restore(N, queue_class):
+    setup_code = get_setup_code(N, queue_class) + ['queue._store()']
+    results = timeit.repeat('queue._restore()', ';'.join(setup_code), repeat=5,
+                            number=1)
+    return np.array(results)
+
+
+def test_change_dt(N, queue_class):
+    setup_code = get_setup_code(N, queue_class)
+    results = timeit.repeat('queue.prepare(delays[:], dt/2, synapses)',
+                            ';'.join(setup_code), repeat=5, number=1)
+    return np.array(results)
+
+
+def run_benchmark(test_func, N, queue_class):
+    result = test_func(N, queue_class)
+    print '{} -- {}({} events) : {}'.format(test_func.__name__, queue_class,
+                                            N*N//2, np.median(result))
+
+
+if __name__ == '__main__':
+    for test, N, queue_class in itertools.product((test_store, test_restore,
+                                                   test_change_dt),
+                                                  (100, 1000),
+                                                  ('SpikeQueue',
+                                                   'CompactSpikeQueue')):
+        run_benchmark(test, N, queue_class)
@@ -3,6 +3,7 @@ How long does synapse creation take?
 '''
 import time
 import cPickle
+import multiprocessing
 
 import numpy as np
 import joblib
@@ -14,7 +15,10 @@ repetitions = 3
 memory = joblib.Memory(cachedir='.', verbose=0)
 
 @memory.cache
-def test_connectivity2(N, i, j, n, p, codeobj_class):
+def test_connectivity2(N, i, j, n, p, codeobj_class, block_size=10000,
+                       processes=1):
+    prefs.codegen.runtime.numpy.synapse_creation_block_size = block_size
+    prefs.codegen.runtime.numpy.synapse_creation_processes = processes
     G = NeuronGroup(N, '')
     # Do it once without measuring the time to ignore the compilation time for
     # C code
@@ -65,3 +69,22 @@ for target in targets:
 
 with open('synapse_creation_times_brian2.pickle', 'w') as f:
     cPickle.dump(results, f)
+
+# Speedup of the blocked (and parallel) synapse creation for the numpy target,
+# compared to evaluating the condition separately for each presynaptic neuron
+n_cpus = multiprocessing.cpu_count()
+modes = [('per neuron', 1, 1),
+         ('blocked', 10000, 1),
+         ('blocked, %d processes' % n_cpus, 10000, n_cpus)]
+for pattern, condition in conditions:
+    if isinstance(condition, basestring):
+        condition = (condition, None, 1, 1.)
+    for N in [100, 1000, 10000]:
+        times = [test_connectivity2(N, *condition, codeobj_class=NumpyCodeObject,
+                                    block_size=block_size,
+                                    processes=processes)[0]
+                 for _, block_size, processes in modes]
+        print '%s (N=%d): %s' % (pattern, N,
+                                 ', '.join('%s: %.4fs (x%.1f)' % (mode[0], took,
+                                                                  times[0]/took)
+                                           for mode, took in zip(modes, times)))